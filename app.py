@@ -50,19 +50,21 @@ def check_image_folder():
         print(IMAGE_INPUT_DIR)
         return False
 
-    files = [
-        f for f in os.listdir(IMAGE_INPUT_DIR)
-        if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))
-    ]
-
-    if len(files) == 0:
+    # stop at the first image instead of listing the whole folder
+    with os.scandir(IMAGE_INPUT_DIR) as it:
+        found = any(
+            e.name.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")) and e.is_file()
+            for e in it
+        )
+
+    if not found:
         print("\nERROR: No images found in input_detect_images.")
         print("Copy image files here:")
         print(IMAGE_INPUT_DIR)
         print("Supported formats: jpg, jpeg, png, bmp\n")
         return False
 
-    print(f"OK: Found {len(files)} images.")
+    print("OK: Found images.")
     return True
 
 
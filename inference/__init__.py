@@ -0,0 +1,44 @@
+"""
+Airplane detection, importable from the repository root.
+
+    from inference import Detector, detect_stream, open_source
+
+    detector = Detector(conf=0.5)                      # newest model in models/
+    for r in detect_stream(detector, open_source('archive.mp4')):
+        print(r.index, r.boxes)                        # (N, 6): x1, y1, x2, y2, conf, cls
+
+Importing the package has no side effects; torch and Ultralytics are only
+imported when one of the names below is first used. The yolo_detect*.py
+scripts are command-line wrappers over the same API (see detector.py).
+"""
+
+import importlib
+
+_EXPORTS = {
+    'Detector': 'detector',
+    'FrameResult': 'detector',
+    'detect_stream': 'detector',
+    'resolve_model': 'detector',
+    'draw_boxes': 'detector',
+    'Frame': 'sources',
+    'open_source': 'sources',
+    'ImageSource': 'sources',
+    'VideoSource': 'sources',
+    'CameraSource': 'sources',
+    'PicameraSource': 'sources',
+    'ScreenSource': 'sources',
+    'FramePool': 'frame_pool',
+    'StageTimer': 'stage_timer',
+    'EventStore': 'event_store',
+    'ImageWriter': 'image_writer',
+    'load_rois': 'roi',
+    'runtime_options': 'runtime',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,112 @@
+"""
+Latency-driven input size for the live inference loops.
+
+    ctl = ImgszController(target_ms=50, sizes=[320, 480, 640, 960])
+    ctl.warmup(lambda s: model(frame, imgsz=s))   # one pass per size, no spike on first switch
+    while ...:
+        results = model(frame, imgsz=ctl.size)
+        ...
+        ctl.update(frame_ms, inference_ms, backlog)
+
+Steps down one size when the recent p90 frame latency misses the target
+(or frames are piling up upstream), and up one size only when the
+latency predicted for the larger size stays well under the target. A
+minimum dwell after every switch plus that gap between the two thresholds
+keeps it from flapping. Under load this trades some small-object recall
+for staying real time. The first frame after a switch is not counted: shapes
+the warm-up could not foresee (cascade crops) pay their first call there.
+
+PyTorch models only: exported ONNX / OpenVINO models have a fixed input size.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class ImgszController:
+
+    def __init__(self, target_ms, sizes=(320, 480, 640, 960), start=640, window=30,
+                 dwell=30, up_margin=0.75, max_backlog=2):
+        self.target_ms = target_ms
+        self.sizes = sorted(sizes)
+        self.index = self.sizes.index(start) if start in self.sizes else len(self.sizes) // 2
+        self.window = window
+        self.dwell = dwell
+        self.up_margin = up_margin
+        self.max_backlog = max_backlog
+        self.frames = 0
+        self.switches = []
+        self.frames_per_size = {s: 0 for s in self.sizes}
+        # last known inference time per size (ms), measured or from warm-up
+        self.infer_ms = {}
+        self._recent = deque(maxlen=window)
+        self._since_switch = 0
+        self._skip = False
+
+    @property
+    def size(self):
+        return self.sizes[self.index]
+
+    def warmup(self, run):
+        """
+        run(size) does one full inference of the loop at that size (every model,
+        ROI crops, ...); it runs twice per size so switching never pays the
+        first-call cost, and the second call is the size's first latency estimate.
+        """
+        import time
+        for s in self.sizes:
+            for _ in range(2):
+                t0 = time.perf_counter()
+                run(s)
+            self.infer_ms[s] = (time.perf_counter() - t0) * 1000
+        print('imgsz warm-up: ' + ', '.join(f'{s}: {ms:.0f} ms' for s, ms in self.infer_ms.items()))
+
+    def _switch(self, step, reason):
+        old = self.size
+        self.index += step
+        self._recent.clear()
+        self._since_switch = 0
+        self._skip = True
+        self.switches.append({'frame': self.frames, 'from': old, 'to': self.size, 'reason': reason})
+        print(f'[imgsz] {old} -> {self.size} ({reason})')
+
+    def update(self, frame_ms, inference_ms, backlog=0):
+        """Feed one frame's latency; returns the size to use for the next frame."""
+        self.frames += 1
+        self.frames_per_size[self.size] += 1
+        if self._skip:
+            # first frame at a new size: may include first-call cost, not a latency sample
+            self._skip = False
+            return self.size
+        self._since_switch += 1
+        self._recent.append((frame_ms, inference_ms))
+        known = self.infer_ms.get(self.size)
+        self.infer_ms[self.size] = inference_ms if known is None else 0.9 * known + 0.1 * inference_ms
+
+        if self._since_switch < min(self.dwell, self.window):
+            return self.size
+
+        frame_a, infer_a = np.array(self._recent).T
+        p90 = float(np.percentile(frame_a, 90))
+
+        if self.index > 0 and (p90 > self.target_ms or backlog > self.max_backlog):
+            reason = (f'backlog {backlog} frames' if backlog > self.max_backlog
+                      else f'p90 {p90:.1f} ms > target {self.target_ms:g} ms')
+            self._switch(-1, reason)
+        elif self.index < len(self.sizes) - 1 and backlog == 0:
+            # rest of the frame does not depend on imgsz; inference scales with pixel count
+            other = float(np.percentile(frame_a - infer_a, 90))
+            bigger = self.sizes[self.index + 1]
+            predicted = other + self.infer_ms.get(bigger, float(np.median(infer_a)) * (bigger / self.size) ** 2)
+            if predicted < self.up_margin * self.target_ms:
+                self._switch(+1, f'predicted {predicted:.1f} ms < {self.up_margin:.0%} of target')
+        return self.size
+
+    def summary(self):
+        return {
+            'target_ms': self.target_ms,
+            'final_imgsz': self.size,
+            'frames_per_imgsz': self.frames_per_size,
+            'switches': self.switches,
+        }
@@ -0,0 +1,115 @@
+"""
+Two-stage detection: a nano model screens every frame, the small model
+only runs where the nano model found a candidate.
+
+    cascade = Cascade(YOLO('models/raw-nano_..._best.pt'), YOLO('models/raw_..._best.pt'))
+    results = cascade.predict(frame)            # instead of model(frame)
+
+Per frame:
+  - nano boxes below screen_conf are ignored; none left -> empty result, no escalation
+  - all candidates at or above accept_conf -> nano result is kept as is
+  - otherwise escalate: the small model runs on padded crops around the
+    candidates (batched, see roi.py) or on the whole frame; many or large
+    crops fall back to the whole frame, which is then cheaper
+
+With rois (roi.py) both stages only report boxes whose centre lies inside
+a region: the fallback runs on the region crops instead of the whole frame.
+
+Most frames contain no aircraft, so most frames cost one nano pass.
+"""
+
+import time
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from .profiler import tracer
+from .roi import RoiSet
+
+
+class Cascade:
+
+    def __init__(self, screen_model, confirm_model, screen_conf=0.25, accept_conf=1.0,
+                 confirm_conf=0.5, escalate='crops', pad=1.0, min_crop=96, max_crops=8,
+                 max_crop_area=0.5):
+        self.screen_model = screen_model
+        self.confirm_model = confirm_model
+        self.screen_conf = screen_conf
+        self.accept_conf = accept_conf
+        self.confirm_conf = confirm_conf
+        self.escalate = escalate
+        self.pad = pad
+        self.min_crop = min_crop
+        self.max_crops = max_crops
+        self.max_crop_area = max_crop_area
+        self.stats = {'frames': 0, 'escalated': 0, 'accepted': 0, 'crops': 0,
+                      'screen_ms': 0.0, 'confirm_ms': 0.0}
+
+    def crop_rects(self, xyxy, shape):
+        """Candidate boxes grown by pad (and to at least min_crop), clipped to the frame."""
+        h, w = shape[:2]
+        c = (xyxy[:, :2] + xyxy[:, 2:]) / 2
+        half = np.maximum((xyxy[:, 2:] - xyxy[:, :2]) * (1 + self.pad), self.min_crop) / 2
+        lt = np.clip(c - half, 0, [w, h])
+        rb = np.clip(c + half, 0, [w, h])
+        return [{'rect': [*a, *b]} for a, b in zip(lt.tolist(), rb.tolist())]
+
+    def predict(self, frame, rois=None, imgsz=None, verbose=False):
+        """Drop-in for model(frame): returns [Results] in frame coordinates."""
+        kw = {'imgsz': imgsz} if imgsz else {}
+        t0 = time.perf_counter()
+        if rois is not None:
+            screen = rois.predict(self.screen_model, frame, conf=self.screen_conf, verbose=verbose)[0]
+        else:
+            screen = self.screen_model(frame, conf=self.screen_conf, verbose=verbose, **kw)[0]
+        t1 = time.perf_counter()
+        self.stats['frames'] += 1
+        self.stats['screen_ms'] += (t1 - t0) * 1000
+        tracer.complete('screen', t0 * 1e6, t1 * 1e6, 'cascade')
+
+        conf = screen.boxes.conf.cpu().numpy()
+        if len(conf) == 0:
+            return [Results(frame, path='', names=self.confirm_model.names, boxes=torch.zeros((0, 6)))]
+        if conf.min() >= self.accept_conf:
+            self.stats['accepted'] += 1
+            return [screen]
+
+        self.stats['escalated'] += 1
+        rects = None
+        if self.escalate == 'crops' and len(conf) <= self.max_crops:
+            rects = self.crop_rects(screen.boxes.xyxy.cpu().numpy(), frame.shape)
+            area = sum((r['rect'][2] - r['rect'][0]) * (r['rect'][3] - r['rect'][1]) for r in rects)
+            if area > self.max_crop_area * frame.shape[0] * frame.shape[1]:
+                rects = None
+
+        if rects is None and rois is not None:
+            # whole-frame fallback still only looks inside the regions
+            results = rois.predict(self.confirm_model, frame, conf=self.confirm_conf, verbose=verbose)
+        elif rects is None:
+            results = self.confirm_model(frame, conf=self.confirm_conf, verbose=verbose, **kw)
+        else:
+            crops = RoiSet(rects, imgsz or 640)
+            results = crops.predict(self.confirm_model, frame, conf=self.confirm_conf, verbose=verbose)
+            if rois is not None:
+                # a padded crop can reach past a region's edge
+                results = [rois.filter(r) for r in results]
+            self.stats['crops'] += len(rects)
+        t2 = time.perf_counter()
+        self.stats['confirm_ms'] += (t2 - t1) * 1000
+        tracer.complete('confirm', t1 * 1e6, t2 * 1e6, 'cascade')
+        return results
+
+    def summary(self):
+        s = dict(self.stats)
+        n = max(1, s['frames'])
+        s['escalation_rate'] = s['escalated'] / n
+        s['screen_ms_mean'] = s.pop('screen_ms') / n
+        s['confirm_ms_per_escalation'] = s.pop('confirm_ms') / max(1, s['escalated'])
+        return s
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"Cascade: {s['frames']} frames, {s['escalated']} escalated ({s['escalation_rate']:.1%}), "
+              f"{s['accepted']} accepted by the screening model, {s['crops']} crops | "
+              f"screen {s['screen_ms_mean']:.1f} ms/frame, confirm {s['confirm_ms_per_escalation']:.1f} ms/escalation")
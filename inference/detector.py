@@ -0,0 +1,356 @@
+"""
+In-process detection: load and warm the model once, then stream frames.
+
+    from inference import Detector, detect_stream, open_source
+
+    detector = Detector('models/raw_2026_01_11_001_best.pt', conf=0.5)
+    for r in detect_stream(detector, open_source('usb0')):
+        print(r.index, r.ts, r.boxes)        # (N, 6) float32: x1, y1, x2, y2, conf, cls
+
+Cascade (confirm_model), regions of interest (rois), the latency target
+(target_ms), the enhancement stage (enhance, see enhance.py) and the CPU
+runtime options (runtime, see runtime.py) are the
+same features as the yolo_detect*.py command lines, which are thin
+wrappers over this module.
+"""
+
+import glob
+import os
+import time
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.engine.results import Results
+
+from .adaptive_imgsz import ImgszController
+from .cascade import Cascade
+from .enhance import FrameEnhancer
+from .runtime import configure_threads, prepare, runtime_options
+from .stage_timer import StageTimer
+
+MODEL_DIRS = ['models', 'models/original', 'models/sharpen']
+
+# Tableau 10 color scheme
+BBOX_COLORS = [(164,120,87), (68,148,228), (93,97,209), (178,182,133), (88,159,106),
+               (96,202,231), (159,124,168), (169,162,241), (98,118,150), (172,176,184)]
+
+
+def latest_model(folder, pattern='*.pt'):
+    """Newest file matching pattern in folder (by modification time), or None."""
+    files = glob.glob(os.path.join(folder, pattern))
+    return max(files, key=os.path.getmtime) if files else None
+
+
+def resolve_model(model=None, path=None):
+    """model if given, else the newest .pt in models/<path>, else in models/ (then models/original, models/sharpen)."""
+    if model:
+        if not os.path.exists(model):
+            raise FileNotFoundError(f'Model not found: {model}')
+        return model
+    for folder in ([os.path.join('models', path)] if path else MODEL_DIRS):
+        found = latest_model(folder)
+        if found:
+            return found
+    raise FileNotFoundError('No model found in models/ folder.')
+
+
+class FrameResult(NamedTuple):
+    frame: np.ndarray      # BGR frame as inferred (after preprocessing)
+    boxes: np.ndarray      # (N, 6) float32: x1, y1, x2, y2, conf, cls (source image pixels)
+    index: int             # frame number in the source
+    ts: float              # capture time, epoch seconds (files: mtime, videos: start + position)
+    source: str            # image path, video path, usb0, screen, ...
+    scale: float = 1.0     # source pixels per frame pixel (> 1 for reduced JPEG decodes)
+
+    @property
+    def frame_boxes(self):
+        """boxes in frame pixels, for drawing on frame."""
+        if self.scale == 1.0:
+            return self.boxes
+        b = self.boxes.copy()
+        b[:, :4] /= self.scale
+        return b
+
+    @property
+    def size(self):
+        """(w, h) of the source image the boxes refer to."""
+        return (round(self.frame.shape[1] * self.scale), round(self.frame.shape[0] * self.scale))
+
+    @property
+    def xyxy(self):
+        return self.boxes[:, :4]
+
+    @property
+    def conf(self):
+        return self.boxes[:, 4]
+
+    @property
+    def cls(self):
+        return self.boxes[:, 5].astype(int)
+
+
+class Detector:
+
+    def __init__(self, model=None, path=None, conf=0.5, confirm_model=None, screen_conf=0.25,
+                 accept_conf=1.0, escalate='crops', rois=None, target_ms=0,
+                 imgsz_set=(320, 480, 640, 960), enhance=None, runtime=None):
+        self.runtime = runtime if runtime is not None else runtime_options()
+        configure_threads(self.runtime.threads, self.runtime.interop_threads)
+        self.model_path = resolve_model(model, path)
+        self.conf = conf
+
+        t0 = time.perf_counter()
+        self.model = YOLO(self.model_path, task='detect')
+        self.cascade = None
+        if confirm_model:
+            self.cascade = Cascade(self.model, YOLO(confirm_model, task='detect'), screen_conf, accept_conf,
+                                   conf, escalate)
+        self.load_ms = (time.perf_counter() - t0) * 1000
+        # class names of the model that has the last word
+        self.names = (self.cascade.confirm_model if self.cascade else self.model).names
+
+        self.rois = rois
+        self.ctl = ImgszController(target_ms, imgsz_set) if target_ms else None
+        # True for the enhance_yolo_aerial.py defaults, or a FrameEnhancer
+        self.enhancer = FrameEnhancer() if enhance is True else (enhance or None)
+        if self.enhancer is not None:
+            print(f'Enhancement: {self.enhancer.describe()}')
+        elif os.path.basename(self.model_path).startswith('enhanced'):
+            print('Note: this model was trained on enhanced images, consider --enhance')
+        self.runtime_report = None
+        self.warmup_shape = (640, 640, 3)
+        # (model, path, load_ms) staged by swap(), taken by the next results() call
+        self._pending = None
+
+    @property
+    def input_size(self):
+        """
+        Longest image side the models can use: larger frames are shrunk to it
+        anyway. 0 when full resolution matters (ROIs given in pixels).
+        """
+        if self.rois is not None and self.rois.in_pixels:
+            return 0
+        if self.ctl is not None:
+            return max(self.ctl.sizes)
+        sizes = [m.overrides.get('imgsz') or 640 for m in self.models]
+        return max(max(s) if isinstance(s, (list, tuple)) else s for s in sizes)
+
+    @property
+    def models(self):
+        return [self.model] if self.cascade is None else [self.model, self.cascade.confirm_model]
+
+    def warmup(self, shape=(640, 640, 3)):
+        """Apply the runtime options and warm up on a frame of this shape (prints the report)."""
+        self.warmup_shape = shape
+        self.runtime_report = prepare(self.models, self.runtime, shape, conf=self.conf)
+        return self.runtime_report
+
+    def load_replacement(self, path):
+        """
+        Load and warm up another weights file for swap() (any thread; raises if it does not load).
+        With a cascade it replaces the screening model.
+        """
+        t0 = time.perf_counter()
+        model = YOLO(path, task='detect')
+        prepare([model], self.runtime, self.warmup_shape, conf=self.conf)
+        return model, (time.perf_counter() - t0) * 1000
+
+    def swap(self, model, path, load_ms=0.0):
+        """Stage a loaded model; the next results() call switches to it (a single assignment)."""
+        self._pending = (model, path, load_ms)
+
+    def _use(self, model, path):
+        self.model, self.model_path = model, path
+        if self.cascade is not None:
+            self.cascade.screen_model = model
+        else:
+            self.names = model.names
+
+    def results(self, frame):
+        """Ultralytics Results for one BGR frame, in frame coordinates."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            # between frames; the previous model is kept until the new one has run once
+            previous = (self.model, self.model_path)
+            model, path, load_ms = pending
+            self._use(model, path)
+            print(f'Hot-swap: now using {path} (loaded and warmed in {load_ms:.0f} ms)')
+            try:
+                return self._results(frame)
+            except Exception as e:
+                self._use(*previous)
+                print(f'Hot-swap: {path} failed on the first frame ({e}), rolled back to {self.model_path}')
+        return self._results(frame)
+
+    def _warm_sizes(self, frame):
+        """Every input size the controller can pick, for every model and the ROI canvas."""
+        def size_set(size):
+            if self.rois is not None:
+                self.rois.set_imgsz(size)
+
+        # the confirm model too: the loop's pass at a size may not escalate
+        for size in self.ctl.sizes:
+            size_set(size)
+            for m in self.models:
+                if self.rois is not None:
+                    self.rois.predict(m, frame, conf=self.conf, verbose=False)
+                else:
+                    m(frame, imgsz=size, conf=self.conf, verbose=False)
+
+        def run(size):
+            # the loop's own path, which the controller times
+            size_set(size)
+            self._infer(frame, {'imgsz': size})
+
+        self.ctl.warmup(run)
+        size_set(self.ctl.size)
+
+    def _results(self, frame):
+        kw = {}
+        if self.ctl is not None:
+            if not self.ctl.infer_ms:
+                self._warm_sizes(frame)
+            kw['imgsz'] = self.ctl.size
+            if self.rois is not None:
+                self.rois.set_imgsz(self.ctl.size)
+        return self._infer(frame, kw)
+
+    def _infer(self, frame, kw):
+        if self.cascade is not None:
+            return self.cascade.predict(frame, self.rois, **kw)[0]
+        if self.rois is not None:
+            return self.rois.predict(self.model, frame, conf=self.conf, verbose=False)[0]
+        return self.model(frame, conf=self.conf, verbose=False, **kw)[0]
+
+    def predict(self, frame):
+        """(N, 6) float32 array for one BGR frame: x1, y1, x2, y2, conf, cls."""
+        if self.enhancer is not None:
+            frame = self.enhancer(frame)
+        return to_array(self.results(frame))
+
+    def update(self, frame_ms, inference_ms, backlog=0):
+        """Feed one frame's latency to the input-size controller (no-op without a target)."""
+        if self.ctl is not None:
+            self.ctl.update(frame_ms, inference_ms, backlog)
+
+    def summary(self):
+        s = {'model': self.model_path, 'model_load_ms': self.load_ms, 'runtime': self.runtime_report}
+        if self.enhancer is not None:
+            s['enhance'] = self.enhancer.describe()
+        if self.cascade is not None:
+            s['cascade'] = self.cascade.summary()
+        if self.ctl is not None:
+            s['imgsz'] = self.ctl.summary()
+        return s
+
+    def print_summary(self):
+        if self.cascade is not None:
+            self.cascade.print_summary()
+        if self.ctl is not None:
+            print(f"Frames per input size: {self.ctl.frames_per_size}")
+
+
+def to_array(results):
+    return results.boxes.data.cpu().numpy().astype(np.float32, copy=False)
+
+
+def detect_stream(detector, source, resolution=None, pool=None, timer=None):
+    """
+    Yield a FrameResult for every frame of source (any iterable of sources.Frame).
+
+    resolution  (w, h) to resize frames to before inference
+    pool        FramePool for the preprocessing buffers; a yielded frame is
+                returned to it when the next one is requested, copy it to keep it
+                (the same holds for enhanced frames, whose buffer is reused)
+    timer       StageTimer to record capture / preprocess / inference /
+                postprocess in; the caller then ends each frame with
+                timer.frame_done(). Without one the stream keeps its own.
+    """
+    own_timer = timer is None
+    if own_timer:
+        timer = StageTimer()
+    if detector.runtime_report is None:
+        if resolution:
+            shape = (resolution[1], resolution[0], 3)
+        else:
+            shape = getattr(source, 'shape', None) or (640, 640, 3)
+        detector.warmup(shape)
+
+    frames = iter(source)
+    w, h = resolution or (0, 0)
+    timer.reset_frame_clock()
+    while True:
+        with timer.stage('capture'):
+            item = next(frames, None)
+        if item is None:
+            break
+
+        with timer.stage('preprocess'):
+            frame = item.image
+            # buffers from the pool go back to it once replaced or consumed
+            pooled = pool is not None and getattr(source, 'pool', None) is pool
+            if frame.ndim == 3 and frame.shape[2] == 4:
+                # screen grabs are BGRA
+                bgr = (pool.cvt_color(frame, cv2.COLOR_BGRA2BGR, 3) if pool is not None
+                       else cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR))
+                if pooled:
+                    pool.release(frame)
+                frame, pooled = bgr, pool is not None
+            if resolution and frame.shape[:2] != (h, w):
+                resized = pool.resize(frame, (w, h)) if pool is not None else cv2.resize(frame, (w, h))
+                if pooled:
+                    pool.release(frame)
+                frame, pooled = resized, pool is not None
+
+        if detector.enhancer is not None:
+            # separate stage, so its cost can be weighed against the accuracy it buys
+            with timer.stage('enhance'):
+                enhanced = detector.enhancer(frame)
+                if pooled:
+                    pool.release(frame)
+                frame, pooled = enhanced, False
+
+        with timer.stage('inference'):
+            results = detector.results(frame)
+        with timer.stage('postprocess'):
+            boxes = to_array(results)
+            # reduced decode: back to original image pixels
+            scale = getattr(item, 'scale', 1.0)
+            if scale != 1.0 and not resolution:
+                boxes[:, :4] *= scale
+            else:
+                scale = 1.0
+
+        frames_before = timer.frames
+        yield FrameResult(frame, boxes, item.index, item.ts, item.source, scale)
+
+        if own_timer:
+            timer.frame_done()
+        if pooled:
+            pool.release(frame)
+        # the first frame includes the warm-up, it does not count for the controller
+        if timer.frames > frames_before and timer.frame_times:
+            # frames a threaded camera dropped while this one was processed
+            detector.update(timer.last['frame'], timer.last.get('inference', 0.0), getattr(source, 'backlog', 0))
+
+
+def draw_boxes(frame, boxes, names):
+    """Boxes with class name and confidence, drawn in place; returns the number drawn."""
+    for x1, y1, x2, y2, conf, cls in boxes:
+        xmin, ymin, xmax, ymax, classidx = int(x1), int(y1), int(x2), int(y2), int(cls)
+        color = BBOX_COLORS[classidx % 10]
+        cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), color, 2)
+        label = f'{names[classidx]}: {int(conf*100)}%'
+        labelSize, baseLine = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        label_ymin = max(ymin, labelSize[1] + 10) # Make sure not to draw label too close to top of window
+        cv2.rectangle(frame, (xmin, label_ymin-labelSize[1]-10), (xmin+labelSize[0], label_ymin+baseLine-10), color, cv2.FILLED)
+        cv2.putText(frame, label, (xmin, label_ymin-7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    return len(boxes)
+
+
+def plot(frame, boxes, names):
+    """Ultralytics-style annotated copy of frame."""
+    return Results(frame, path='', names=names, boxes=torch.from_numpy(boxes)).plot()
@@ -0,0 +1,145 @@
+"""
+Real-time version of the enhancement in scripts/enhance_yolo_aerial.py
+(CLAHE on LAB luminance, then a mild unsharp mask), for running
+models/enhanced_*_best.pt on frames like the ones they were trained on.
+
+    add_enhance_args(parser)
+    args = parser.parse_args()
+    enhancer = FrameEnhancer.from_args(args)     # None without --enhance
+    frame = enhancer(frame)                      # valid until the next call
+
+Per frame:
+  - CLAHE runs on L at --enhance-scale of the frame size. The default 1
+    gives the training result exactly (within one grey level); below 1
+    only the correction (CLAHE(L) - L) is upscaled and added, which is
+    faster but no longer matches training (0.5 on bus.jpg: mean 5.9, up
+    to 71 grey levels off).
+  - the CLAHE object, Gaussian kernel and all buffers are made once per
+    frame size; every full-resolution step writes into them (uint8,
+    saturating), nothing is allocated per frame.
+  - the full-resolution steps run on horizontal stripes in a thread pool
+    (OpenCV releases the GIL), each stripe with a halo for the blur.
+
+--us-threshold from enhance_yolo_aerial.py is not supported (default 0).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def add_enhance_args(parser):
+    g = parser.add_argument_group('Enhancement (as scripts/enhance_yolo_aerial.py)')
+    g.add_argument('--enhance', action='store_true',
+                   help='CLAHE + unsharp mask every frame before inference (for enhanced_* models)')
+    g.add_argument('--enhance-scale', type=float, default=1.0,
+                   help='Resolution of the CLAHE pass relative to the frame (1 = as in training; '
+                        'e.g. 0.5 is faster but differs from the training images)')
+    g.add_argument('--enhance-stripes', type=int, default=0,
+                   help='Frame stripes processed in parallel (0 = one per core, up to 4)')
+    g.add_argument('--clahe-clip', type=float, default=1.8)
+    g.add_argument('--clahe-grid', type=int, default=8)
+    g.add_argument('--us-sigma', type=float, default=0.8)
+    g.add_argument('--us-amount', type=float, default=0.25)
+    return g
+
+
+def enhance_options(args):
+    """The --enhance* / --clahe* / --us* values of args as FrameEnhancer keyword arguments."""
+    return {'clip': args.clahe_clip, 'grid': args.clahe_grid, 'sigma': args.us_sigma,
+            'amount': args.us_amount, 'scale': args.enhance_scale, 'stripes': args.enhance_stripes}
+
+
+class FrameEnhancer:
+
+    def __init__(self, clip=1.8, grid=8, sigma=0.8, amount=0.25, scale=1.0, stripes=0):
+        self.clip = float(clip)
+        self.grid = int(grid)
+        self.sigma = float(sigma)
+        self.amount = float(amount)
+        self.scale = min(1.0, max(0.05, float(scale)))
+        self.stripes = stripes or min(4, os.cpu_count() or 1)
+        self.clahe = cv2.createCLAHE(clipLimit=self.clip, tileGridSize=(self.grid, self.grid))
+        # same kernel size as GaussianBlur(img, (0, 0), sigma) on uint8 in enhance_yolo_aerial.py
+        ksize = int(round(self.sigma * 6 + 1)) | 1
+        self.kernel = cv2.getGaussianKernel(ksize, self.sigma)
+        self.halo = ksize // 2
+        self.pool = ThreadPoolExecutor(self.stripes, thread_name_prefix='enhance') if self.stripes > 1 else None
+        self._shape = None
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(**enhance_options(args)) if getattr(args, 'enhance', False) else None
+
+    def describe(self):
+        match = 'as in training' if self.scale >= 1.0 else 'approximate, differs from training'
+        return (f'CLAHE clip {self.clip} grid {self.grid} at {self.scale:g}x ({match}), '
+                f'unsharp sigma {self.sigma} amount {self.amount}, {self.stripes} stripe(s)')
+
+    def _allocate(self, shape):
+        h, w = shape[:2]
+        sw, sh = max(self.grid, round(w * self.scale)), max(self.grid, round(h * self.scale))
+        self.small_size = (sw, sh)
+        self.small = np.empty((sh, sw, 3), np.uint8)
+        self.small_lab = np.empty((sh, sw, 3), np.uint8)
+        self.small_l = np.empty((sh, sw), np.uint8)
+        self.small_eq = np.empty((sh, sw), np.uint8)
+        self.small_delta = np.empty((sh, sw), np.int16)
+        self.delta = np.empty((h, w), np.int16) if self.scale < 1.0 else self.small_delta
+        self.out = np.empty((h, w, 3), np.uint8)
+        # stripe rows a..b, read with halo rows pa..pb into its own work buffers
+        # (neighbouring halos overlap, so the buffers cannot be shared)
+        bounds = np.linspace(0, h, self.stripes + 1).astype(int)
+        self.work = []
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if b > a:
+                pa, pb = max(0, a - self.halo), min(h, b + self.halo)
+                n = pb - pa
+                self.work.append((a, b, pa, pb, np.empty((n, w, 3), np.uint8), np.empty((n, w), np.uint8),
+                                  np.empty((n, w, 3), np.uint8), np.empty((n, w, 3), np.uint8)))
+        self._shape = shape
+
+    def __call__(self, frame):
+        """Enhanced copy of a BGR uint8 frame; the returned buffer is reused by the next call."""
+        if frame.shape != self._shape:
+            self._allocate(frame.shape)
+
+        # luminance correction from the low-resolution CLAHE pass
+        if self.scale < 1.0:
+            cv2.resize(frame, self.small_size, dst=self.small, interpolation=cv2.INTER_AREA)
+            small = self.small
+        else:
+            small = frame
+        cv2.cvtColor(small, cv2.COLOR_BGR2LAB, dst=self.small_lab)
+        cv2.extractChannel(self.small_lab, 0, dst=self.small_l)
+        self.clahe.apply(self.small_l, dst=self.small_eq)
+        cv2.subtract(self.small_eq, self.small_l, dst=self.small_delta, dtype=cv2.CV_16S)
+        if self.scale < 1.0:
+            cv2.resize(self.small_delta, self.delta.shape[::-1], dst=self.delta, interpolation=cv2.INTER_LINEAR)
+
+        if self.pool is None:
+            for work in self.work:
+                self._stripe(frame, *work)
+        else:
+            # list() re-raises a stripe's exception here
+            list(self.pool.map(lambda work: self._stripe(frame, *work), self.work))
+        return self.out
+
+    def _stripe(self, frame, a, b, pa, pb, lab, l, bgr, blur):
+        # the blur needs halo rows above and below, so those are enhanced too
+        cv2.cvtColor(frame[pa:pb], cv2.COLOR_BGR2LAB, dst=lab)
+        cv2.extractChannel(lab, 0, dst=l)
+        cv2.add(l, self.delta[pa:pb], dst=l, dtype=cv2.CV_8U)
+        cv2.insertChannel(l, lab, 0)
+        cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=bgr)
+
+        # unsharp mask: out = (1 + amount) * bgr - amount * blur, saturated to uint8
+        cv2.sepFilter2D(bgr, -1, self.kernel, self.kernel, dst=blur, borderType=cv2.BORDER_REFLECT_101)
+        cv2.addWeighted(bgr[a - pa:b - pa], 1.0 + self.amount, blur[a - pa:b - pa], -self.amount, 0,
+                        dst=self.out[a:b])
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
@@ -0,0 +1,244 @@
+"""
+Detection event store: every detection from the inference scripts in one
+SQLite file, indexed for time + region queries.
+
+    store = EventStore('runs/detections.db')
+    store.add('usb0', frame_idx, time.time(), xyxy, class_names, conf, (w, h))
+    ...
+    store.close()
+
+Writes go through a background thread in batched transactions, so add()
+only costs a queue put in the inference loop. Boxes are indexed in an
+R-tree over (time, normalized x, normalized y), so region queries use
+fractions of the frame (0..1) and work across resolutions.
+
+Query:
+  python inference/event_store.py --from "2026-01-11 14:00" --to "2026-01-11 15:00" --region 0.2,0.4,0.8,0.6
+  python inference/event_store.py --class Airplane --min-conf 0.7 --frames
+  python inference/event_store.py --source archive.mp4 --limit 20
+"""
+
+import os
+import sys
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+if __package__ in (None, ''):
+    # run as a script (python inference/event_store.py): import through the package
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from inference.profiler import tracer
+
+DB_DEFAULT = os.path.join('runs', 'detections.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    class TEXT NOT NULL,
+    conf REAL NOT NULL,
+    xmin REAL, ymin REAL, xmax REAL, ymax REAL,
+    width INTEGER, height INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS detections_class_ts ON detections (class, ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS detections_rtree USING rtree (
+    id, min_t, max_t, min_x, max_x, min_y, max_y
+);
+"""
+
+
+def connect(path):
+    con = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    # WAL: queries can run while a live loop keeps writing
+    con.execute('PRAGMA journal_mode=WAL')
+    con.execute('PRAGMA synchronous=NORMAL')
+    con.executescript(SCHEMA)
+    return con
+
+
+class EventStore:
+
+    def __init__(self, path=DB_DEFAULT, batch_size=500, flush_interval=1.0, max_queue=10000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(max_queue)
+        self._sources = {}
+        self._con = connect(path)
+        self._thread = threading.Thread(target=self._writer, name='event-store', daemon=True)
+        self._thread.start()
+
+    def add(self, source, frame, ts, xyxy, classes, conf, size):
+        """Queue one frame's detections (xyxy pixels, class names, confidences, frame (w, h))."""
+        if len(conf) == 0:
+            return
+        try:
+            self._queue.put_nowait((source, int(frame), float(ts), xyxy, classes, conf, size))
+        except queue.Full:
+            # never block the inference loop on disk
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._con.close()
+        if self.dropped:
+            print(f'Event store: {self.dropped} frames dropped (writer could not keep up)')
+        print(f'Event store: {self.written} detections saved to {self.path}')
+
+    def _source_id(self, name):
+        if name not in self._sources:
+            self._con.execute('INSERT OR IGNORE INTO sources (name) VALUES (?)', (name,))
+            self._sources[name] = self._con.execute('SELECT id FROM sources WHERE name = ?', (name,)).fetchone()[0]
+        return self._sources[name]
+
+    def _flush(self, items):
+        rows = []
+        self._con.execute('BEGIN IMMEDIATE')
+        for source, frame, ts, xyxy, classes, conf, (w, h) in items:
+            sid = self._source_id(source)
+            for (x1, y1, x2, y2), c, p in zip(xyxy, classes, conf):
+                rows.append((sid, frame, ts, c, float(p), float(x1), float(y1), float(x2), float(y2), w, h))
+        last = self._con.execute('SELECT COALESCE(MAX(id), 0) FROM detections').fetchone()[0]
+        self._con.executemany(
+            'INSERT INTO detections (source_id, frame, ts, class, conf, xmin, ymin, xmax, ymax, width, height) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        # the write lock is held since BEGIN IMMEDIATE, so ids > last are exactly this batch
+        self._con.execute(
+            'INSERT INTO detections_rtree '
+            'SELECT id, ts, ts, xmin / width, xmax / width, ymin / height, ymax / height '
+            'FROM detections WHERE id > ?', (last,))
+        self._con.execute('COMMIT')
+        self.written += len(rows)
+
+    def _writer(self):
+        items = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item:
+                items.append(item)
+            if items and (item is None or len(items) >= self.batch_size or time.monotonic() >= deadline):
+                with tracer.span('db write', 'io', frames=len(items)):
+                    self._flush(items)
+                items = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if item is None:
+                return
+
+
+def video_start_time(path, fps, n_frames):
+    """Best guess of when a video file was recorded: modification time minus its duration."""
+    duration = n_frames / fps if fps and n_frames > 0 else 0.0
+    return os.path.getmtime(path) - duration
+
+
+# -------------------------------------------------
+# Query
+# -------------------------------------------------
+def parse_time(text):
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def query(con, t_from=None, t_to=None, region=None, classes=None, min_conf=0.0, source=None, limit=None):
+    t_from = -1e18 if t_from is None else t_from
+    t_to = 1e18 if t_to is None else t_to
+    where = ['d.ts BETWEEN ? AND ?', 'd.conf >= ?']
+    params = [t_from, t_to, min_conf]
+
+    if region is not None:
+        # R-tree narrows by time + box overlap; exact ts check stays on the main table
+        # (R-tree coordinates are 32-bit floats)
+        x1, y1, x2, y2 = region
+        sql = ('SELECT d.*, s.name FROM detections_rtree r '
+               'JOIN detections d ON d.id = r.id JOIN sources s ON s.id = d.source_id '
+               'WHERE r.max_t >= ? AND r.min_t <= ? AND r.max_x >= ? AND r.min_x <= ? '
+               'AND r.max_y >= ? AND r.min_y <= ? AND ')
+        params = [t_from, t_to, x1, x2, y1, y2] + params
+    else:
+        sql = 'SELECT d.*, s.name FROM detections d JOIN sources s ON s.id = d.source_id WHERE '
+
+    if classes:
+        where.append(f'd.class IN ({",".join("?" * len(classes))})')
+        params += classes
+    if source:
+        where.append('s.name = ?')
+        params.append(source)
+
+    sql += ' AND '.join(where) + ' ORDER BY d.ts, d.id'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    con.row_factory = sqlite3.Row
+    return con.execute(sql, params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query stored detections')
+    parser.add_argument('--db', default=DB_DEFAULT, help='Event store file')
+    parser.add_argument('--from', dest='t_from', default=None, help='Start time (ISO "2026-01-11 14:00" or unix seconds)')
+    parser.add_argument('--to', dest='t_to', default=None, help='End time')
+    parser.add_argument('--region', default=None, help='x1,y1,x2,y2 as fractions of the frame (boxes overlapping it)')
+    parser.add_argument('--class', dest='classes', nargs='*', default=None, help='Class names')
+    parser.add_argument('--min-conf', type=float, default=0.0)
+    parser.add_argument('--source', default=None, help='Only this source (as passed to --source)')
+    parser.add_argument('--frames', action='store_true', help='One line per matching frame instead of per detection')
+    parser.add_argument('--limit', type=int, default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f'No event store at {args.db}')
+        sys.exit(1)
+
+    region = [float(v) for v in args.region.split(',')] if args.region else None
+    con = connect(args.db)
+    rows = query(con,
+                 parse_time(args.t_from) if args.t_from else None,
+                 parse_time(args.t_to) if args.t_to else None,
+                 region, args.classes, args.min_conf, args.source,
+                 None if args.frames else args.limit)
+
+    if args.frames:
+        frames = {}
+        for r in rows:
+            key = (r['name'], r['frame'])
+            if key not in frames:
+                frames[key] = [r['ts'], 0, 0.0]
+            frames[key][1] += 1
+            frames[key][2] = max(frames[key][2], r['conf'])
+        items = list(frames.items())[:args.limit]
+        for (name, frame), (ts, n, best) in items:
+            print(f'{datetime.fromtimestamp(ts):%Y-%m-%d %H:%M:%S.%f}'[:-3] + f'  {name}  frame {frame}  '
+                  f'{n} detection(s), max conf {best:.2f}')
+        print(f'{len(frames)} frame(s)')
+        return
+
+    for r in rows:
+        print(f'{datetime.fromtimestamp(r["ts"]):%Y-%m-%d %H:%M:%S.%f}'[:-3] + f'  {r["name"]}  frame {r["frame"]}  '
+              f'{r["class"]} {r["conf"]:.2f}  [{r["xmin"]:.0f}, {r["ymin"]:.0f}, {r["xmax"]:.0f}, {r["ymax"]:.0f}]')
+    print(f'{len(rows)} detection(s)')
+
+
+if __name__ == '__main__':
+    main()
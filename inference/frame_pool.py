@@ -0,0 +1,70 @@
+"""
+Reusable frame buffers for the capture / preprocessing loops.
+
+    pool = FramePool()
+    ret, raw = pool.read(cap)                         # cap.read() into a pooled buffer
+    frame = pool.resize(raw, (resW, resH))            # cv2.resize(..., dst=pooled)
+    pool.release(raw)
+    ... inference, draw, display, record ...
+    pool.release(frame)                               # back to the pool for the next frame
+
+In steady state every frame reuses the same few arrays instead of
+allocating new ones, which removes allocator churn (RSS growth and
+latency spikes) at high frame rates. A buffer that is never released is
+simply garbage collected; the pool then allocates a fresh one.
+"""
+
+import threading
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+
+class FramePool:
+
+    def __init__(self, max_per_shape=4):
+        self.max_per_shape = max_per_shape
+        self.allocated = 0
+        self._free = defaultdict(list)
+        self._lock = threading.Lock()
+        self._read_shapes = {}
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free[key]
+            if free:
+                return free.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype)
+
+    def release(self, *buffers):
+        with self._lock:
+            for buf in buffers:
+                if buf is None:
+                    continue
+                free = self._free[(buf.shape, buf.dtype)]
+                if len(free) < self.max_per_shape and not any(b is buf for b in free):
+                    free.append(buf)
+
+    def read(self, cap):
+        """cap.read() into a pooled buffer; the first frame of each capture learns its shape."""
+        shape = self._read_shapes.get(id(cap))
+        buf = self.acquire(shape) if shape else None
+        ret, frame = cap.read(buf)
+        if frame is not buf:
+            # first frame, or the capture changed size
+            self.release(buf)
+            if ret and frame is not None:
+                self._read_shapes[id(cap)] = frame.shape
+        return ret, frame
+
+    def resize(self, src, size, interpolation=cv2.INTER_LINEAR):
+        w, h = size
+        dst = self.acquire((h, w) + src.shape[2:], src.dtype)
+        return cv2.resize(src, (w, h), dst=dst, interpolation=interpolation)
+
+    def cvt_color(self, src, code, channels):
+        dst = self.acquire(src.shape[:2] + ((channels,) if channels > 1 else ()), src.dtype)
+        return cv2.cvtColor(src, code, dst=dst)
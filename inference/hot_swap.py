@@ -0,0 +1,125 @@
+"""
+Model hot-swap for the live detection loops.
+
+    watcher = ModelWatcher(detector, 'models')   # pattern: the running model's family
+    ...                                  # frames keep flowing
+    watcher.close()
+
+A background thread polls the folder for a weights file that appears or
+changes after start-up (SIGHUP checks right away, and also takes the newest
+file if it was already there at start-up). It is loaded and warmed up in
+that thread with the same runtime options while the loop keeps running on
+the current model, then staged with detector.swap(); the next frame
+switches over, so no frame waits on the load. A file that fails to load or warm up is skipped and
+remembered (until it changes again), the current model stays; one that
+fails on its first real frame is rolled back by the detector.
+
+    kill -HUP <pid>                      # reload now instead of at the next poll
+
+Without a pattern only the running model's family is watched (see
+family_pattern): raw_..._best.pt is replaced by a newer raw_*_best.pt, never
+by an enhanced_, raw-nano_ or raw-pruned<NN>_ model, which need other
+options or belong in another cascade stage.
+"""
+
+import os
+import re
+import signal
+import threading
+import time
+
+from .detector import latest_model
+
+
+# <family>_<yyyy>_<mm>_<dd>_<idx>_best.pt as written by scripts/train.py and prune.py
+_RUN_NAME = re.compile(r'^(?P<family>.+?)_\d{4}_\d{2}_\d{2}_\d+_best\.pt$')
+
+
+def family_pattern(model_path):
+    """Glob for newer runs of the same model family, e.g. raw_*_best.pt; the file itself if not a run name."""
+    name = os.path.basename(model_path)
+    m = _RUN_NAME.match(name)
+    return f"{m.group('family')}_*_best.pt" if m else name
+
+
+class ModelWatcher:
+
+    def __init__(self, detector, folder='models', pattern=None, interval=2.0, settle=1.0,
+                 reload_signal=True):
+        self.detector = detector
+        self.folder = folder
+        self.pattern = pattern or family_pattern(detector.model_path)
+        self.interval = interval
+        # a file modified less than settle seconds ago may still be being copied
+        self.settle = settle
+        self.current = self._key(detector.model_path)
+        # what was there at start-up does not count as new
+        newest = latest_model(folder, self.pattern)
+        self.baseline = self._key(newest) if newest else None
+        self.failed = set()
+        self.swaps = []
+        self.failures = []
+        self._wake = threading.Event()
+        self._forced = False
+        self._stop = threading.Event()
+
+        if reload_signal and hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda *_: self.reload())
+
+        self._thread = threading.Thread(target=self._run, name='model-watch', daemon=True)
+        self._thread.start()
+        print(f"Hot-swap: watching {os.path.join(folder, self.pattern)} every {interval:g} s"
+              f"{' (SIGHUP reloads now)' if reload_signal and hasattr(signal, 'SIGHUP') else ''}")
+
+    @staticmethod
+    def _key(path):
+        try:
+            return (os.path.abspath(path), os.path.getmtime(path))
+        except OSError:
+            return (os.path.abspath(path), None)
+
+    def reload(self):
+        """Load the newest model now unless it is the running one (what SIGHUP does)."""
+        self._forced = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            forced, self._forced = self._forced, False
+            if self._stop.is_set():
+                break
+            candidate = latest_model(self.folder, self.pattern)
+            if candidate is None:
+                continue
+            key = self._key(candidate)
+            if key == self.current or key in self.failed or key[1] is None:
+                continue
+            if key == self.baseline and not forced:
+                continue
+            if time.time() - key[1] < self.settle:
+                # picked up again at the next poll
+                continue
+            self._load(candidate, key)
+
+    def _load(self, path, key):
+        print(f'Hot-swap: loading {path} in the background')
+        try:
+            model, load_ms = self.detector.load_replacement(path)
+        except Exception as e:
+            self.failed.add(key)
+            self.failures.append({'path': path, 'error': str(e), 'time': time.time()})
+            print(f'Hot-swap: {path} failed to load ({e}), keeping {self.detector.model_path}')
+            return
+        self.detector.swap(model, path, load_ms)
+        self.current = key
+        self.swaps.append({'path': path, 'load_ms': load_ms, 'time': time.time()})
+
+    def summary(self):
+        return {'folder': self.folder, 'pattern': self.pattern, 'swaps': self.swaps, 'failures': self.failures}
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
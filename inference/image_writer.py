@@ -0,0 +1,138 @@
+"""
+Background encoder pool for annotated images.
+
+    writer = ImageWriter('out/', fmt='webp', quality=80, thumbnail=1280)
+    path = writer.submit('result_001_a.jpg', annotated)   # returns at once
+    ...
+    writer.flush()                                        # everything submitted is on disk
+    writer.close()                                        # waits for the queue
+
+Encoding and writing run on `workers` threads (cv2.imencode and file
+writes release the GIL), fed by a bounded queue: submit() only blocks when
+`queue` images are already waiting, so memory stays bounded when the disk
+is slower than inference. Images are never dropped; the caller must not
+modify an image after submitting it. An image can also be submitted as a
+function returning it, which then runs on the worker (e.g. a full-size
+decode + draw that should not hold up the loop).
+
+fmt        jpg / png / webp, or None for the extension of the name
+quality    JPEG / WebP quality 1-100 (PNG is lossless, fastest compression level)
+thumbnail  longest side of the written image in pixels (0 = full size)
+"""
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from .profiler import tracer
+
+FORMATS = {'jpg': '.jpg', 'png': '.png', 'webp': '.webp'}
+
+
+def encode_params(ext, quality):
+    if ext in ('.jpg', '.jpeg'):
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if ext == '.webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    if ext == '.png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+    return []
+
+
+class ImageWriter:
+
+    def __init__(self, folder, fmt=None, quality=95, thumbnail=0, workers=0, queue_size=0):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.ext = FORMATS[fmt] if fmt else None
+        self.quality = quality
+        self.thumbnail = thumbnail
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.written = 0
+        self.failed = 0
+        self.bytes = 0
+        self.encode_s = 0.0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(queue_size or 2 * self.workers)
+        self._threads = [threading.Thread(target=self._worker, name=f'image-writer-{i}', daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def path_for(self, name):
+        """Output path of name, with the extension of the chosen format."""
+        if self.ext:
+            name = os.path.splitext(name)[0] + self.ext
+        return os.path.join(self.folder, name)
+
+    def submit(self, name, image):
+        """Queue image (or a function returning it) for writing as name; blocks while the queue is full. Returns the path."""
+        path = self.path_for(name)
+        self._queue.put((path, image))
+        return path
+
+    def flush(self):
+        """Block until every image submitted so far is written (or failed)."""
+        self._queue.join()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                self._process(*item)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, path, image):
+        t0 = time.perf_counter()
+        try:
+            if callable(image):
+                with tracer.span('render', 'io'):
+                    image = image()
+            with tracer.span('encode', 'io'):
+                self._write(path, image)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f'Image writer: {path} not written ({e})')
+        with self._lock:
+            self.encode_s += time.perf_counter() - t0
+
+    def _write(self, path, image):
+        if self.thumbnail:
+            h, w = image.shape[:2]
+            scale = self.thumbnail / max(h, w)
+            if scale < 1:
+                image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                                   interpolation=cv2.INTER_AREA)
+        ext = os.path.splitext(path)[1].lower()
+        ok, data = cv2.imencode(ext, image, encode_params(ext, self.quality))
+        if not ok:
+            raise ValueError(f'cannot encode {ext}')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            self.written += 1
+            self.bytes += data.nbytes
+
+    def summary(self):
+        return {'folder': self.folder, 'format': (self.ext or 'same as input').lstrip('.'), 'quality': self.quality,
+                'thumbnail': self.thumbnail, 'workers': self.workers, 'written': self.written,
+                'failed': self.failed, 'mb': self.bytes / 2**20,
+                'encode_ms_mean': self.encode_s * 1000 / max(1, self.written + self.failed)}
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        s = self.summary()
+        print(f"Image writer: {s['written']} images ({s['mb']:.1f} MB) written to {self.folder} by "
+              f"{self.workers} thread(s), {s['encode_ms_mean']:.1f} ms per image"
+              + (f", {self.failed} failed" if self.failed else ''))
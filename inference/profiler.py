@@ -0,0 +1,141 @@
+"""
+Chrome trace-event output (--profile) for the inference and dataset scripts.
+
+    from profiler import tracer
+    tracer.enable('runs/profile.json')
+    with tracer.span('decode'):
+        img = cv2.imread(path)
+    ...
+    tracer.save()
+
+Open the file in chrome://tracing or https://ui.perfetto.dev: one row per
+thread (and per worker process), one bar per span, so threads waiting on
+each other or on I/O show up as gaps. StageTimer stages are traced
+automatically.
+
+Disabled (the default), span() returns a shared no-op context and
+complete() returns after one attribute check, so instrumented code can
+stay in place. Worker processes record into their own tracer and ship
+their events back with take(); the parent adds them with extend().
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+PROFILE_DEFAULT = 'runs/profile.json'
+
+_NULL = nullcontext()
+
+
+def now_us():
+    # monotonic and system-wide, so timestamps from worker processes line up
+    return time.perf_counter_ns() / 1000
+
+
+class _Span:
+
+    __slots__ = ('tracer', 'name', 'cat', 'args', 't0')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.t0 = now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.t0, now_us(), self.cat, self.args)
+        return False
+
+
+class Tracer:
+
+    def __init__(self):
+        self.path = None
+        self.events = []
+        self._threads = {}
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def enable(self, path=PROFILE_DEFAULT):
+        if self._pid != os.getpid():
+            # forked worker: drop what was inherited from the parent
+            self.events, self._threads, self._pid = [], {}, os.getpid()
+        self.path = path
+
+    def span(self, name, cat='stage', **args):
+        if self.path is None:
+            return _NULL
+        return _Span(self, name, cat, args)
+
+    def complete(self, name, start_us, end_us, cat='stage', args=None):
+        """Record a finished span (timestamps from now_us())."""
+        if self.path is None:
+            return
+        tid = threading.get_native_id()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': end_us - start_us,
+                 'pid': os.getpid(), 'tid': tid}
+        if args:
+            event['args'] = args
+        # list.append is atomic, no lock needed between threads
+        self.events.append(event)
+
+    def counter(self, name, **values):
+        """Counter track (e.g. queue depths) shown above the thread rows."""
+        if self.path is None:
+            return
+        self.events.append({'name': name, 'ph': 'C', 'ts': now_us(), 'pid': os.getpid(), 'args': values})
+
+    def _metadata(self):
+        pid = os.getpid()
+        meta = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+                 'args': {'name': f'{os.path.basename(sys.argv[0]) or "python"} ({pid})'}}]
+        meta += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in self._threads.items()]
+        return meta
+
+    def take(self):
+        """Events recorded so far (with thread names), for sending to the parent process."""
+        if self.path is None:
+            return []
+        events, self.events = self.events, []
+        return events + self._metadata()
+
+    def extend(self, events):
+        if self.path is not None:
+            self.events.extend(events)
+
+    def save(self):
+        if self.path is None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w') as f:
+            events = self.events + self._metadata()
+            # worker metadata arrives once per chunk / job; keep one copy
+            seen = set()
+            events = [e for e in events if e['ph'] != 'M' or
+                      (key := (e['name'], e['pid'], e.get('tid'))) not in seen and not seen.add(key)]
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f'Profile: {len(self.events)} events -> {self.path} (open in chrome://tracing or ui.perfetto.dev)')
+        return self.path
+
+
+# one per process
+tracer = Tracer()
+
+
+def add_profile_arg(parser):
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DEFAULT, default=None,
+                        help=f'Write a Chrome trace of the pipeline stages (default file: {PROFILE_DEFAULT})')
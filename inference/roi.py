@@ -0,0 +1,186 @@
+"""
+Static regions of interest for fixed cameras.
+
+Regions are listed per source in a YAML file (see inference/roi.yaml).
+Points are fractions of the frame (0..1) or pixels (values above 1):
+
+    usb0:
+      - name: runway
+        polygon: [[0.02, 0.55], [0.98, 0.48], [0.98, 0.66], [0.02, 0.74]]
+      - name: apron
+        rect: [0.10, 0.10, 0.45, 0.40]
+
+Only the bounding crops of the regions are sent to the model, scaled by the
+same factor the full frame would get and batched in one call. Boxes are
+mapped back to frame coordinates, de-duplicated where crops overlap, and
+kept only if their center lies inside a region.
+
+    rois = load_rois('inference/roi.yaml', 'usb0')
+    results = rois.predict(model, frame, verbose=False)   # instead of model(frame)
+"""
+
+import os
+
+import cv2
+import numpy as np
+import torch
+import yaml
+from ultralytics.engine.results import Results
+
+STRIDE = 32
+PAD_VALUE = 114
+
+
+def _ceil(v, m=STRIDE):
+    return int(-(-v // m) * m)
+
+
+def nms(xyxy, conf, cls, iou=0.5):
+    """Greedy per-class NMS; returns kept indices sorted by confidence."""
+    order = np.argsort(-conf)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        lt = np.maximum(xyxy[i, :2], xyxy[rest, :2])
+        rb = np.minimum(xyxy[i, 2:], xyxy[rest, 2:])
+        inter = (rb - lt).clip(0).prod(1)
+        area = lambda b: (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+        overlap = inter / (area(xyxy[i]) + area(xyxy[rest]) - inter + 1e-9)
+        order = rest[(overlap < iou) | (cls[rest] != cls[i])]
+    return np.array(keep, dtype=int)
+
+
+class RoiSet:
+
+    def __init__(self, regions, imgsz=640):
+        self.regions = regions
+        self.imgsz = imgsz
+        self._shape = None
+
+    def _build(self, shape):
+        h, w = shape[:2]
+        self.polygons = []
+        for r in self.regions:
+            if 'rect' in r:
+                x1, y1, x2, y2 = r['rect']
+                pts = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+            else:
+                pts = r['polygon']
+            pts = np.asarray(pts, dtype=np.float64)
+            if pts.max() <= 1:
+                pts = pts * [w, h]
+            self.polygons.append(np.round(pts).astype(np.int32))
+
+        self.mask = np.zeros((h, w), np.uint8)
+        cv2.fillPoly(self.mask, self.polygons, 255)
+
+        self.crops = []
+        for pts in self.polygons:
+            x1, y1 = np.clip(pts.min(0), 0, [w - 1, h - 1])
+            x2, y2 = np.clip(pts.max(0) + 1, 1, [w, h])
+            self.crops.append((int(x1), int(y1), int(x2), int(y2)))
+
+        # same scale as full-frame inference, so objects keep the size the model expects
+        self.scale = min(1.0, self.imgsz / max(h, w))
+        sizes = [(max(1, round((y2 - y1) * self.scale)), max(1, round((x2 - x1) * self.scale)))
+                 for x1, y1, x2, y2 in self.crops]
+        self.sizes = sizes
+        self.canvas = (_ceil(max(s[0] for s in sizes)), _ceil(max(s[1] for s in sizes)))
+        self._shape = shape[:2]
+
+    @property
+    def in_pixels(self):
+        """True if any region is given in pixels rather than fractions of the frame."""
+        return any(np.max(r['rect'] if 'rect' in r else r['polygon']) > 1 for r in self.regions)
+
+    def set_imgsz(self, imgsz):
+        if imgsz != self.imgsz:
+            self.imgsz = imgsz
+            self._shape = None
+
+    @property
+    def pixel_fraction(self):
+        """Pixels sent to the model relative to full-frame inference."""
+        h, w = self._shape
+        full = _ceil(h * self.scale) * _ceil(w * self.scale)
+        return len(self.crops) * self.canvas[0] * self.canvas[1] / full
+
+    def batch(self, frame):
+        """Scaled crops padded to one canvas size (so the model sees them 1:1, batched)."""
+        if self._shape != frame.shape[:2]:
+            self._build(frame.shape)
+        ch, cw = self.canvas
+        out = []
+        for (x1, y1, x2, y2), (sh, sw) in zip(self.crops, self.sizes):
+            crop = frame[y1:y2, x1:x2]
+            if self.scale != 1.0:
+                crop = cv2.resize(crop, (sw, sh), interpolation=cv2.INTER_AREA)
+            out.append(cv2.copyMakeBorder(crop, 0, ch - sh, 0, cw - sw, cv2.BORDER_CONSTANT,
+                                          value=(PAD_VALUE,) * 3))
+        return out
+
+    def merge(self, results, frame, names):
+        """Crop results -> one Results on the full frame."""
+        xyxy, conf, cls = [], [], []
+        for r, (x1, y1, x2, y2) in zip(results, self.crops):
+            b = r.boxes
+            if not len(b):
+                continue
+            box = b.xyxy.cpu().numpy() / self.scale + [x1, y1, x1, y1]
+            xyxy.append(np.clip(box, [x1, y1, x1, y1], [x2, y2, x2, y2]))
+            conf.append(b.conf.cpu().numpy())
+            cls.append(b.cls.cpu().numpy())
+
+        if xyxy:
+            xyxy, conf, cls = np.concatenate(xyxy), np.concatenate(conf), np.concatenate(cls)
+            if len(self.crops) > 1:
+                keep = nms(xyxy, conf, cls)
+                xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+            data = np.column_stack([xyxy, conf, cls])[self.inside(xyxy)]
+        else:
+            data = np.zeros((0, 6), np.float32)
+        return Results(frame, path='', names=names, boxes=torch.from_numpy(data.astype(np.float32)))
+
+    def inside(self, xyxy):
+        """Boolean per box: non-empty with its centre inside a region."""
+        h, w = self._shape
+        cx = ((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(int).clip(0, w - 1)
+        cy = ((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(int).clip(0, h - 1)
+        return (self.mask[cy, cx] > 0) & (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+
+    def filter(self, result):
+        """Results of a frame (full-frame coordinates) without the boxes outside the regions."""
+        if self._shape != tuple(result.orig_shape):
+            self._build(result.orig_shape)
+        b = result.boxes
+        if not len(b):
+            return result
+        data = b.data.cpu().numpy()
+        keep = self.inside(data[:, :4])
+        return Results(result.orig_img, path=result.path, names=result.names,
+                       boxes=torch.from_numpy(data[keep].astype(np.float32)))
+
+    def predict(self, model, frame, **kwargs):
+        """Drop-in for model(frame, **kwargs): returns [Results] in frame coordinates."""
+        crops = self.batch(frame)
+        results = model(crops, imgsz=self.canvas, **kwargs)
+        return [self.merge(results, frame, model.names)]
+
+    def draw(self, frame, color=(0, 200, 255)):
+        if self._shape != frame.shape[:2]:
+            self._build(frame.shape)
+        cv2.polylines(frame, self.polygons, True, color, 1)
+
+
+def load_rois(path, source, imgsz=640):
+    """RoiSet for this source (exact name, then file name, then 'default'), or None."""
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    for key in (source, os.path.basename(str(source).rstrip('/\\')), 'default'):
+        if key in config:
+            print(f'ROI: {len(config[key])} region(s) for {key}')
+            return RoiSet(config[key], imgsz)
+    print(f'ROI: no regions for {source} in {path}, using the full frame')
+    return None
@@ -0,0 +1,121 @@
+"""
+CPU runtime settings shared by the inference scripts.
+
+    add_runtime_args(parser)
+    args = parser.parse_args()
+    configure_threads(args.threads, args.interop_threads)     # before any torch work
+    ...
+    model = YOLO(model_path)
+    report = prepare([model], args, shape=(720, 1280, 3))
+
+--threads / --interop-threads   PyTorch intra- / inter-op threads (and OpenCV's pool).
+                                Several detector processes on one server should split
+                                the cores instead of each taking all of them.
+--fuse                          fuse Conv+BN at load time (otherwise on the first frame)
+--channels-last / --no-channels-last
+                                NHWC memory format (default: Ultralytics decides per CPU)
+--compile                       torch.compile the model graph (needs a C++ compiler)
+--warmup N                      N dummy inferences before the first real frame
+
+Ultralytics resets the torch thread count when its predictor selects the
+CPU, so the thread settings are applied again after the predictor exists.
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.cfg import DEFAULT_CFG_DICT
+
+from .profiler import tracer
+
+
+def add_runtime_args(parser):
+    g = parser.add_argument_group('CPU runtime')
+    g.add_argument('--threads', type=int, default=0, help='PyTorch intra-op threads (0 = library default)')
+    g.add_argument('--interop-threads', type=int, default=0, help='PyTorch inter-op threads (0 = library default)')
+    g.add_argument('--fuse', action='store_true', help='Fuse Conv+BN layers at load time')
+    g.add_argument('--channels-last', action=argparse.BooleanOptionalAction, default=None,
+                   help='Use channels-last (NHWC) memory format (default: automatic)')
+    g.add_argument('--compile', action='store_true', help='Compile the model graph with torch.compile')
+    g.add_argument('--warmup', type=int, default=0, help='Warm-up inferences before the first frame')
+    return g
+
+
+def runtime_options(**kwargs):
+    """The runtime defaults as a namespace, for callers without a command line."""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_runtime_args(parser)
+    opts = parser.parse_args([])
+    vars(opts).update(kwargs)
+    return opts
+
+
+def configure_threads(threads=0, interop=0):
+    """Thread pool sizes; 0 leaves the library default."""
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            # only possible before the first parallel op of the process
+            print('Runtime: inter-op threads already fixed for this process, --interop-threads ignored')
+    if threads:
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(threads)
+
+
+def prepare(models, args, shape=(640, 640, 3), **predict_kwargs):
+    """Apply the runtime options to every model, warm up, print and return the report."""
+    overrides = {}
+    if args.channels_last is not None:
+        if 'channels_last' in DEFAULT_CFG_DICT:
+            overrides['channels_last'] = args.channels_last
+        else:
+            print('Runtime: this Ultralytics version has no channels_last option, ignored')
+    if args.compile:
+        if 'compile' in DEFAULT_CFG_DICT:
+            overrides['compile'] = True
+        else:
+            print('Runtime: this Ultralytics version has no compile option, ignored')
+
+    dummy = np.full(shape, 114, np.uint8)
+    warmup_ms = []
+    for model in models:
+        if args.fuse:
+            model.fuse()
+        # kept by every later predict() call, so the predictor is built once with them
+        model.overrides.update(overrides)
+
+        # first call builds the predictor (and compiles); always done here, not on a real frame
+        runs = max(1, args.warmup)
+        for i in range(runs):
+            t0 = time.perf_counter()
+            model(dummy, verbose=False, **predict_kwargs)
+            if i == 0:
+                configure_threads(args.threads)
+            t1 = time.perf_counter()
+            tracer.complete('warmup', t0 * 1e6, t1 * 1e6, 'runtime', {'run': i})
+            warmup_ms.append((t1 - t0) * 1000)
+
+    report = {
+        'torch': torch.__version__,
+        'intra_op_threads': torch.get_num_threads(),
+        'inter_op_threads': torch.get_num_interop_threads(),
+        'opencv_threads': cv2.getNumThreads(),
+        'fuse': bool(args.fuse),
+        'channels_last': overrides.get('channels_last', 'auto'),
+        'compile': overrides.get('compile', False),
+        'warmup_runs': len(warmup_ms),
+        'warmup_first_ms': warmup_ms[0] if warmup_ms else 0.0,
+        'warmup_last_ms': warmup_ms[-1] if warmup_ms else 0.0,
+        'warmup_total_ms': sum(warmup_ms),
+    }
+    print(f"Runtime: torch {report['torch']} | threads intra {report['intra_op_threads']}, "
+          f"inter {report['inter_op_threads']}, OpenCV {report['opencv_threads']} | "
+          f"fuse {'on' if report['fuse'] else 'off'} | channels-last {report['channels_last']} | "
+          f"compile {'on' if report['compile'] else 'off'}")
+    print(f"Runtime: warm-up {report['warmup_runs']} run(s) in {report['warmup_total_ms']:.0f} ms "
+          f"(first {report['warmup_first_ms']:.0f} ms, last {report['warmup_last_ms']:.0f} ms)")
+    return report
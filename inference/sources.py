@@ -0,0 +1,572 @@
+"""
+Frame sources for detect_stream(): iterables of Frame(image, index, ts, source).
+
+    open_source('dataset/test/images')     # image folder (or a single image)
+    open_source('archive.mp4', stride=2)    # video file
+    open_source('usb0', resolution=(1280, 720))
+    open_source('usb0', camera={'low_latency': True})
+    open_source('picamera0')
+    open_source('screen')                   # monitor 0 via mss, 'screen1' for monitor 1
+
+Any other iterable of Frame works too. Sources given a FramePool read into
+its buffers (source.pool), and detect_stream hands them back.
+
+Folders are read lazily with os.scandir (directory order, no full listing).
+With a checkpoint file, ImageSource records how far it got and a later run
+on the same folder skips what was already processed:
+
+    open_source('/data/stills', checkpoint='runs/stills.ckpt.json')
+
+ImageSource(path, max_side=640) decodes JPEGs at 1/2, 1/4 or 1/8 scale
+(libjpeg DCT scaling) as long as the long side stays >= max_side; the
+header is read first to pick the factor. Frame.scale is the factor, and
+detect_stream maps boxes back to original image pixels with it.
+
+CameraSource(low_latency=True) negotiates MJPG and a one-frame driver
+queue and grabs on its own thread, keeping only the newest frame (see the
+class). camera={'replay': 'archive.mp4'} plays a file through a driver-like
+queue instead of opening the camera, to test it without hardware; a V4L2
+loopback device is opened like any camera (usbN = /dev/videoN).
+"""
+
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from .event_store import video_start_time
+
+IMAGE_EXTS = ['.jpg', '.jpeg', '.png', '.bmp']
+VIDEO_EXTS = ['.avi', '.mov', '.mp4', '.mkv', '.wmv']
+JPEG_EXTS = ['.jpg', '.jpeg']
+REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+class Frame(NamedTuple):
+    image: np.ndarray      # BGR (screen grabs: BGRA)
+    index: int
+    ts: float              # epoch seconds
+    source: str
+    scale: float = 1.0     # original image pixels per decoded pixel
+
+
+def image_size(path):
+    """(w, h) from the file header, without decoding the pixels."""
+    from PIL import Image
+    with Image.open(path) as im:
+        return im.size
+
+
+def decode_factor(path, max_side):
+    """Largest JPEG reduction (8, 4, 2) that keeps the long side >= max_side, else 1."""
+    if not max_side or os.path.splitext(path)[1].lower() not in JPEG_EXTS:
+        return 1
+    try:
+        long_side = max(image_size(path))
+    except (OSError, ValueError):
+        return 1
+    for f in (8, 4, 2):
+        if long_side / f >= max_side:
+            return f
+    return 1
+
+
+def read_image(path, max_side=0):
+    """(image, factor): decoded at reduced size when max_side allows it."""
+    f = decode_factor(path, max_side)
+    return cv2.imread(path, REDUCED_FLAGS[f]) if f > 1 else cv2.imread(path), f
+
+
+class Checkpoint:
+    """
+    Progress of an ImageSource: how many folder entries (in scan order) are
+    done, and the name of the last one, which is checked on resume. Saved
+    atomically every `every` images and when the source is closed; removed
+    once the folder is complete. After a crash at most `every` images are
+    processed again. before_save is called first, e.g. to wait until the
+    results of the recorded images are on disk.
+    """
+
+    def __init__(self, path, every=10, before_save=None):
+        self.path = path
+        self.every = every
+        self.before_save = before_save
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def position(self, source):
+        """(entries done, last name) recorded for source, or (0, None)."""
+        if self.state.get('source') != os.path.abspath(source):
+            return 0, None
+        return self.state.get('position', 0), self.state.get('last')
+
+    def update(self, source, position, last):
+        self.state = {'source': os.path.abspath(source), 'position': position, 'last': last,
+                      'updated': time.strftime('%Y-%m-%d %H:%M:%S')}
+        if position % self.every == 0:
+            self.save()
+
+    def save(self):
+        if not self.state:
+            return
+        if self.before_save is not None:
+            self.before_save()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ImageSource:
+    """
+    A single image, or every image in a folder streamed in directory order.
+
+    max_side    long side the model needs (see Detector.input_size); larger
+                JPEGs are decoded reduced, 0 always decodes at full size
+    checkpoint  Checkpoint (or file name) to resume from and record progress in;
+                an image counts as done once the next one is requested
+    """
+
+    def __init__(self, path, max_side=0, checkpoint=None):
+        self.path = path
+        self.max_side = max_side
+        self.kind = 'folder' if os.path.isdir(path) else 'image'
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint if self.kind == 'folder' else None
+        self.pool = None
+        self.complete = False
+
+    def scan(self):
+        """Image paths one by one (extensions in IMAGE_EXTS), without building a list."""
+        if self.kind == 'image':
+            yield self.path
+            return
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTS and entry.is_file():
+                    yield entry.path
+
+    @property
+    def shape(self):
+        """Decoded shape of the first image (from its header)."""
+        first = next(self.scan(), None)
+        if first is None:
+            return None
+        try:
+            w, h = image_size(first)
+        except (OSError, ValueError):
+            return None
+        f = decode_factor(first, self.max_side)
+        return (math.ceil(h / f), math.ceil(w / f), 3)
+
+    def _resume(self):
+        """Path iterator positioned after the checkpoint, and that position."""
+        paths = self.scan()
+        start, last = self.checkpoint.position(self.path) if self.checkpoint else (0, None)
+        if not start:
+            return paths, 0
+        skipped = None
+        for skipped in itertools.islice(paths, start):
+            pass
+        if skipped is not None and os.path.basename(skipped) == last:
+            print(f'Checkpoint: resuming after {start} images (last: {last})')
+            return paths, start
+        print(f'Checkpoint: {self.path} changed since {self.checkpoint.path} was written, starting over')
+        return self.scan(), 0
+
+    def __iter__(self):
+        paths, start = self._resume()
+        for i, f in enumerate(paths, start):
+            img, factor = read_image(f, self.max_side)
+            if img is None:
+                print(f'Cannot read image: {f}')
+            else:
+                yield Frame(img, i, os.path.getmtime(f), f, float(factor))
+            # resumed here: the caller is done with image i
+            if self.checkpoint is not None:
+                self.checkpoint.update(self.path, i + 1, os.path.basename(f))
+        self.complete = True
+
+    def close(self):
+        if self.checkpoint is None:
+            return
+        if self.complete:
+            self.checkpoint.remove()
+        else:
+            self.checkpoint.save()
+            print(f'Checkpoint: {self.checkpoint.state.get("position", 0)} images done -> {self.checkpoint.path}')
+
+
+class VideoSource:
+    """Video file; with stride N only every N-th frame is decoded."""
+
+    def __init__(self, path, stride=1, pool=None):
+        self.kind = 'video'
+        self.path = path
+        self.stride = max(1, stride)
+        self.pool = pool
+        self.cap = cv2.VideoCapture(path)
+        self.t0 = video_start_time(path, self.cap.get(cv2.CAP_PROP_FPS), self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    @property
+    def shape(self):
+        return (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+
+    def __iter__(self):
+        while True:
+            ret, frame = self.pool.read(self.cap) if self.pool is not None else self.cap.read()
+            if not ret:
+                break
+            idx = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+            ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            for _ in range(self.stride - 1): # Skip frames without decoding them
+                self.cap.grab()
+            yield Frame(frame, idx, self.t0 + ms / 1000, self.path)
+
+    def close(self):
+        self.cap.release()
+
+
+def fourcc_str(value):
+    """'MJPG' for a CAP_PROP_FOURCC value."""
+    value = int(value)
+    return ''.join(chr((value >> 8 * i) & 0xFF) for i in range(4)).strip('\x00') or '?'
+
+
+class CameraReplay:
+    """
+    Stand-in for a USB camera: plays a video file in real time (its own fps,
+    looping) into a driver-like queue of `buffers` frames. As with V4L2, a
+    full queue drops the new frame, so a reader that falls behind gets frames
+    up to buffers / fps old. capture_ts is when the current frame was captured.
+    """
+
+    def __init__(self, path, buffers=4):
+        self.src = cv2.VideoCapture(path)
+        if not self.src.isOpened():
+            raise FileNotFoundError(f"Cannot open replay video: {path}")
+        self.fps = self.src.get(cv2.CAP_PROP_FPS) or 30.0
+        self.size = (int(self.src.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.src.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.buffers = buffers
+        self.fourcc = cv2.VideoWriter_fourcc(*'YUYV')
+        self.capture_ts = None
+        self._current = None
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='camera-replay', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        period = 1.0 / self.fps
+        due = time.perf_counter()
+        while not self._stopped:
+            ret, frame = self.src.read()
+            if not ret:
+                self.src.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            due = max(due + period, time.perf_counter() - period)
+            time.sleep(max(0.0, due - time.perf_counter()))
+            with self._cond:
+                if len(self._queue) < self.buffers:
+                    self._queue.append((frame, time.time()))
+                    self._cond.notify()
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_BUFFERSIZE:
+            self.buffers = max(1, int(value))
+            return True
+        if prop == cv2.CAP_PROP_FOURCC:
+            # accepted; the frames do not change
+            self.fourcc = int(value)
+            return True
+        # size and rate are those of the file
+        return False
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.size[0], cv2.CAP_PROP_FRAME_HEIGHT: self.size[1],
+                cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_BUFFERSIZE: self.buffers,
+                cv2.CAP_PROP_FOURCC: self.fourcc}.get(prop, 0)
+
+    def grab(self):
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if not self._queue:
+                return False
+            self._current, self.capture_ts = self._queue.popleft()
+        return True
+
+    def retrieve(self, image=None):
+        if self._current is None:
+            return False, None
+        if image is not None and image.shape == self._current.shape:
+            np.copyto(image, self._current)
+            return True, image
+        return True, self._current
+
+    def read(self, image=None):
+        return self.retrieve(image) if self.grab() else (False, None)
+
+    def release(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+        self.src.release()
+
+
+class CameraSource:
+    """
+    USB camera by index; stops when the camera stops delivering frames.
+
+    low_latency asks the driver for MJPG (uncompressed YUYV limits the frame
+    rate at 720p and up) and a single buffer, and grabs on its own thread:
+    only the newest frame is kept, older ones are dropped instead of queueing
+    up. backlog is the number dropped just before the current frame. Frames
+    are timestamped when grabbed (replay: when captured), so the consumer
+    can measure capture-to-display latency from Frame.ts.
+    """
+
+    def __init__(self, index=0, resolution=None, pool=None, low_latency=False, fourcc=None, buffers=0,
+                 fps=0, replay=None):
+        self.kind = 'usb'
+        self.name = f'usb{index}'
+        self.pool = pool
+        self.threaded = low_latency
+        if low_latency:
+            fourcc = fourcc or 'MJPG'
+            buffers = buffers or 1
+        self.cap = CameraReplay(replay) if replay else cv2.VideoCapture(index)
+        # the pixel format first: it decides which sizes and rates the driver offers
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if resolution:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffers:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffers)
+
+        self.backlog = 0
+        self.grabbed = 0
+        self.dropped = 0
+        if low_latency or fourcc or buffers:
+            negotiated = fourcc_str(self.cap.get(cv2.CAP_PROP_FOURCC))
+            print(f"Camera {self.name}{' (replay ' + replay + ')' if replay else ''}: {negotiated} "
+                  f"{self.shape[1]}x{self.shape[0]} @ {self.cap.get(cv2.CAP_PROP_FPS):g} fps, "
+                  f"{int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE))} buffer(s)"
+                  f"{', capture thread' if low_latency else ''}"
+                  + (f" (asked for {fourcc}, the driver kept {negotiated})" if fourcc and negotiated != fourcc else ''))
+        if low_latency:
+            self._latest = None
+            self._skipped = 0
+            self._ended = False
+            self._stop = threading.Event()
+            self._cond = threading.Condition()
+            self._thread = threading.Thread(target=self._grab_loop, name='camera-grab', daemon=True)
+            self._thread.start()
+
+    @property
+    def shape(self):
+        return (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+
+    def _capture_time(self):
+        # a camera gives no usable capture time: right after grab() returns is the closest
+        return getattr(self.cap, 'capture_ts', None) or time.time()
+
+    def _grab_loop(self):
+        # grab() returns as soon as the driver has a frame; retrieve() decodes it into a pooled buffer
+        shape = None
+        while not self._stop.is_set():
+            if not self.cap.grab():
+                break
+            ts = self._capture_time()
+            buf = self.pool.acquire(shape) if self.pool is not None and shape else None
+            ret, frame = self.cap.retrieve(buf)
+            if frame is not buf and self.pool is not None:
+                self.pool.release(buf)
+            if not ret or frame is None:
+                break
+            shape = frame.shape
+            with self._cond:
+                if self._latest is not None:
+                    # never read: the consumer only ever gets the newest frame
+                    if self.pool is not None:
+                        self.pool.release(self._latest[0])
+                    self._skipped += 1
+                    self.dropped += 1
+                self._latest = (frame, self.grabbed, ts)
+                self.grabbed += 1
+                self._cond.notify()
+        with self._cond:
+            self._ended = True
+            self._cond.notify()
+
+    def __iter__(self):
+        if self.threaded:
+            while True:
+                with self._cond:
+                    while self._latest is None and not self._ended:
+                        self._cond.wait()
+                    if self._latest is None:
+                        break
+                    (frame, n, ts), self._latest = self._latest, None
+                    self.backlog, self._skipped = self._skipped, 0
+                yield Frame(frame, n, ts, self.name)
+            return
+
+        while True:
+            ret, frame = self.pool.read(self.cap) if self.pool is not None else self.cap.read()
+            if (frame is None) or (not ret):
+                break
+            yield Frame(frame, self.grabbed, self._capture_time(), self.name)
+            self.grabbed += 1
+
+    def summary(self):
+        return {'device': self.name, 'fourcc': fourcc_str(self.cap.get(cv2.CAP_PROP_FOURCC)),
+                'size': [self.shape[1], self.shape[0]], 'fps': self.cap.get(cv2.CAP_PROP_FPS),
+                'buffers': int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)), 'capture_thread': self.threaded,
+                'grabbed': self.grabbed, 'dropped': self.dropped}
+
+    def close(self):
+        if self.threaded:
+            self._stop.set()
+            # grab() returns within a frame period; release only after the thread is out of it
+            self._thread.join(timeout=2)
+        self.cap.release()
+
+
+class PicameraSource:
+
+    def __init__(self, index=0, resolution=(1280, 720)):
+        from picamera2 import Picamera2
+        self.kind = 'picamera'
+        self.name = f'picamera{index}'
+        self.pool = None
+        self.resolution = resolution or (1280, 720)
+        self.cap = Picamera2()
+        self.cap.configure(self.cap.create_video_configuration(main={"format": 'RGB888', "size": self.resolution}))
+        self.cap.start()
+
+    @property
+    def shape(self):
+        return (self.resolution[1], self.resolution[0], 3)
+
+    def __iter__(self):
+        n = 0
+        while True:
+            frame = self.cap.capture_array()
+            if frame is None:
+                break
+            yield Frame(frame, n, time.time(), self.name)
+            n += 1
+
+    def close(self):
+        self.cap.stop()
+
+
+class VideoReplay:
+    """Stand-in for mss: grabs frames from a video file as BGRA, looping at the end."""
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f"Cannot open replay video: {path}")
+        w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.monitors = [{"top": 0, "left": 0, "width": w, "height": h}]
+        self._bgr = np.empty((h, w, 3), np.uint8)
+        self._bgra = np.empty((h, w, 4), np.uint8)
+
+    def grab(self, monitor):
+        # like mss, the returned image is only valid until the next grab
+        ret, frame = self.cap.read(self._bgr)
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(self._bgr)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self._bgra)
+
+    def close(self):
+        self.cap.release()
+
+
+class ScreenSource:
+    """Screen capture with mss (a monitor or a region of it), or a looping video with replay."""
+
+    def __init__(self, monitor=0, region=None, replay=None):
+        self.kind = 'screen'
+        self.name = replay or 'screen'
+        self.pool = None
+        if replay:
+            self.sct = VideoReplay(replay)
+        else:
+            import mss                   # pip install mss
+            self.sct = mss.mss()
+        monitors = self.sct.monitors
+        if monitor >= len(monitors):
+            raise ValueError(f"Monitor {monitor} not found! Available: 0–{len(monitors)-1}")
+        self.monitor = monitors[monitor] if region is None or replay else region
+
+    @property
+    def shape(self):
+        return (self.monitor['height'], self.monitor['width'], 3)
+
+    def __iter__(self):
+        n = 0
+        while True:
+            # view on the grab, no copy; converted to BGR by detect_stream
+            yield Frame(np.asarray(self.sct.grab(self.monitor)), n, time.time(), self.name)
+            n += 1
+
+    def close(self):
+        self.sct.close()
+
+
+def open_source(spec, resolution=None, stride=1, pool=None, max_side=0, checkpoint=None, camera=None):
+    """
+    Source for a --source value: image / folder / video path, usbN, picameraN or screen[N].
+    max_side enables reduced JPEG decoding for images (with a resolution to resize to, the
+    decoded long side also stays >= the larger of its sides),
+    checkpoint makes folders resumable, camera holds CameraSource options for usbN
+    (low_latency, fourcc, buffers, fps, replay).
+    """
+    spec = str(spec)
+    if resolution and max_side:
+        max_side = max(max_side, *resolution)
+    if os.path.isdir(spec):
+        return ImageSource(spec, max_side, checkpoint)
+    if os.path.isfile(spec):
+        ext = os.path.splitext(spec)[1].lower()
+        if ext in IMAGE_EXTS:
+            return ImageSource(spec, max_side)
+        if ext in VIDEO_EXTS:
+            return VideoSource(spec, stride, pool)
+        raise ValueError(f'File extension {ext} is not supported.')
+    if spec.startswith('usb'):
+        return CameraSource(int(spec[3:]), resolution, pool, **(camera or {}))
+    if spec.startswith('picamera'):
+        return PicameraSource(int(spec[8:]), resolution)
+    if spec.startswith('screen'):
+        return ScreenSource(int(spec[6:] or 0))
+    raise ValueError(f'Input {spec} is invalid. Please try again.')
@@ -0,0 +1,130 @@
+"""
+Per-stage timing for the inference loops.
+
+    timer = StageTimer()
+    with timer.stage('capture'):
+        ret, frame = cap.read()
+    ...
+    timer.frame_done()
+    timer.write_json('stats.json')
+
+The first frame is reported separately as warm-up and excluded from the
+latency percentiles and throughput. With --profile every stage and frame is
+also recorded as a trace span (see profiler.py).
+"""
+
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+from .profiler import tracer
+
+
+def percentiles(samples_s):
+    a = np.asarray(samples_s, dtype=np.float64) * 1000
+    if a.size == 0:
+        return {'count': 0}
+    return {
+        'count': int(a.size),
+        'mean_ms': float(a.mean()),
+        'p50_ms': float(np.percentile(a, 50)),
+        'p90_ms': float(np.percentile(a, 90)),
+        'p99_ms': float(np.percentile(a, 99)),
+        'max_ms': float(a.max()),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+class StageTimer:
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.frame_times = []
+        self.warmup = {}
+        self.info = {}
+        self.last = {}
+        self._frame_start = time.perf_counter()
+        self._current = {}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            self._current[name] = self._current.get(name, 0.0) + t1 - t0
+            if tracer.enabled:
+                tracer.complete(name, t0 * 1e6, t1 * 1e6)
+
+    def add(self, name, seconds):
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def frame_done(self):
+        now = time.perf_counter()
+        total = now - self._frame_start
+        if tracer.enabled:
+            tracer.complete('frame', self._frame_start * 1e6, now * 1e6, 'frame', {'n': self.frames})
+        self._frame_start = now
+        self.last = {'frame': total * 1000, **{k: v * 1000 for k, v in self._current.items()}}
+        if not self.frame_times and not self.warmup:
+            # first frame: model warm-up, lazy allocations, codec start-up
+            self.warmup = {'frame_ms': total * 1000,
+                           'stages_ms': {k: v * 1000 for k, v in self._current.items()}}
+        else:
+            self.frame_times.append(total)
+            for name, seconds in self._current.items():
+                self.samples[name].append(seconds)
+        self._current = {}
+        return total
+
+    def reset_frame_clock(self):
+        """Exclude time spent outside the loop (e.g. model loading) from the next frame."""
+        self._frame_start = time.perf_counter()
+        self._current = {}
+
+    @property
+    def frames(self):
+        return len(self.frame_times) + (1 if self.warmup else 0)
+
+    def summary(self):
+        total = sum(self.frame_times)
+        return {
+            'frames': self.frames,
+            'fps': len(self.frame_times) / total if total > 0 else 0.0,
+            'warmup': self.warmup,
+            'frame': percentiles(self.frame_times),
+            'stages': {name: percentiles(s) for name, s in self.samples.items()},
+            'peak_rss_mb': peak_rss_mb(),
+            'info': self.info,
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"\nFrames: {s['frames']}  Throughput: {s['fps']:.2f} FPS  "
+              f"Warm-up frame: {s['warmup'].get('frame_ms', 0):.1f} ms"
+              + (f"  Peak RSS: {s['peak_rss_mb']:.0f} MB" if s['peak_rss_mb'] else ""))
+        rows = [('frame', s['frame'])] + list(s['stages'].items())
+        for name, p in rows:
+            if p.get('count'):
+                print(f"  {name:<12} p50 {p['p50_ms']:8.2f} ms   p90 {p['p90_ms']:8.2f} ms   p99 {p['p99_ms']:8.2f} ms")
+
+    def write_json(self, path, **extra):
+        data = self.summary()
+        data.update(extra)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,299 @@
+"""
+Parallel offline detection on a recorded video file.
+
+The video is split into frame ranges; each range is decoded and run
+through its own model instance in a worker process. Results are merged
+back in frame order as soon as each range finishes:
+
+  - detections CSV: frame, time_s, class, conf, xmin, ymin, xmax, ymax
+  - optional annotated video (same drawing as yolo_detect.py)
+
+With --stride N only every N-th frame is decoded and detected; the frames
+in between are skipped with cap.grab(), which does not convert pixels.
+
+Usually started through yolo_detect.py:
+  python inference/yolo_detect.py --source archive.mp4 --workers 4 --stride 2 --record
+
+or directly:
+  python inference/video_chunks.py --model models/raw_2026_01_11_001_best.pt --source archive.mp4 --workers 4
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+if __package__ in (None, ''):
+    # run as a script (python inference/video_chunks.py): import through the package
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from inference.detector import Detector, draw_boxes, to_array
+from inference.enhance import FrameEnhancer, add_enhance_args, enhance_options
+from inference.event_store import EventStore, video_start_time
+from inference.profiler import add_profile_arg, tracer
+from inference.roi import load_rois
+from inference.runtime import add_runtime_args, runtime_options
+
+# Per-process detector (model, cascade, regions of interest), loaded once by the pool initializer
+_detector = None
+
+
+def video_info(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f'Cannot open video {path}')
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if n <= 0:
+        # container without a frame count: count once, grab() does not decode pixels
+        n = 0
+        while cap.grab():
+            n += 1
+    cap.release()
+    return n, fps, (w, h)
+
+
+def chunk_ranges(n_frames, n_chunks, stride=1):
+    """[start, end) ranges starting on a multiple of stride, so sampling matches a sequential run."""
+    step = -(-n_frames // max(1, n_chunks))
+    step = -(-step // stride) * stride
+    return [(s, min(s + step, n_frames)) for s in range(0, n_frames, step)]
+
+
+def open_at(path, start):
+    """Capture positioned on frame `start`; falls back to grabbing if seeking is inexact."""
+    cap = cv2.VideoCapture(path)
+    if start == 0:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+        cap.release()
+        cap = cv2.VideoCapture(path)
+        for _ in range(start):
+            cap.grab()
+    return cap
+
+
+def draw(frame, boxes, labels):
+    count = draw_boxes(frame, boxes, labels)
+    cv2.putText(frame, f'Number of objects: {count}', (10,40), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2)
+
+
+def init_worker(model_path, threads, thresh=0.5, roi_path=None, source=None, cascade=None, runtime=None,
+                shape=(640, 640, 3), profile=None, enhance=None):
+    global _detector
+    if profile:
+        # only the parent writes the file; worker events go back with each chunk's result
+        tracer.enable(profile)
+    # workers share the cores: without this every process starts one thread per core
+    opts = runtime_options(**vars(runtime)) if runtime else runtime_options()
+    opts.threads = opts.threads or threads
+    rois = load_rois(roi_path, source) if roi_path else None
+    # one stripe per worker: the workers already use all cores
+    enhancer = FrameEnhancer(**{**enhance, 'stripes': 1}) if enhance else None
+    _detector = Detector(model_path, conf=thresh, rois=rois, enhance=enhancer, runtime=opts, **(cascade or {}))
+    # also re-applies the thread count after Ultralytics resets it on predictor setup
+    _detector.warmup(shape)
+    cv2.setNumThreads(1)
+
+
+def process_chunk(video, start, end, stride, size, part_path, fps):
+    """Detections (rows) for frames [start, end); annotated frames go to part_path if given."""
+    cap = open_at(video, start)
+    writer = None
+    if part_path:
+        writer = cv2.VideoWriter(part_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+
+    labels = _detector.names
+    rows = []
+    processed = 0
+    for idx in range(start, end):
+        with tracer.span('capture'):
+            if not cap.grab():
+                break
+            if idx % stride:
+                continue
+            ret, frame = cap.retrieve()
+        if not ret:
+            break
+        with tracer.span('preprocess'):
+            if frame.shape[1] != size[0] or frame.shape[0] != size[1]:
+                frame = cv2.resize(frame, size)
+        if _detector.enhancer is not None:
+            with tracer.span('enhance'):
+                frame = _detector.enhancer(frame)
+
+        with tracer.span('inference'):
+            results = _detector.results(frame)
+        with tracer.span('postprocess'):
+            boxes = to_array(results)
+            for xmin, ymin, xmax, ymax, p, c in boxes:
+                rows.append((idx, labels[int(c)], float(p), int(xmin), int(ymin), int(xmax), int(ymax)))
+
+        if writer is not None:
+            with tracer.span('draw'):
+                if _detector.rois is not None:
+                    _detector.rois.draw(frame)
+                draw(frame, boxes, labels)
+            with tracer.span('write'):
+                writer.write(frame)
+        processed += 1
+
+    cap.release()
+    if writer is not None:
+        writer.release()
+    return rows, processed, tracer.take()
+
+
+def append_video(recorder, part_path):
+    cap = cv2.VideoCapture(part_path)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        recorder.write(frame)
+    cap.release()
+    os.remove(part_path)
+
+
+def run(model_path, video, workers=None, stride=1, thresh=0.5, resolution=None,
+        out_video=None, detections=None, chunks_per_worker=2, stats_json=None, events=None, roi=None,
+        cascade=None, runtime=None, enhance=None):
+    workers = workers or os.cpu_count() or 1
+    stride = max(1, stride)
+    n_frames, src_fps, size = video_info(video)
+    if resolution:
+        size = tuple(int(v) for v in resolution.split('x'))
+    out_fps = src_fps / stride
+    duration = n_frames / src_fps
+
+    ranges = chunk_ranges(n_frames, workers * chunks_per_worker, stride)
+    stem = os.path.splitext(os.path.basename(video))[0]
+    detections = detections or f'{stem}_detections.csv'
+    part_dir = None
+    recorder = None
+    if out_video:
+        part_dir = os.path.join('runs', 'video_chunks', stem)
+        os.makedirs(part_dir, exist_ok=True)
+        recorder = cv2.VideoWriter(out_video, cv2.VideoWriter_fourcc(*'MJPG'), out_fps, size)
+
+    store = EventStore(events) if events else None
+    video_t0 = video_start_time(video, src_fps, n_frames)
+
+    print(f'{video}: {n_frames} frames, {duration:.1f} s at {src_fps:.1f} FPS -> '
+          f'{len(ranges)} chunks on {workers} workers, stride {stride}')
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    shape = (size[1], size[0], 3)
+    t0 = time.perf_counter()
+    processed = 0
+    with open(detections, 'w', newline='') as f, \
+            ProcessPoolExecutor(workers, initializer=init_worker,
+                                initargs=(model_path, threads, thresh, roi, video, cascade, runtime, shape,
+                                          tracer.path, enhance)) as pool:
+        out = csv.writer(f)
+        out.writerow(['frame', 'time_s', 'class', 'conf', 'xmin', 'ymin', 'xmax', 'ymax'])
+        futures = []
+        for i, (start, end) in enumerate(ranges):
+            part = os.path.join(part_dir, f'part_{i:05d}.avi') if part_dir else None
+            futures.append(pool.submit(process_chunk, video, start, end, stride, size, part, out_fps))
+
+        # merge in order: chunk i is written as soon as it and all before it are done
+        for i, fut in enumerate(futures):
+            with tracer.span('wait', 'merge', chunk=i):
+                rows, n, events = fut.result()
+            tracer.extend(events)
+            with tracer.span('merge', 'io', chunk=i):
+                out.writerows((idx, f'{idx / src_fps:.3f}', name, f'{p:.4f}', *box) for idx, name, p, *box in rows)
+                if store is not None:
+                    for idx, group in groupby(rows, key=lambda r: r[0]):
+                        group = list(group)
+                        store.add(video, idx, video_t0 + idx / src_fps, [r[3:] for r in group],
+                                  [r[1] for r in group], [r[2] for r in group], size)
+                if recorder is not None:
+                    append_video(recorder, os.path.join(part_dir, f'part_{i:05d}.avi'))
+            processed += n
+            elapsed = time.perf_counter() - t0
+            done_s = ranges[i][1] / src_fps
+            print(f'[{i + 1}/{len(ranges)}] frames {ranges[i][0]}-{ranges[i][1] - 1} | '
+                  f'{processed / elapsed:.1f} frames/s | {done_s / elapsed:.1f}x real time')
+
+    if store is not None:
+        store.close()
+    if recorder is not None:
+        recorder.release()
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        'script': 'video_chunks',
+        'video': video,
+        'frames_total': n_frames,
+        'frames_processed': processed,
+        'workers': workers,
+        'stride': stride,
+        'enhance': enhance,
+        'elapsed_s': elapsed,
+        'fps': processed / elapsed if elapsed else 0.0,
+        'realtime_factor': duration / elapsed if elapsed else 0.0,
+    }
+    print(f'Processed {processed} frames in {elapsed:.1f} s ({stats["realtime_factor"]:.1f}x real time)')
+    print(f'Detections: {detections}')
+    if out_video:
+        print(f'Annotated video: {out_video}')
+    if stats_json:
+        with open(stats_json, 'w') as f:
+            json.dump(stats, f, indent=2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', required=True, help='Path to YOLO model file')
+    parser.add_argument('--source', required=True, help='Video file')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes (0 = all cores)')
+    parser.add_argument('--stride', type=int, default=1, help='Detect every N-th frame')
+    parser.add_argument('--thresh', type=float, default=0.5, help='Minimum confidence threshold')
+    parser.add_argument('--resolution', default=None, help='Resize frames to WxH before detection')
+    parser.add_argument('--out-video', default=None, help='Write annotated video here')
+    parser.add_argument('--detections', default=None, help='Detections CSV (default: <video>_detections.csv)')
+    parser.add_argument('--stats-json', default=None, help='Write run statistics to this JSON file')
+    parser.add_argument('--events', default=None, help='Also save detections to this event store')
+    parser.add_argument('--roi', default=None, help='YAML file with regions of interest per source')
+    parser.add_argument('--confirm-model', default=None, help='Cascade: confirmation model (--model screens)')
+    parser.add_argument('--screen-conf', type=float, default=0.25)
+    parser.add_argument('--accept-conf', type=float, default=1.0)
+    parser.add_argument('--escalate', choices=['crops', 'frame'], default='crops')
+    add_enhance_args(parser)
+    add_runtime_args(parser)
+    add_profile_arg(parser)
+    args = parser.parse_args()
+    if args.profile:
+        tracer.enable(args.profile)
+
+    if not os.path.isfile(args.source):
+        print(f'Video {args.source} not found.')
+        sys.exit(1)
+
+    cascade = None
+    if args.confirm_model:
+        cascade = {'confirm_model': args.confirm_model, 'screen_conf': args.screen_conf,
+                   'accept_conf': args.accept_conf, 'escalate': args.escalate}
+
+    run(args.model, args.source, args.workers, args.stride, args.thresh, args.resolution,
+        args.out_video, args.detections, stats_json=args.stats_json, events=args.events, roi=args.roi,
+        cascade=cascade, runtime=runtime_options(**{k: getattr(args, k) for k in vars(runtime_options())}),
+        enhance=enhance_options(args) if args.enhance else None)
+    tracer.save()
+
+
+if __name__ == '__main__':
+    main()
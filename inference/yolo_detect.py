@@ -1,308 +1,425 @@
 import os
 import sys
 import argparse
-import glob
 import time
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
-
-# Define and parse user input arguments
-
-parser = argparse.ArgumentParser()
-
-parser.add_argument(
-    '--model',
-    help='Path to YOLO model file. If not set, use latest model in models/',
-    default=None
-)
-
-parser.add_argument(
-    '--source',
-    help='Image source. Default: usb0',
-    default='usb0'
-)
-
-parser.add_argument(
-    '--thresh',
-    help='Minimum confidence threshold',
-    type=float,
-    default=0.5
-)
-
-parser.add_argument(
-    '--resolution',
-    help='Resolution WxH. Default: 1280x720',
-    default='1280x720'
-)
-
-parser.add_argument(
-    '--record',
-    help='Record output video',
-    action='store_true'
-)
-
-parser.add_argument(
-    '--path',
-    help='Path to YOLO model file. If not set, use latest model in models/',
-    default=None
-)
-
-args = parser.parse_args()
-
-# Model selection logic
-if args.model:
-    model_path = args.model
-elif args.path:
-    model_dir = os.path.join('models', args.path)
-    model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-
-    if not model_files:
-        print('ERROR: No model found in models/ folder.')
-        sys.exit(1)
 
-    model_files.sort(key=os.path.getmtime, reverse=True)
-    model_path = model_files[0]
-
-    print(f'Using latest model: {model_path}')
-else:
-    model_dir = 'models'
-    model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-
-    if not model_files:
-        model_dir = 'models/original'
-        model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-        if not model_files:
-            model_dir = 'models/sharpen'
-            model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-            if not model_files:
-                print('ERROR: No model found in models/ folder.')
-                sys.exit(1)
-
-    print(f'Using latest model latest models in: {model_dir}')
-    model_files.sort(key=os.path.getmtime, reverse=True)
-    model_path = model_files[0]
-
-    print(f'Using latest model: {model_path}')
-
-# Parse user inputs
-# model_path = args.model
-img_source = args.source
-min_thresh = args.thresh
-user_res = args.resolution
-record = args.record
-
-# Check if model file exists and is valid
-if (not os.path.exists(model_path)):
-    print('ERROR: Model path is invalid or model was not found. Make sure the model filename was entered correctly.')
-    sys.exit(0)
-
-# Load the model into memory and get labemap
-model = YOLO(model_path, task='detect')
-labels = model.names
-
-# Parse input to determine if image source is a file, folder, video, or USB camera
-img_ext_list = ['.jpg','.JPG','.jpeg','.JPEG','.png','.PNG','.bmp','.BMP']
-vid_ext_list = ['.avi','.mov','.mp4','.mkv','.wmv']
-
-if os.path.isdir(img_source):
-    source_type = 'folder'
-elif os.path.isfile(img_source):
-    _, ext = os.path.splitext(img_source)
-    if ext in img_ext_list:
-        source_type = 'image'
-    elif ext in vid_ext_list:
-        source_type = 'video'
-    else:
-        print(f'File extension {ext} is not supported.')
-        sys.exit(0)
-elif 'usb' in img_source:
-    source_type = 'usb'
-    usb_idx = int(img_source[3:])
-elif 'picamera' in img_source:
-    source_type = 'picamera'
-    picam_idx = int(img_source[8:])
-else:
-    print(f'Input {img_source} is invalid. Please try again.')
-    sys.exit(0)
-
-# Parse user-specified display resolution
-resize = False
-if user_res:
-    resize = True
-    resW, resH = int(user_res.split('x')[0]), int(user_res.split('x')[1])
-
-# Check if recording is valid and set up recording
-if record:
-    if source_type not in ['video','usb']:
-        print('Recording only works for video and camera sources. Please try again.')
-        sys.exit(0)
-    if not user_res:
-        print('Please specify resolution to record video at.')
+if __package__ in (None, ''):
+    # run as a script (python inference/yolo_detect.py): import through the package
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from inference.detector import Detector, detect_stream, draw_boxes, resolve_model
+from inference.enhance import FrameEnhancer, add_enhance_args
+from inference.event_store import DB_DEFAULT, EventStore
+from inference.frame_pool import FramePool
+from inference.hot_swap import ModelWatcher
+from inference.profiler import add_profile_arg, tracer
+from inference.roi import load_rois
+from inference.runtime import add_runtime_args
+from inference.sources import VIDEO_EXTS, open_source
+from inference.stage_timer import StageTimer
+
+END_MESSAGES = {
+    'image': 'All images have been processed. Exiting program.',
+    'folder': 'All images have been processed. Exiting program.',
+    'video': 'Reached end of the video file. Exiting program.',
+    'usb': 'Unable to read frames from the camera. This indicates the camera is disconnected or not working. Exiting program.',
+    'picamera': 'Unable to read frames from the Picamera. This indicates the camera is disconnected or not working. Exiting program.',
+}
+
+
+def parse_args(argv=None):
+    # Define and parse user input arguments
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--model',
+        help='Path to YOLO model file. If not set, use latest model in models/',
+        default=None
+    )
+
+    parser.add_argument(
+        '--source',
+        help='Image source. Default: usb0',
+        default='usb0'
+    )
+
+    parser.add_argument(
+        '--thresh',
+        help='Minimum confidence threshold',
+        type=float,
+        default=0.5
+    )
+
+    parser.add_argument(
+        '--resolution',
+        help='Resolution WxH. Default: 1280x720',
+        default='1280x720'
+    )
+
+    parser.add_argument(
+        '--record',
+        help='Record output video',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--path',
+        help='Path to YOLO model file. If not set, use latest model in models/',
+        default=None
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        help='Folder sources: record progress in this file and resume from it when it exists',
+        default=None
+    )
+
+    parser.add_argument(
+        '--full-decode',
+        help='Decode images at full size (default: large JPEGs are decoded at 1/2, 1/4 or 1/8 when the model input is smaller)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--headless',
+        help='Do not open display windows (servers, benchmarks)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--max-frames',
+        help='Stop after this many frames (0 = no limit)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--stats-json',
+        help='Write per-stage timing statistics to this JSON file on exit',
+        default=None
+    )
+
+    parser.add_argument(
+        '--workers',
+        help='Video files only: process offline in N parallel worker processes (0 = live loop)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--stride',
+        help='Video files only: run detection on every N-th frame, skipping the rest without decoding',
+        type=int,
+        default=1
+    )
+
+    parser.add_argument(
+        '--low-latency',
+        help='USB cameras: MJPG, one driver buffer and a capture thread that keeps only the newest frame',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--fourcc',
+        help='USB cameras: pixel format to ask the driver for (e.g. MJPG, YUYV). Default: MJPG with --low-latency',
+        default=None
+    )
+
+    parser.add_argument(
+        '--camera-buffers',
+        help='USB cameras: driver buffer count (0 = driver default, 1 with --low-latency)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--camera-fps',
+        help='USB cameras: frame rate to ask for (0 = driver default)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--camera-replay',
+        help='USB sources: play this video file in real time through a driver-like frame queue instead of the camera (testing)',
+        default=None
+    )
+
+    parser.add_argument(
+        '--watch-models',
+        help='Hot-swap: load newer weights from this folder (default: models) without stopping; SIGHUP reloads now',
+        nargs='?',
+        const='models',
+        default=None
+    )
+
+    parser.add_argument(
+        '--watch-pattern',
+        help='Hot-swap: file pattern in the watched folder. Default: the running model\'s family, e.g. raw_*_best.pt',
+        default=None
+    )
+
+    parser.add_argument(
+        '--events',
+        help=f'Save detections to an event store for later queries (default file: {DB_DEFAULT})',
+        nargs='?',
+        const=DB_DEFAULT,
+        default=None
+    )
+
+    parser.add_argument(
+        '--roi',
+        help='YAML file with regions of interest per source (see inference/roi.yaml); only those regions are inferred',
+        default=None
+    )
+
+    parser.add_argument(
+        '--target-ms',
+        help='Per-frame latency target; switches the model input size to meet it (0 = fixed size)',
+        type=float,
+        default=0
+    )
+
+    parser.add_argument(
+        '--imgsz-set',
+        help='Input sizes the latency controller may use. Default: 320 480 640 960',
+        type=int,
+        nargs='+',
+        default=[320, 480, 640, 960]
+    )
+
+    parser.add_argument(
+        '--confirm-model',
+        help='Cascade mode: --model screens every frame, this (larger) model confirms where it found candidates',
+        default=None
+    )
+
+    parser.add_argument(
+        '--screen-conf',
+        help='Cascade: minimum confidence for a screening candidate',
+        type=float,
+        default=0.25
+    )
+
+    parser.add_argument(
+        '--accept-conf',
+        help='Cascade: keep screening results without confirmation when all candidates reach this (1.0 = always confirm)',
+        type=float,
+        default=1.0
+    )
+
+    parser.add_argument(
+        '--escalate',
+        help='Cascade: confirm on crops around the candidates or on the whole frame',
+        choices=['crops', 'frame'],
+        default='crops'
+    )
+
+    add_enhance_args(parser)
+    add_runtime_args(parser)
+    add_profile_arg(parser)
+
+    return parser.parse_args(argv)
+
+
+def run_chunks(args, model_path):
+    """Offline video mode: hand the file to parallel chunk workers (its own process, so the
+    workers can be spawned without re-running this script)."""
+    import subprocess
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'video_chunks.py'),
+           '--model', model_path, '--source', args.source, '--workers', str(args.workers),
+           '--stride', str(args.stride), '--thresh', str(args.thresh)]
+    if args.resolution:
+        cmd += ['--resolution', args.resolution]
+    if args.record:
+        cmd += ['--out-video', 'demo1.avi']
+    if args.stats_json:
+        cmd += ['--stats-json', args.stats_json]
+    if args.events:
+        cmd += ['--events', args.events]
+    if args.roi:
+        cmd += ['--roi', args.roi]
+    if args.confirm_model:
+        cmd += ['--confirm-model', args.confirm_model, '--screen-conf', str(args.screen_conf),
+                '--accept-conf', str(args.accept_conf), '--escalate', args.escalate]
+    if args.threads:
+        cmd += ['--threads', str(args.threads)]
+    if args.interop_threads:
+        cmd += ['--interop-threads', str(args.interop_threads)]
+    if args.fuse:
+        cmd += ['--fuse']
+    if args.channels_last is not None:
+        cmd += ['--channels-last' if args.channels_last else '--no-channels-last']
+    if args.compile:
+        cmd += ['--compile']
+    if args.warmup:
+        cmd += ['--warmup', str(args.warmup)]
+    if args.enhance:
+        cmd += ['--enhance', '--enhance-scale', str(args.enhance_scale), '--enhance-stripes', str(args.enhance_stripes),
+                '--clahe-clip', str(args.clahe_clip), '--clahe-grid', str(args.clahe_grid),
+                '--us-sigma', str(args.us_sigma), '--us-amount', str(args.us_amount)]
+    if args.profile:
+        cmd += ['--profile', args.profile]
+    return subprocess.call(cmd)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        tracer.enable(args.profile)
+
+    # Model selection logic
+    try:
+        model_path = resolve_model(args.model, args.path)
+    except FileNotFoundError as e:
+        print(f'ERROR: {e}')
+        sys.exit(1)
+    if not args.model:
+        print(f'Using latest model: {model_path}')
+
+    img_source = args.source
+    if args.workers and os.path.isfile(img_source) and os.path.splitext(img_source)[1].lower() in VIDEO_EXTS:
+        sys.exit(run_chunks(args, model_path))
+
+    # Parse user-specified display resolution
+    resolution = None
+    if args.resolution:
+        resolution = tuple(int(v) for v in args.resolution.split('x'))
+
+    # Capture and resize reuse these buffers instead of allocating per frame
+    pool = FramePool()
+    try:
+        camera = {'low_latency': args.low_latency, 'fourcc': args.fourcc, 'buffers': args.camera_buffers,
+                  'fps': args.camera_fps, 'replay': args.camera_replay}
+        source = open_source(img_source, resolution, args.stride, pool, checkpoint=args.checkpoint, camera=camera)
+    except ValueError as e:
+        print(e)
         sys.exit(0)
-    
-    # Set up recording
-    record_name = 'demo1.avi'
-    record_fps = 30
-    recorder = cv2.VideoWriter(record_name, cv2.VideoWriter_fourcc(*'MJPG'), record_fps, (resW,resH))
-
-# Load or initialize image source
-if source_type == 'image':
-    imgs_list = [img_source]
-elif source_type == 'folder':
-    imgs_list = []
-    filelist = glob.glob(img_source + '/*')
-    for file in filelist:
-        _, file_ext = os.path.splitext(file)
-        if file_ext in img_ext_list:
-            imgs_list.append(file)
-elif source_type == 'video' or source_type == 'usb':
-
-    if source_type == 'video': cap_arg = img_source
-    elif source_type == 'usb': cap_arg = usb_idx
-    cap = cv2.VideoCapture(cap_arg)
-
-    # Set camera or video resolution if specified by user
-    if user_res:
-        ret = cap.set(3, resW)
-        ret = cap.set(4, resH)
-
-elif source_type == 'picamera':
-    from picamera2 import Picamera2
-    cap = Picamera2()
-    cap.configure(cap.create_video_configuration(main={"format": 'RGB888', "size": (resW, resH)}))
-    cap.start()
-
-# Set bounding box colors (using the Tableu 10 color scheme)
-bbox_colors = [(164,120,87), (68,148,228), (93,97,209), (178,182,133), (88,159,106), 
-            (96,202,231), (159,124,168), (169,162,241), (98,118,150), (172,176,184)]
-
-# Initialize control and status variables
-avg_frame_rate = 0
-frame_rate_buffer = []
-fps_avg_len = 200
-img_count = 0
-
-# Begin inference loop
-while True:
-
-    t_start = time.perf_counter()
-
-    # Load frame from image source
-    if source_type == 'image' or source_type == 'folder': # If source is image or image folder, load the image using its filename
-        if img_count >= len(imgs_list):
-            print('All images have been processed. Exiting program.')
+    live = source.kind in ['video', 'usb', 'picamera']
+
+    # Check if recording is valid and set up recording
+    recorder = None
+    if args.record:
+        if source.kind not in ['video', 'usb']:
+            print('Recording only works for video and camera sources. Please try again.')
             sys.exit(0)
-        img_filename = imgs_list[img_count]
-        frame = cv2.imread(img_filename)
-        img_count = img_count + 1
-    
-    elif source_type == 'video': # If source is a video, load next frame from video file
-        ret, frame = cap.read()
-        if not ret:
-            print('Reached end of the video file. Exiting program.')
-            break
-    
-    elif source_type == 'usb': # If source is a USB camera, grab frame from camera
-        ret, frame = cap.read()
-        if (frame is None) or (not ret):
-            print('Unable to read frames from the camera. This indicates the camera is disconnected or not working. Exiting program.')
+        if not resolution:
+            print('Please specify resolution to record video at.')
+            sys.exit(0)
+        record_name = 'demo1.avi'
+        record_fps = 30
+        recorder = cv2.VideoWriter(record_name, cv2.VideoWriter_fourcc(*'MJPG'), record_fps, resolution)
+
+    # Load the model into memory; regions of interest: only their crops are inferred
+    timer = StageTimer()
+    rois = load_rois(args.roi, img_source) if args.roi else None
+    detector = Detector(model_path, conf=args.thresh, confirm_model=args.confirm_model,
+                        screen_conf=args.screen_conf, accept_conf=args.accept_conf, escalate=args.escalate,
+                        rois=rois, target_ms=args.target_ms, imgsz_set=args.imgsz_set,
+                        enhance=FrameEnhancer.from_args(args), runtime=args)
+    timer.info['model_load_ms'] = detector.load_ms
+    labels = detector.names
+
+    # JPEGs larger than the model input are decoded at 1/2 - 1/8 size; boxes stay in image pixels.
+    # With --resolution the frames are resized to it, so the decode only has to cover that size too
+    if source.kind in ['folder', 'image'] and not args.full_decode:
+        max_side = detector.input_size
+        if max_side and resolution:
+            max_side = max(max_side, *resolution)
+        source.max_side = max_side
+
+    # Detections are written in the background, batched
+    store = EventStore(args.events) if args.events else None
+
+    # New weights are loaded and warmed next to the loop and swapped in between two frames
+    watcher = ModelWatcher(detector, args.watch_models, args.watch_pattern) if args.watch_models else None
+
+    # Initialize control and status variables
+    avg_frame_rate = 0
+    frame_rate_buffer = []
+    fps_avg_len = 200
+
+    # Begin inference loop
+    for r in detect_stream(detector, source, resolution, pool, timer):
+        frame = r.frame
+
+        if store is not None:
+            with timer.stage('postprocess'):
+                store.add(r.source, r.index, r.ts, r.xyxy, [labels[c] for c in r.cls], r.conf, r.size)
+
+        # Draw boxes, object count, framerate (if using video, USB, or Picamera source) and input size
+        with timer.stage('draw'):
+            if rois is not None:
+                rois.draw(frame)
+            object_count = draw_boxes(frame, r.frame_boxes, labels)
+            if live:
+                cv2.putText(frame, f'FPS: {avg_frame_rate:0.2f}', (10,20), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw framerate
+            cv2.putText(frame, f'Number of objects: {object_count}', (10,40), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw total number of detected objects
+            if detector.ctl is not None:
+                cv2.putText(frame, f'imgsz: {detector.ctl.size}', (10,60), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw active input size
+
+        # Display detection results
+        key = -1
+        if not args.headless:
+            with timer.stage('display'):
+                cv2.imshow('YOLO detection results',frame) # Display image
+
+                # If inferencing on individual images, wait for user keypress before moving to next image. Otherwise, wait 5ms before moving to next frame.
+                key = cv2.waitKey(5) if live else cv2.waitKey()
+
+        # capture to display (headless: to the drawn result), what the viewer sees of the delay
+        if source.kind in ['usb', 'picamera']:
+            timer.add('latency', time.time() - r.ts)
+
+        if recorder is not None:
+            with timer.stage('write'):
+                recorder.write(frame)
+
+        if key == ord('q') or key == ord('Q'): # Press 'q' to quit
             break
+        elif key == ord('s') or key == ord('S'): # Press 's' to pause inference
+            cv2.waitKey()
+        elif key == ord('p') or key == ord('P'): # Press 'p' to save a picture of results on this frame
+            cv2.imwrite('capture.png',frame)
 
-    elif source_type == 'picamera': # If source is a Picamera, grab frames using picamera interface
-        frame = cap.capture_array()
-        if (frame is None):
-            print('Unable to read frames from the Picamera. This indicates the camera is disconnected or not working. Exiting program.')
-            break
+        # Calculate FPS for this frame; the frame buffer goes back to the pool on the next iteration
+        frame_rate_calc = 1 / max(timer.frame_done(), 1e-9)
 
-    # Resize frame to desired display resolution
-    if resize == True:
-        frame = cv2.resize(frame,(resW,resH))
-
-    # Run inference on frame
-    results = model(frame, verbose=False)
-
-    # Extract results
-    detections = results[0].boxes
-
-    # Initialize variable for basic object counting example
-    object_count = 0
-
-    # Go through each detection and get bbox coords, confidence, and class
-    for i in range(len(detections)):
-
-        # Get bounding box coordinates
-        # Ultralytics returns results in Tensor format, which have to be converted to a regular Python array
-        xyxy_tensor = detections[i].xyxy.cpu() # Detections in Tensor format in CPU memory
-        xyxy = xyxy_tensor.numpy().squeeze() # Convert tensors to Numpy array
-        xmin, ymin, xmax, ymax = xyxy.astype(int) # Extract individual coordinates and convert to int
-
-        # Get bounding box class ID and name
-        classidx = int(detections[i].cls.item())
-        classname = labels[classidx]
-
-        # Get bounding box confidence
-        conf = detections[i].conf.item()
-
-        # Draw box if confidence threshold is high enough
-        if conf > 0.5:
-        # if conf > min_thresh:
-
-            color = bbox_colors[classidx % 10]
-            cv2.rectangle(frame, (xmin,ymin), (xmax,ymax), color, 2)
-
-            label = f'{classname}: {int(conf*100)}%'
-            labelSize, baseLine = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1) # Get font size
-            label_ymin = max(ymin, labelSize[1] + 10) # Make sure not to draw label too close to top of window
-            cv2.rectangle(frame, (xmin, label_ymin-labelSize[1]-10), (xmin+labelSize[0], label_ymin+baseLine-10), color, cv2.FILLED) # Draw white box to put label text in
-            cv2.putText(frame, label, (xmin, label_ymin-7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1) # Draw label text
-
-            # Basic example: count the number of objects in the image
-            object_count = object_count + 1
-
-    # Calculate and draw framerate (if using video, USB, or Picamera source)
-    if source_type == 'video' or source_type == 'usb' or source_type == 'picamera':
-        cv2.putText(frame, f'FPS: {avg_frame_rate:0.2f}', (10,20), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw framerate
-    
-    # Display detection results
-    cv2.putText(frame, f'Number of objects: {object_count}', (10,40), cv2.FONT_HERSHEY_SIMPLEX, .7, (0,255,255), 2) # Draw total number of detected objects
-    cv2.imshow('YOLO detection results',frame) # Display image
-    if record: recorder.write(frame)
-
-    # If inferencing on individual images, wait for user keypress before moving to next image. Otherwise, wait 5ms before moving to next frame.
-    if source_type == 'image' or source_type == 'folder':
-        key = cv2.waitKey()
-    elif source_type == 'video' or source_type == 'usb' or source_type == 'picamera':
-        key = cv2.waitKey(5)
-    
-    if key == ord('q') or key == ord('Q'): # Press 'q' to quit
-        break
-    elif key == ord('s') or key == ord('S'): # Press 's' to pause inference
-        cv2.waitKey()
-    elif key == ord('p') or key == ord('P'): # Press 'p' to save a picture of results on this frame
-        cv2.imwrite('capture.png',frame)
-    
-    # Calculate FPS for this frame
-    t_stop = time.perf_counter()
-    frame_rate_calc = float(1/(t_stop - t_start))
-
-    # Append FPS result to frame_rate_buffer (for finding average FPS over multiple frames)
-    if len(frame_rate_buffer) >= fps_avg_len:
-        temp = frame_rate_buffer.pop(0)
-        frame_rate_buffer.append(frame_rate_calc)
-    else:
+        # Append FPS result to frame_rate_buffer (for finding average FPS over multiple frames)
+        if len(frame_rate_buffer) >= fps_avg_len:
+            frame_rate_buffer.pop(0)
         frame_rate_buffer.append(frame_rate_calc)
 
-    # Calculate average FPS for past frames
-    avg_frame_rate = np.mean(frame_rate_buffer)
+        # Calculate average FPS for past frames
+        avg_frame_rate = np.mean(frame_rate_buffer)
 
-
-# Clean up
-print(f'Average pipeline FPS: {avg_frame_rate:.2f}')
-if source_type == 'video' or source_type == 'usb':
-    cap.release()
-elif source_type == 'picamera':
-    cap.stop()
-if record: recorder.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+        if args.max_frames and timer.frames >= args.max_frames:
+            break
+    else:
+        print(END_MESSAGES.get(source.kind, 'Source ended. Exiting program.'))
+
+    # Clean up
+    print(f'Average pipeline FPS: {avg_frame_rate:.2f}')
+    detector.print_summary()
+    timer.info.update({k: v for k, v in detector.summary().items() if k in ['runtime', 'cascade', 'imgsz', 'enhance']})
+    if hasattr(source, 'summary'):
+        timer.info['camera'] = source.summary()
+    if watcher is not None:
+        watcher.close()
+        timer.info['hot_swap'] = watcher.summary()
+    timer.print_summary()
+    if args.stats_json:
+        timer.write_json(args.stats_json, script='yolo_detect', source_type=source.kind)
+    source.close()
+    if recorder is not None: recorder.release()
+    if store is not None: store.close()
+    tracer.save()
+    if not args.headless: cv2.destroyAllWindows()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,150 +1,268 @@
 import os
-import glob
-import cv2
-import numpy as np
-from ultralytics import YOLO
-import argparse
 import sys
+import argparse
+from functools import partial
+
+import cv2
+
+if __package__ in (None, ''):
+    # run as a script (python inference/yolo_detect_input_image.py): import through the package
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from inference.detector import Detector, detect_stream, plot, resolve_model
+from inference.enhance import FrameEnhancer, add_enhance_args
+from inference.event_store import DB_DEFAULT, EventStore
+from inference.image_writer import FORMATS, ImageWriter
+from inference.profiler import add_profile_arg, tracer
+from inference.runtime import add_runtime_args
+from inference.sources import ImageSource
+from inference.stage_timer import StageTimer
 
 # ================= CONFIG =================
-# Define and parse user input arguments
-
-parser = argparse.ArgumentParser()
-
-parser.add_argument(
-    '--model',
-    help='Path to YOLO model file. If not set, use latest model in models/',
-    default=None
-)
-
-parser.add_argument(
-    '--source',
-    help='Image source. Default: usb0',
-    default='usb0'
-)
-
-parser.add_argument(
-    '--thresh',
-    help='Minimum confidence threshold',
-    type=float,
-    default=0.5
-)
-
-parser.add_argument(
-    '--resolution',
-    help='Resolution WxH. Default: 1280x720',
-    default='1280x720'
-)
-
-parser.add_argument(
-    '--record',
-    help='Record output video',
-    action='store_true'
-)
-
-parser.add_argument(
-    '--path',
-    help='Path to YOLO model file. If not set, use latest model in models/',
-    default=None
-)
-
-args = parser.parse_args()
-
-# Model selection logic
-if args.model:
-    model_path = args.model
-elif args.path:
-    model_dir = os.path.join('models', args.path)
-    model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-
-    if not model_files:
-        print('ERROR: No model found in models/ folder.')
-        sys.exit(1)
-
-    model_files.sort(key=os.path.getmtime, reverse=True)
-    model_path = model_files[0]
-
-    print(f'Using latest model: {model_path}')
-else:
-    model_dir = 'models'
-    model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-
-    if not model_files:
-        model_dir = 'models/original'
-        model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-        if not model_files:
-            model_dir = 'models/sharpen'
-            model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-            if not model_files:
-                print('ERROR: No model found in models/ folder.')
-                sys.exit(1)
-
-    print(f'Using latest model latest models in: {model_dir}')
-    model_files.sort(key=os.path.getmtime, reverse=True)
-    model_path = model_files[0]
-
-    print(f'Using latest model: {model_path}')
-
-MODEL_PATH = model_path           
-CONF_THRESHOLD = 0.45
-SOURCE = "./inference/input_detect_images/"                 # folder or single image path
-# SOURCE = "bus.jpg"                    # ← or single image
+CONF_THRESHOLD = 0.45                   # default --thresh
 SAVE_RESULTS = True                     # save output images?
-OUTPUT_FOLDER = "./inference/output_detect_images/"
 # ==========================================
 
-def main():
-    if not os.path.exists(MODEL_PATH):
-        print(f"Model not found: {MODEL_PATH}")
+
+def render_full(path, boxes, names):
+    """Annotated full-size image: boxes are in source image pixels, whatever size it was decoded at."""
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f'cannot read {path}')
+    return plot(image, boxes, names)
+
+
+def parse_args(argv=None):
+    # Define and parse user input arguments
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--model',
+        help='Path to YOLO model file. If not set, use latest model in models/',
+        default=None
+    )
+
+    parser.add_argument(
+        '--source',
+        help='Image folder or single image. Default: ./inference/input_detect_images/',
+        default='./inference/input_detect_images/'
+    )
+
+    parser.add_argument(
+        '--thresh',
+        help=f'Minimum confidence threshold. Default: {CONF_THRESHOLD}',
+        type=float,
+        default=CONF_THRESHOLD
+    )
+
+    parser.add_argument(
+        '--path',
+        help='Path to YOLO model file. If not set, use latest model in models/',
+        default=None
+    )
+
+    parser.add_argument(
+        '--output',
+        help='Folder for annotated results. Default: ./inference/output_detect_images/',
+        default='./inference/output_detect_images/'
+    )
+
+    parser.add_argument(
+        '--format',
+        help='Format of the annotated results. Default: same as the input image',
+        choices=list(FORMATS),
+        default=None
+    )
+
+    parser.add_argument(
+        '--quality',
+        help='JPEG / WebP quality of the annotated results (1-100). Default: 95',
+        type=int,
+        default=95
+    )
+
+    parser.add_argument(
+        '--thumbnail',
+        help='Write the annotated results downscaled to this longest side in pixels (0 = full size)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--only-detections',
+        help='Write only the images that have detections',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--write-workers',
+        help='Background threads encoding and writing results (0 = one per core, up to 4)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--write-queue',
+        help='Results waiting to be written before inference pauses (0 = two per write worker)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        help='Folder sources: record progress in this file and resume from it when it exists',
+        default=None
+    )
+
+    parser.add_argument(
+        '--full-decode',
+        help='Decode images at full size (default: large JPEGs are decoded at 1/2, 1/4 or 1/8 when the model input is smaller)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--headless',
+        help='Do not open display windows or wait for keys (servers, benchmarks)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--max-frames',
+        help='Stop after this many images (0 = no limit)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--stats-json',
+        help='Write per-stage timing statistics to this JSON file on exit',
+        default=None
+    )
+
+    parser.add_argument(
+        '--events',
+        help=f'Save detections to an event store for later queries (default file: {DB_DEFAULT})',
+        nargs='?',
+        const=DB_DEFAULT,
+        default=None
+    )
+
+    add_enhance_args(parser)
+    add_runtime_args(parser)
+    add_profile_arg(parser)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        tracer.enable(args.profile)
+
+    # Model selection logic
+    try:
+        model_path = resolve_model(args.model, args.path)
+    except FileNotFoundError as e:
+        print(e)
         return
+    if not args.model:
+        print(f'Using latest model: {model_path}')
 
-    model = YOLO(MODEL_PATH)
-    print(f"Loaded model: {os.path.basename(MODEL_PATH)}")
-    print(f"Classes: {list(model.names.values())[:8]}{'...' if len(model.names)>8 else ''}")
+    timer = StageTimer()
+    detector = Detector(model_path, conf=float(args.thresh), enhance=FrameEnhancer.from_args(args), runtime=args)
+    timer.info['model_load_ms'] = detector.load_ms
+    names = detector.names
+    print(f"Loaded model: {os.path.basename(model_path)}")
+    print(f"Classes: {list(names.values())[:8]}{'...' if len(names)>8 else ''}")
 
-    # Prepare source
-    if os.path.isdir(SOURCE):
-        files = sorted(glob.glob(os.path.join(SOURCE, "*.[jpJP][pnPN][gG]")))
-        print(f"Found {len(files)} images in folder")
-    else:
-        files = [SOURCE] if os.path.isfile(SOURCE) else []
-        if not files:
-            print("Invalid source! (not file or folder)")
-            return
+    # Prepare source: folder or single image path
+    if not os.path.exists(args.source):
+        print("Invalid source! (not file or folder)")
+        return
+    # JPEGs larger than the model input are decoded at 1/2 - 1/8 size for the model; boxes stay in image pixels
+    # folders are streamed, not listed; with --checkpoint an interrupted run continues where it stopped
+    source = ImageSource(args.source, 0 if args.full_decode else detector.input_size, args.checkpoint)
 
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    # annotated results are encoded and written in the background; inference only waits when the queue is full
+    writer = ImageWriter(args.output, args.format, args.quality, args.thumbnail, args.write_workers,
+                         args.write_queue) if SAVE_RESULTS else None
+    if writer is not None and source.checkpoint is not None:
+        # the checkpoint only moves past images whose results are on disk, so a crash loses none
+        source.checkpoint.before_save = writer.flush
+    store = EventStore(args.events) if args.events else None
+    skipped = 0
 
-    for i, img_path in enumerate(files, 1):
-        frame = cv2.imread(img_path)
-        if frame is None:
-            print(f"Cannot read image: {img_path}")
-            continue
+    for r in detect_stream(detector, source, timer=timer):
+        # position in the folder, the same when resuming
+        i = r.index + 1
+        print(f"\n[{i}] Processing: {os.path.basename(r.source)}")
 
-        print(f"\n[{i}/{len(files)}] Processing: {os.path.basename(img_path)}")
+        if store is not None:
+            store.add(r.source, r.index, r.ts, r.xyxy, [names[c] for c in r.cls], r.conf, r.size)
 
-        # Inference
-        results = model(frame, conf=CONF_THRESHOLD, verbose=False)
+        write = writer is not None and not (args.only_detections and len(r.boxes) == 0)
+        if writer is not None and not write:
+            skipped += 1
 
-        # Draw results
-        annotated = results[0].plot()  # ← ultralytics nice built-in visualization
+        # Draw results (not for an image that is neither shown nor written). A reduced decode is only
+        # for the model: results are drawn on the full-size image, unless a --thumbnail is smaller anyway
+        annotated = None
+        full = r.scale == 1.0 or (args.thumbnail and args.thumbnail <= max(r.frame.shape[:2]))
+        if full and (write or not args.headless):
+            with timer.stage('draw'):
+                annotated = plot(r.frame, r.frame_boxes, names)  # ← ultralytics nice built-in visualization
+        elif not args.headless:
+            with timer.stage('draw'):
+                annotated = render_full(r.source, r.boxes, names)
 
         # Show
-        cv2.imshow("YOLO Detection - Image Mode", annotated)
+        key = -1
+        if not args.headless:
+            with timer.stage('display'):
+                cv2.imshow("YOLO Detection - Image Mode", annotated)
+
+        if write:
+            # plot() made a new image, the writer can keep it; otherwise a writer thread decodes and draws
+            image = annotated if annotated is not None else partial(render_full, r.source, r.boxes, names)
+            with timer.stage('write'):
+                save_path = writer.submit(f"result_{i:03d}_{os.path.basename(r.source)}", image)
+            print(f"Queued for writing → {save_path}")
 
-        if SAVE_RESULTS:
-            save_path = os.path.join(OUTPUT_FOLDER, f"result_{i:03d}_{os.path.basename(img_path)}")
-            cv2.imwrite(save_path, annotated)
-            print(f"Saved → {save_path}")
+        # waiting for a key press is user time, not pipeline time
+        timer.frame_done()
 
-        key = cv2.waitKey(0) & 0xFF
+        if not args.headless:
+            key = cv2.waitKey(0) & 0xFF
+            timer.reset_frame_clock()
         if key == ord('q'):
             break
         elif key == ord('s'):
             cv2.waitKey(0)  # extra pause
 
-    print("\nFinished processing all images.")
-    cv2.destroyAllWindows()
+        if args.max_frames and timer.frames >= args.max_frames:
+            break
+
+    print("\nFinished processing all images." if source.complete else "\nStopped.")
+    if writer is not None:
+        # everything queued is on disk before the checkpoint is saved
+        writer.close()
+        timer.info['writer'] = dict(writer.summary(), skipped_without_detections=skipped)
+        if skipped:
+            print(f"Image writer: {skipped} images without detections not written")
+    source.close()
+    timer.info['runtime'] = detector.runtime_report
+    if detector.enhancer is not None:
+        timer.info['enhance'] = detector.enhancer.describe()
+    timer.print_summary()
+    if store is not None:
+        store.close()
+    if args.stats_json:
+        timer.write_json(args.stats_json, script='yolo_detect_input_image')
+    tracer.save()
+    if not args.headless:
+        cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,93 +1,25 @@
 import time
 import cv2
-import numpy as np
-from ultralytics import YOLO
-import mss                   # pip install mss
 import os
 import argparse
-import glob
 import sys
 
+if __package__ in (None, ''):
+    # run as a script (python inference/yolo_detect_share_screen.py): import through the package
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from inference.detector import Detector, detect_stream, plot, resolve_model
+from inference.enhance import FrameEnhancer, add_enhance_args
+from inference.event_store import DB_DEFAULT, EventStore
+from inference.frame_pool import FramePool
+from inference.hot_swap import ModelWatcher
+from inference.profiler import add_profile_arg, tracer
+from inference.roi import load_rois
+from inference.runtime import add_runtime_args
+from inference.sources import ScreenSource
+from inference.stage_timer import StageTimer
+
 # ================= CONFIG =================
-# Define and parse user input arguments
-
-parser = argparse.ArgumentParser()
-
-parser.add_argument(
-    '--model',
-    help='Path to YOLO model file. If not set, use latest model in models/',
-    default=None
-)
-
-parser.add_argument(
-    '--source',
-    help='Image source. Default: usb0',
-    default='usb0'
-)
-
-parser.add_argument(
-    '--thresh',
-    help='Minimum confidence threshold',
-    type=float,
-    default=0.5
-)
-
-parser.add_argument(
-    '--resolution',
-    help='Resolution WxH. Default: 1280x720',
-    default='1280x720'
-)
-
-parser.add_argument(
-    '--record',
-    help='Record output video',
-    action='store_true'
-)
-
-parser.add_argument(
-    '--path',
-    help='Path to YOLO model file. If not set, use latest model in models/',
-    default=None
-)
-
-args = parser.parse_args()
-
-# Model selection logic
-if args.model:
-    model_path = args.model
-elif args.path:
-    model_dir = os.path.join('models', args.path)
-    model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-
-    if not model_files:
-        print('ERROR: No model found in models/ folder.')
-        sys.exit(1)
-
-    model_files.sort(key=os.path.getmtime, reverse=True)
-    model_path = model_files[0]
-
-    print(f'Using latest model: {model_path}')
-else:
-    model_dir = 'models'
-    model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-
-    if not model_files:
-        model_dir = 'models/original'
-        model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-        if not model_files:
-            model_dir = 'models/sharpen'
-            model_files = glob.glob(os.path.join(model_dir, '*.pt'))
-            if not model_files:
-                print('ERROR: No model found in models/ folder.')
-                sys.exit(1)
-
-    print(f'Using latest model latest models in: {model_dir}')
-    model_files.sort(key=os.path.getmtime, reverse=True)
-    model_path = model_files[0]
-
-    print(f'Using latest model: {model_path}')
-
-MODEL_PATH = model_path           
 CONF_THRESHOLD = 0.4
 FPS_TARGET = 12              # try to limit cpu usage
 
@@ -106,70 +38,258 @@ REGION = {"top": 0, "left": 0, "width": 920, "height": 1080}
 WINDOW_NAME = "YOLO Screen Detection (Press ESC or q to quit)"
 # ==========================================
 
-def main():
-    if not os.path.exists(MODEL_PATH):
-        print(f"Model not found → {MODEL_PATH}")
-        return
-
-    model = YOLO(MODEL_PATH)
-    print(f"Loaded: {os.path.basename(MODEL_PATH)}")
 
-    sct = mss.mss()
-    monitors = sct.monitors
-
-    if MONITOR_NUMBER >= len(monitors):
-        print(f"Monitor {MONITOR_NUMBER} not found! Available: 0–{len(monitors)-1}")
+def parse_args(argv=None):
+    # Define and parse user input arguments
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--model',
+        help='Path to YOLO model file. If not set, use latest model in models/',
+        default=None
+    )
+
+    parser.add_argument(
+        '--source',
+        help='Image source. Default: usb0',
+        default='usb0'
+    )
+
+    parser.add_argument(
+        '--thresh',
+        help='Minimum confidence threshold',
+        type=float,
+        default=0.5
+    )
+
+    parser.add_argument(
+        '--resolution',
+        help='Resolution WxH. Default: 1280x720',
+        default='1280x720'
+    )
+
+    parser.add_argument(
+        '--record',
+        help='Record output video',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--path',
+        help='Path to YOLO model file. If not set, use latest model in models/',
+        default=None
+    )
+
+    parser.add_argument(
+        '--replay',
+        help='Feed frames from this video instead of the screen (headless testing, benchmarks)',
+        default=None
+    )
+
+    parser.add_argument(
+        '--headless',
+        help='Do not open display windows and do not throttle to FPS_TARGET',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--max-frames',
+        help='Stop after this many frames (0 = no limit)',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--stats-json',
+        help='Write per-stage timing statistics to this JSON file on exit',
+        default=None
+    )
+
+    parser.add_argument(
+        '--watch-models',
+        help='Hot-swap: load newer weights from this folder (default: models) without stopping; SIGHUP reloads now',
+        nargs='?',
+        const='models',
+        default=None
+    )
+
+    parser.add_argument(
+        '--watch-pattern',
+        help='Hot-swap: file pattern in the watched folder. Default: the running model\'s family, e.g. raw_*_best.pt',
+        default=None
+    )
+
+    parser.add_argument(
+        '--events',
+        help=f'Save detections to an event store for later queries (default file: {DB_DEFAULT})',
+        nargs='?',
+        const=DB_DEFAULT,
+        default=None
+    )
+
+    parser.add_argument(
+        '--roi',
+        help='YAML file with regions of interest per source (see inference/roi.yaml); only those regions are inferred',
+        default=None
+    )
+
+    parser.add_argument(
+        '--target-ms',
+        help='Per-frame latency target; switches the model input size to meet it (0 = fixed size)',
+        type=float,
+        default=0
+    )
+
+    parser.add_argument(
+        '--imgsz-set',
+        help='Input sizes the latency controller may use. Default: 320 480 640 960',
+        type=int,
+        nargs='+',
+        default=[320, 480, 640, 960]
+    )
+
+    parser.add_argument(
+        '--confirm-model',
+        help='Cascade mode: --model screens every frame, this (larger) model confirms where it found candidates',
+        default=None
+    )
+
+    parser.add_argument(
+        '--screen-conf',
+        help='Cascade: minimum confidence for a screening candidate',
+        type=float,
+        default=0.25
+    )
+
+    parser.add_argument(
+        '--accept-conf',
+        help='Cascade: keep screening results without confirmation when all candidates reach this (1.0 = always confirm)',
+        type=float,
+        default=1.0
+    )
+
+    parser.add_argument(
+        '--escalate',
+        help='Cascade: confirm on crops around the candidates or on the whole frame',
+        choices=['crops', 'frame'],
+        default='crops'
+    )
+
+    add_enhance_args(parser)
+    add_runtime_args(parser)
+    add_profile_arg(parser)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        tracer.enable(args.profile)
+
+    # Model selection logic
+    try:
+        model_path = resolve_model(args.model, args.path)
+    except FileNotFoundError as e:
+        print(f"Model not found → {e}")
         return
+    if not args.model:
+        print(f'Using latest model: {model_path}')
 
-    monitor = monitors[MONITOR_NUMBER] if REGION is None else REGION
+    try:
+        source = ScreenSource(MONITOR_NUMBER, REGION, args.replay)
+    except ValueError as e:
+        print(e)
+        return
 
-    print(f"Capturing monitor {MONITOR_NUMBER} ({monitor['width']}×{monitor['height']})")
+    timer = StageTimer()
+    rois = load_rois(args.roi, 'screen') if args.roi else None
+    detector = Detector(model_path, conf=CONF_THRESHOLD, confirm_model=args.confirm_model,
+                        screen_conf=args.screen_conf, accept_conf=args.accept_conf, escalate=args.escalate,
+                        rois=rois, target_ms=args.target_ms, imgsz_set=args.imgsz_set,
+                        enhance=FrameEnhancer.from_args(args), runtime=args)
+    timer.info['model_load_ms'] = detector.load_ms
+    print(f"Loaded: {os.path.basename(model_path)}")
+
+    print(f"Capturing monitor {MONITOR_NUMBER} ({source.monitor['width']}×{source.monitor['height']})")
+    detector.warmup(source.shape)
     print("Press ESC / q to quit\n")
 
     prev_time = time.time()
+    pool = FramePool()
+    store = EventStore(args.events) if args.events else None
 
-    while True:
-        # Screen capture
-        screenshot = np.array(sct.grab(monitor))
-        # Convert BGRA → BGR
-        frame = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2BGR)
-
-        # Inference
-        results = model(frame, conf=CONF_THRESHOLD, verbose=False)
-
-        # Draw nice results (ultralytics built-in)
-        annotated = results[0].plot()
+    # New weights are loaded and warmed next to the loop and swapped in between two frames
+    watcher = ModelWatcher(detector, args.watch_models, args.watch_pattern) if args.watch_models else None
 
-        # FPS calculation
-        now = time.time()
-        fps = 1 / (now - prev_time + 1e-8)
-        prev_time = now
-
-        cv2.putText(annotated, f"FPS: {fps:.1f}", (8, 28),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-        cv2.imshow(WINDOW_NAME, annotated)
-
-        # Control FPS + exit
-        if FPS_TARGET > 0:
-            delay = max(1, int(1000 / FPS_TARGET - (time.time() - now) * 1000))
-            key = cv2.waitKey(delay) & 0xFF
-        else:
-            key = cv2.waitKey(1) & 0xFF
-
-        if key == ord('q') or key == 27:  # q or ESC
-            break
-
-        # Optional: keyboard library way (cleaner exit)
-        # if keyboard.is_pressed('esc'):
-        #     break
+    try:
+        for r in detect_stream(detector, source, pool=pool, timer=timer):
+            if store is not None:
+                store.add(r.source, r.index, r.ts, r.xyxy, [detector.names[c] for c in r.cls],
+                          r.conf, (r.frame.shape[1], r.frame.shape[0]))
+
+            # Draw nice results (ultralytics built-in, on a copy)
+            with timer.stage('draw'):
+                annotated = plot(r.frame, r.boxes, detector.names)
+                if rois is not None:
+                    rois.draw(annotated)
+
+            # FPS calculation
+            now = time.time()
+            fps = 1 / (now - prev_time + 1e-8)
+            prev_time = now
+
+            cv2.putText(annotated, f"FPS: {fps:.1f}", (8, 28),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+            if detector.ctl is not None:
+                cv2.putText(annotated, f"imgsz: {detector.ctl.size}", (8, 56),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+
+            key = -1
+            if not args.headless:
+                with timer.stage('display'):
+                    cv2.imshow(WINDOW_NAME, annotated)
+                timer.frame_done()
+
+                # Control FPS + exit (throttle sleep is not pipeline time)
+                if FPS_TARGET > 0:
+                    delay = max(1, int(1000 / FPS_TARGET - (time.time() - now) * 1000))
+                    key = cv2.waitKey(delay) & 0xFF
+                else:
+                    key = cv2.waitKey(1) & 0xFF
+                timer.reset_frame_clock()
+            else:
+                timer.frame_done()
+
+            if key == ord('q') or key == 27:  # q or ESC
+                break
+
+            if args.max_frames and timer.frames >= args.max_frames:
+                break
+
+            # Optional: keyboard library way (cleaner exit)
+            # if keyboard.is_pressed('esc'):
+            #     break
+    except KeyboardInterrupt:
+        print("\nStopped by user")
 
     print("Exiting...")
-    cv2.destroyAllWindows()
+    detector.print_summary()
+    timer.info.update({k: v for k, v in detector.summary().items() if k in ['runtime', 'cascade', 'imgsz', 'enhance']})
+    if watcher is not None:
+        watcher.close()
+        timer.info['hot_swap'] = watcher.summary()
+    timer.print_summary()
+    source.close()
+    if store is not None:
+        store.close()
+    if args.stats_json:
+        timer.write_json(args.stats_json, script='yolo_detect_share_screen')
+    tracer.save()
+    if not args.headless:
+        cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    try:
-        main()
-    except KeyboardInterrupt:
-        print("\nStopped by user")
\ No newline at end of file
+    main()
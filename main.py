@@ -1,30 +1,299 @@
-import subprocess, sys
+"""
+Run the full pipeline as a small cached DAG:
+
+  enhance ─► split_enhanced ─► yaml_enhanced ─► train_enhanced ─► eval_enhanced
+  split_raw ─► yaml_raw ─► train_raw ─► eval_raw
+
+Each stage declares its inputs and outputs. A stage is skipped when the
+content hash of its inputs (plus its command) matches the last successful run
+and its outputs still exist. Stages whose dependencies are done run in
+parallel with --jobs N (default 1: one at a time, output on the console);
+training / evaluation share --device-slots so they don't fight over one GPU.
+
+State and reports go to runs/pipeline/:
+  state.json        last successful input hash per stage
+  file_hashes.json  per-file digest cache (size + mtime -> digest)
+  report_*.json     status and timings of every stage for one run
+  logs/<stage>.log  stage output when running with --jobs > 1
+
+Run:
+  python main.py
+  python main.py --jobs 2 --device-slots 1
+  python main.py --force train_raw eval_raw
+  python main.py --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent
 S = ROOT / "scripts"
 PY = sys.executable
+STATE_DIR = ROOT / "runs" / "pipeline"
 
 
-def run(cmd):
-    print("\nRUNNING:", " ".join(map(str, cmd)))
-    if subprocess.run(cmd).returncode != 0:
-        print("STOPPED DUE TO ERROR")
+class Stage:
+    def __init__(self, name, cmd, inputs, outputs, deps=(), resource=None):
+        self.name = name
+        self.cmd = [str(c) for c in cmd]
+        self.inputs = list(inputs)      # files, folders or glob patterns (relative to ROOT)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.resource = resource        # e.g. "device": limited by --device-slots
+
+
+def build_stages():
+    stages = [
+        # Enhancement option
+        # Stage("enhance", [PY, S / "enhance_dataset.py"], ...)
+        # Stage("enhance", [PY, S / "sharpen_all_images_unsharp.py"], ...)
+        Stage("enhance", [PY, S / "enhance_yolo_aerial.py"],
+              inputs=["dataset/raw/images", "dataset/raw/labels",
+                      "scripts/enhance_yolo_aerial.py", "scripts/image_pipeline.py"],
+              outputs=["dataset/enhanced/images", "dataset/enhanced/labels"]),
+    ]
+
+    # Set up training and evaluate, one branch per dataset
+    for tag in ["raw", "enhanced"]:
+        deps = ["enhance"] if tag == "enhanced" else []
+        stages += [
+            Stage(f"split_{tag}", [PY, S / "split_dataset.py", "--dataset", tag],
+                  inputs=[f"dataset/{tag}/images", f"dataset/{tag}/labels",
+                          "scripts/split_dataset.py", "scripts/image_pipeline.py"],
+                  outputs=[f"dataset/splits/{tag}"], deps=deps),
+            Stage(f"yaml_{tag}", [PY, S / "create_data_yaml.py", "--dataset", tag],
+                  inputs=["dataset/classes.txt", "scripts/create_data_yaml.py"],
+                  outputs=[f"dataset/data_{tag}.yaml"], deps=[f"split_{tag}"]),
+            Stage(f"train_{tag}", [PY, S / "train.py", "--dataset", tag],
+                  inputs=[f"dataset/splits/{tag}", f"dataset/data_{tag}.yaml", "yolo11s.pt",
+                          "scripts/train.py", "scripts/train_autotune.py", "scripts/train_ddp.py"],
+                  outputs=[f"models/{tag}_*_best.pt"], deps=[f"yaml_{tag}"], resource="device"),
+            Stage(f"eval_{tag}", [PY, S / "evaluate.py", "--dataset", tag],
+                  inputs=[f"models/{tag}_*_best.pt", f"dataset/splits/{tag}/test",
+                          f"dataset/data_{tag}.yaml", "scripts/evaluate.py"],
+                  outputs=[], deps=[f"train_{tag}"], resource="device"),
+        ]
+    return stages
+
+
+# -------------------------------------------------
+# Content hashing
+# -------------------------------------------------
+class FileHasher:
+    """blake2b of file contents, cached by (size, mtime) so unchanged files aren't re-read."""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+        self.lock = threading.Lock()
+
+    def file_digest(self, path):
+        rel = path.relative_to(ROOT).as_posix()
+        st = path.stat()
+        key = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            hit = self.cache.get(rel)
+        if hit and hit[:2] == key:
+            return hit[2]
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.lock:
+            self.cache[rel] = key + [digest]
+        return digest
+
+    def expand(self, pattern):
+        p = ROOT / pattern
+        if any(c in pattern for c in "*?["):
+            matches = sorted(ROOT.glob(pattern))
+        else:
+            matches = [p] if p.exists() else []
+        files = []
+        for m in matches:
+            if m.is_dir():
+                files += sorted(f for f in m.rglob("*") if f.is_file())
+            else:
+                files.append(m)
+        return files
+
+    def stage_digest(self, stage):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps([Path(c).name if os.path.isabs(c) else c for c in stage.cmd]).encode())
+        for pattern in stage.inputs:
+            files = self.expand(pattern)
+            h.update(f"\0{pattern}:{len(files)}".encode())
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                digests = list(pool.map(self.file_digest, files))
+            for f, d in zip(files, digests):
+                h.update(f"{f.relative_to(ROOT).as_posix()}={d}\n".encode())
+        return h.hexdigest()
+
+    def save(self):
+        with self.lock:
+            self.cache_path.write_text(json.dumps(self.cache))
+
+
+def outputs_exist(stage):
+    for pattern in stage.outputs:
+        if not any(ROOT.glob(pattern)):
+            return False
+    return True
+
+
+# -------------------------------------------------
+# Runner
+# -------------------------------------------------
+def run_stage(stage, log_path):
+    print(f"\nRUNNING [{stage.name}]:", " ".join(stage.cmd))
+    t0 = time.perf_counter()
+    if log_path is None:
+        code = subprocess.run(stage.cmd, cwd=ROOT).returncode
+    else:
+        with open(log_path, "w") as log:
+            code = subprocess.run(stage.cmd, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT).returncode
+    return code, time.perf_counter() - t0
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("stages", nargs="*", help="Only run these stages (and what they need)")
+    p.add_argument("--jobs", type=int, default=1,
+                   help="Max stages running at once (> 1: output goes to runs/pipeline/logs/)")
+    p.add_argument("--device-slots", type=int, default=1,
+                   help="Max train/eval stages running at once (GPUs available)")
+    p.add_argument("--force", action="store_true", help="Ignore cache for the selected stages")
+    p.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    return p.parse_args()
+
+
+def select(stages, names):
+    """Named stages plus all their upstream dependencies."""
+    by_name = {s.name: s for s in stages}
+    unknown = set(names) - set(by_name)
+    if unknown:
+        print("Unknown stages:", ", ".join(sorted(unknown)), "| available:", ", ".join(by_name))
         exit(1)
+    keep = set()
+    todo = list(names)
+    while todo:
+        n = todo.pop()
+        if n not in keep:
+            keep.add(n)
+            todo += by_name[n].deps
+    return [s for s in stages if s.name in keep]
 
 
 def main():
+    args = parse_args()
+
+    stages = build_stages()
+    if args.stages:
+        stages = select(stages, args.stages)
+    forced = set(args.stages) if args.stages else {s.name for s in stages}
+
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    (STATE_DIR / "logs").mkdir(exist_ok=True)
+    state_path = STATE_DIR / "state.json"
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    hasher = FileHasher(STATE_DIR / "file_hashes.json")
+
+    slots = {"device": threading.Semaphore(max(1, args.device_slots))}
+    report = {}
+    pending = {s.name: s for s in stages}
+    status = {}
+    running = {}
+    lock = threading.Lock()
+
+    def execute(stage):
+        started = datetime.now().isoformat(timespec="seconds")
+        t0 = time.perf_counter()
+        digest = hasher.stage_digest(stage)
+        hash_s = time.perf_counter() - t0
+
+        cached = state.get(stage.name) == digest and outputs_exist(stage)
+        if cached and not (args.force and stage.name in forced):
+            print(f"SKIPPED [{stage.name}]: inputs unchanged")
+            return {"status": "skipped", "started": started, "hash_s": hash_s, "run_s": 0.0}
+
+        if args.dry_run:
+            print(f"WOULD RUN [{stage.name}]:", " ".join(stage.cmd))
+            return {"status": "dry-run", "started": started, "hash_s": hash_s, "run_s": 0.0}
 
-    # Enhancement option
-    # run([PY, S / "enhance_dataset.py"])
-    # run([PY, S / "sharpen_all_images_unsharp.py"])
-    run([PY, S / "enhance_yolo_aerial.py"])
+        log_path = STATE_DIR / "logs" / f"{stage.name}.log" if args.jobs > 1 else None
+        sem = slots.get(stage.resource)
+        if sem:
+            sem.acquire()
+        try:
+            code, run_s = run_stage(stage, log_path)
+        finally:
+            if sem:
+                sem.release()
 
-    # Set up trainning and evaluate
-    run([PY, S / "split_dataset.py"])
-    run([PY, S / "create_data_yaml.py"])
-    run([PY, S / "train.py"])
-    run([PY, S / "evaluate.py"])
+        if code != 0:
+            print(f"FAILED [{stage.name}] (exit {code})" + (f", see {log_path}" if log_path else ""))
+            return {"status": "failed", "started": started, "hash_s": hash_s, "run_s": run_s,
+                    "exit_code": code}
+
+        # inputs of later stages may include this stage's outputs: store the
+        # hash computed before running, it is what decided this run
+        with lock:
+            state[stage.name] = digest
+            state_path.write_text(json.dumps(state, indent=2))
+        print(f"DONE [{stage.name}] in {run_s:.1f}s")
+        return {"status": "ran", "started": started, "hash_s": hash_s, "run_s": run_s}
+
+    t_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                dep_status = [status.get(d) for d in stage.deps if d in {s.name for s in stages}]
+                if any(st in ("failed", "blocked") for st in dep_status):
+                    status[name] = "blocked"
+                    report[name] = {"status": "blocked"}
+                    del pending[name]
+                elif all(st in ("ran", "skipped", "dry-run") for st in dep_status):
+                    running[pool.submit(execute, stage)] = name
+                    del pending[name]
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    report[name] = fut.result()
+                except Exception as e:
+                    report[name] = {"status": "failed", "error": repr(e)}
+                status[name] = report[name]["status"]
+
+    hasher.save()
+    total_s = time.perf_counter() - t_total
+
+    report_path = STATE_DIR / f"report_{datetime.now():%Y_%m_%d_%H%M%S}.json"
+    with open(report_path, "w") as f:
+        json.dump({"total_s": total_s, "jobs": args.jobs, "stages": report}, f, indent=2)
+
+    print("\n===== PIPELINE REPORT =====")
+    for s in stages:
+        r = report.get(s.name, {})
+        print(f"{s.name:<16} {r.get('status', '?'):<8} "
+              f"run {r.get('run_s', 0):8.1f}s   hash {r.get('hash_s', 0):6.1f}s")
+    print(f"Total: {total_s:.1f}s  (report: {report_path})")
+
+    if any(st in ("failed", "blocked") for st in status.values()):
+        print("STOPPED DUE TO ERROR")
+        exit(1)
 
     print("\nALL PIPELINE STEPS COMPLETED SUCCESSFULLY\n")
 
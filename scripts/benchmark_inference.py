@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Reproducible CPU benchmark of every inference entry point.
+
+Generates synthetic aerial-like frames (textured ground, runway, small
+aircraft silhouettes) and a synthetic video, then runs each inference
+script headlessly on CPU and collects its per-stage timings:
+
+  detect_folder   inference/yolo_detect.py --source <images>
+  detect_video    inference/yolo_detect.py --source <video>
+  detect_record   inference/yolo_detect.py --source <video> --record
+  input_image     inference/yolo_detect_input_image.py --source <images>
+  share_screen    inference/yolo_detect_share_screen.py --replay <video>
+
+Results (warm-up, FPS, frame / stage latency percentiles) are written to
+runs/benchmark/results.json and compared against a stored baseline; any
+case slower than --tolerance fails the run (exit code 1).
+
+Run:
+  python scripts/benchmark_inference.py
+  python scripts/benchmark_inference.py --update-baseline
+  python scripts/benchmark_inference.py --cases detect_video share_screen --frames 100
+  python scripts/benchmark_inference.py --model models/raw_2026_01_11_001_best.pt
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+INFER = ROOT / "inference"
+OUT_DIR = ROOT / "runs" / "benchmark"
+BASELINE_DEFAULT = ROOT / "benchmarks" / "baseline.json"
+
+SEED = 1234
+
+
+# -------------------------------------------------
+# Synthetic data
+# -------------------------------------------------
+def aerial_frame(rng, w, h, t=0.0):
+    """Ground texture + runway + a few aircraft silhouettes (BGR uint8)."""
+    small = rng.integers(40, 140, (h // 16 + 1, w // 16 + 1, 3), dtype=np.uint8)
+    ground = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    ground = cv2.GaussianBlur(ground, (0, 0), 3)
+    ground[..., 1] = cv2.add(ground[..., 1], 25)            # greener fields
+    noise = rng.normal(0, 6, (h, w, 1)).astype(np.int16)
+    frame = np.clip(ground.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    # runway
+    y = h // 2
+    cv2.rectangle(frame, (0, y - h // 20), (w, y + h // 20), (90, 90, 95), cv2.FILLED)
+    for x in range(0, w, w // 16):
+        cv2.line(frame, (x, y), (x + w // 40, y), (230, 230, 230), 2)
+
+    # aircraft: fuselage + wings + tail, drifting with t
+    for k in range(int(rng.integers(2, 6))):
+        s = int(rng.integers(8, 40))
+        cx = int((rng.integers(0, w) + t * 40 * (k + 1)) % w)
+        cy = int(rng.integers(s, h - s))
+        ang = float(rng.uniform(0, 180))
+        pts = np.array([[-s, 0], [s, 0], [0, 0], [0, -s * 0.8], [0, s * 0.8],
+                        [-s * 0.8, -s * 0.3], [-s * 0.8, s * 0.3]], np.float32)
+        rot = cv2.getRotationMatrix2D((0, 0), ang, 1.0)[:, :2]
+        p = (pts @ rot.T + [cx, cy]).astype(np.int32)
+        color = (205, 205, 210)
+        cv2.line(frame, tuple(p[0]), tuple(p[1]), color, max(2, s // 4))
+        cv2.line(frame, tuple(p[3]), tuple(p[4]), color, max(2, s // 6))
+        cv2.line(frame, tuple(p[5]), tuple(p[6]), color, max(1, s // 8))
+    return frame
+
+
+def make_dataset(data_dir: Path, n_images, n_video, w, h):
+    """Write images + video once per (count, size); reused on later runs."""
+    stamp = data_dir / f"params_{n_images}_{n_video}_{w}x{h}.txt"
+    images = data_dir / "images"
+    video = data_dir / "video.avi"
+    if stamp.exists():
+        return images, video
+
+    images.mkdir(parents=True, exist_ok=True)
+    for f in images.iterdir():
+        f.unlink()
+    for f in data_dir.glob("params_*.txt"):
+        f.unlink()
+
+    rng = np.random.default_rng(SEED)
+    for i in range(n_images):
+        cv2.imwrite(str(images / f"aerial_{i:04d}.jpg"), aerial_frame(rng, w, h),
+                    [int(cv2.IMWRITE_JPEG_QUALITY), 92])
+
+    rng = np.random.default_rng(SEED + 1)
+    writer = cv2.VideoWriter(str(video), cv2.VideoWriter_fourcc(*"MJPG"), 30, (w, h))
+    base_seed = int(rng.integers(1 << 30))
+    for i in range(n_video):
+        # same scene every frame, aircraft drift with t: like a fixed camera
+        writer.write(aerial_frame(np.random.default_rng(base_seed), w, h, t=i / 30))
+    writer.release()
+
+    stamp.write_text("ok\n")
+    return images, video
+
+
+def benchmark_model(path):
+    """Explicit model, else yolo11n.pt in the repo, else a seeded random yolo11n (offline)."""
+    if path:
+        return Path(path)
+    if (ROOT / "yolo11n.pt").exists():
+        return ROOT / "yolo11n.pt"
+    out = OUT_DIR / "yolo11n_random.pt"
+    if not out.exists():
+        import torch
+        from ultralytics import YOLO
+        torch.manual_seed(SEED)
+        OUT_DIR.mkdir(parents=True, exist_ok=True)
+        YOLO("yolo11n.yaml").save(str(out))
+    return out
+
+
+# -------------------------------------------------
+# Cases
+# -------------------------------------------------
+def cases(images, video, res):
+    return {
+        "detect_folder": [INFER / "yolo_detect.py", "--source", images, "--resolution", res],
+        "detect_video": [INFER / "yolo_detect.py", "--source", video, "--resolution", res],
+        "detect_record": [INFER / "yolo_detect.py", "--source", video, "--resolution", res, "--record"],
+        "input_image": [INFER / "yolo_detect_input_image.py", "--source", images,
+                        "--output", OUT_DIR / "work" / "input_image_out"],
+        "share_screen": [INFER / "yolo_detect_share_screen.py", "--replay", video],
+    }
+
+
+def run_case(name, cmd, model, frames, threads):
+    work = OUT_DIR / "work"
+    work.mkdir(parents=True, exist_ok=True)
+    stats_path = work / f"{name}.json"
+    if stats_path.exists():
+        stats_path.unlink()
+
+    full = [sys.executable, *map(str, cmd), "--model", str(model), "--headless",
+            "--max-frames", str(frames), "--stats-json", str(stats_path)]
+
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES="")     # CPU only
+    if threads:
+        env.update(OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+
+    print(f"\n--- {name} ---")
+    proc = subprocess.run(full, cwd=work, env=env, capture_output=True, text=True)
+    if proc.returncode != 0 or not stats_path.exists():
+        print(proc.stdout[-2000:])
+        print(proc.stderr[-2000:])
+        raise RuntimeError(f"benchmark case {name} failed (exit {proc.returncode})")
+
+    with open(stats_path) as f:
+        stats = json.load(f)
+    p = stats["frame"]
+    print(f"{stats['fps']:7.2f} FPS   frame p50 {p['p50_ms']:.1f} ms  p99 {p['p99_ms']:.1f} ms   "
+          f"warm-up {stats['warmup'].get('frame_ms', 0):.0f} ms   peak RSS {stats.get('peak_rss_mb') or 0:.0f} MB")
+    for stage, s in stats["stages"].items():
+        print(f"    {stage:<12} p50 {s['p50_ms']:8.2f} ms   p99 {s['p99_ms']:8.2f} ms")
+    return stats
+
+
+# -------------------------------------------------
+# Baseline comparison
+# -------------------------------------------------
+def compare(results, baseline, tolerance):
+    """Regression = throughput or median frame latency worse than tolerance."""
+    failures = []
+    print("\n===== BASELINE COMPARISON =====")
+    for name, cur in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            print(f"{name:<14} (no baseline)")
+            continue
+        fps_ratio = cur["fps"] / max(base["fps"], 1e-9)
+        p50_ratio = cur["frame"]["p50_ms"] / max(base["frame"]["p50_ms"], 1e-9)
+        bad = fps_ratio < 1 - tolerance or p50_ratio > 1 + tolerance
+        print(f"{name:<14} FPS {base['fps']:7.2f} -> {cur['fps']:7.2f} ({fps_ratio - 1:+.1%})   "
+              f"p50 {base['frame']['p50_ms']:7.1f} -> {cur['frame']['p50_ms']:7.1f} ms ({p50_ratio - 1:+.1%})"
+              f"{'   REGRESSION' if bad else ''}")
+        for stage, s in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if b and b.get("p50_ms"):
+                print(f"    {stage:<12} {b['p50_ms']:8.2f} -> {s['p50_ms']:8.2f} ms "
+                      f"({s['p50_ms'] / b['p50_ms'] - 1:+.1%})")
+        if bad:
+            failures.append(name)
+    return failures
+
+
+def environment():
+    import torch
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", default=None, help="Model to benchmark (default: yolo11n.pt or random yolo11n)")
+    p.add_argument("--cases", nargs="*", default=None, help="Subset of cases to run")
+    p.add_argument("--frames", type=int, default=60, help="Frames per case (first one is warm-up)")
+    p.add_argument("--size", default="1280x720", help="Synthetic frame size WxH")
+    p.add_argument("--threads", type=int, default=0, help="Pin OMP/MKL threads (0 = library default)")
+    p.add_argument("--out", default=str(OUT_DIR / "results.json"))
+    p.add_argument("--baseline", default=str(BASELINE_DEFAULT))
+    p.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown vs baseline (0.15 = 15%%)")
+    args = p.parse_args()
+
+    w, h = (int(v) for v in args.size.split("x"))
+    images, video = make_dataset(OUT_DIR / "data", args.frames, args.frames, w, h)
+    model = benchmark_model(args.model)
+    print(f"Model: {model}")
+
+    all_cases = cases(images, video, args.size)
+    selected = args.cases or list(all_cases)
+    unknown = set(selected) - set(all_cases)
+    if unknown:
+        p.error(f"unknown cases: {', '.join(sorted(unknown))} (available: {', '.join(all_cases)})")
+
+    results = {
+        "env": environment(),
+        "params": {"frames": args.frames, "size": args.size, "threads": args.threads,
+                   "model": model.name, "seed": SEED},
+        "cases": {name: run_case(name, all_cases[name], model, args.frames, args.threads)
+                  for name in selected},
+    }
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults: {out}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+        return
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("params") != results["params"]:
+        print("WARNING: baseline was recorded with different parameters:", baseline.get("params"))
+
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print(f"\nPERFORMANCE REGRESSION in: {', '.join(failures)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
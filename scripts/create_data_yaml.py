@@ -1,3 +1,4 @@
+import argparse
 import yaml
 from pathlib import Path
 
@@ -17,6 +18,11 @@ def make(name):
     with open(ROOT/f"dataset/data_{name}.yaml","w") as f:
         yaml.dump(data,f,sort_keys=False)
 
-make("raw")
-make("enhanced")
+p = argparse.ArgumentParser()
+p.add_argument("--dataset", choices=["raw", "enhanced", "tiled"], nargs="*",
+               default=["raw", "enhanced"])
+args = p.parse_args()
+
+for name in args.dataset:
+    make(name)
 print("YAML created")
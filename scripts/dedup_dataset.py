@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Find near-duplicate frames in the raw dataset with perceptual hashes.
+
+Long runs of almost identical aerial captures inflate training time and leak
+between train and test. This tool:
+
+  1. hashes every image under dataset/raw/images in parallel (dHash or pHash,
+     64 bits each, stored as a packed uint64 array)
+  2. finds all pairs within --max-dist Hamming distance, using a multi-index
+     (exact bands, pigeonhole) for small distances and a blocked vectorized
+     XOR/popcount scan otherwise
+  3. merges pairs into clusters (union-find)
+
+Output (dataset/raw/dedup/ by default):
+  hashes.npz   stems, file stats and hashes (reused on the next run)
+  groups.json  {stem: cluster_id} -> split_dataset.py --groups
+  keep.txt     one stem per cluster  -> split_dataset.py --keep
+
+Run:
+  python scripts/dedup_dataset.py
+  python scripts/dedup_dataset.py --hash phash --max-dist 6
+  python scripts/split_dataset.py --groups dataset/raw/dedup/groups.json
+  python scripts/split_dataset.py --keep dataset/raw/dedup/keep.txt --groups dataset/raw/dedup/groups.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from image_pipeline import add_pipeline_args, pipeline_kwargs, run_pipeline, scan_images
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+# -------------------------------------------------
+# Hashing
+# -------------------------------------------------
+def read_gray_small(path):
+    # hashes only need a 32x32 thumbnail, let libjpeg skip most of the pixels
+    return cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+
+
+def pack_bits(bits):
+    """64 booleans -> one uint64 (big-endian bit order)."""
+    return int(np.packbits(bits.ravel()).view(">u8")[0])
+
+
+def dhash(gray):
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return pack_bits(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray):
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    return pack_bits(low > np.median(low.ravel()[1:]))
+
+
+HASHES = {"dhash": dhash, "phash": phash}
+
+
+def hash_job(path, gray, method):
+    return HASHES[method](gray)
+
+
+# -------------------------------------------------
+# Hamming search
+# -------------------------------------------------
+if hasattr(np, "bitwise_count"):
+    def popcount(x):
+        return np.bitwise_count(x)
+else:
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(x):
+        x = np.ascontiguousarray(x)
+        return _POP8[x.view(np.uint8)].reshape(*x.shape, 8).sum(-1, dtype=np.uint8)
+
+
+def pairs_brute(hashes, max_dist, block_elems=1 << 24):
+    """Blocked upper-triangle scan: XOR + popcount on whole blocks at once."""
+    n = len(hashes)
+    block = max(1, block_elems // max(n, 1))
+    out = []
+    for i in range(0, n, block):
+        rows = hashes[i:i + block]
+        d = popcount(rows[:, None] ^ hashes[None, i:])
+        r, c = np.nonzero(d <= max_dist)
+        r = r + i
+        c = c + i
+        keep = c > r
+        out.append(np.stack([r[keep], c[keep]], axis=1))
+    return np.concatenate(out) if out else np.empty((0, 2), dtype=np.int64)
+
+
+def pairs_multi_index(hashes, max_dist):
+    """
+    Multi-index hashing: split the 64 bits into max_dist + 1 bands. Two hashes
+    within max_dist differ in at most max_dist bands, so they agree exactly on
+    at least one. Candidates share a band value; then verify with popcount.
+    """
+    n_bands = max_dist + 1
+    edges = np.linspace(0, 64, n_bands + 1).astype(int)
+    found = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        band = (hashes >> np.uint64(64 - hi)) & np.uint64((1 << (hi - lo)) - 1)
+        order = np.argsort(band, kind="stable")
+        sorted_band = band[order]
+        starts = np.flatnonzero(np.r_[True, sorted_band[1:] != sorted_band[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for s, e in zip(starts, ends):
+            if e - s < 2:
+                continue
+            idx = np.sort(order[s:e])
+            sub = pairs_brute(hashes[idx], max_dist)
+            if len(sub):
+                found.append(idx[sub])
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def find_pairs(hashes, max_dist, method="auto"):
+    if method == "auto":
+        # multi-index pays off while bands stay wide enough to be selective
+        method = "mih" if max_dist <= 7 and len(hashes) > 4096 else "brute"
+    if method == "mih":
+        return pairs_multi_index(hashes, max_dist)
+    return pairs_brute(hashes, max_dist)
+
+
+def clusters_from_pairs(n, pairs):
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    roots = np.array([find(i) for i in range(n)])
+    _, labels = np.unique(roots, return_inverse=True)
+    return labels
+
+
+# -------------------------------------------------
+# Cache
+# -------------------------------------------------
+def file_key(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def load_cache(path, method):
+    if not path.exists():
+        return {}
+    data = np.load(path)
+    if str(data["method"]) != method:
+        return {}
+    return {
+        name: (int(size), int(mtime), np.uint64(h))
+        for name, size, mtime, h in zip(data["names"], data["sizes"], data["mtimes"], data["hashes"])
+    }
+
+
+# -------------------------------------------------
+# Main
+# -------------------------------------------------
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--images", default=None, help="Images folder (default dataset/raw/images)")
+    p.add_argument("--out-dir", default=None, help="Output folder (default dataset/raw/dedup)")
+    p.add_argument("--hash", choices=sorted(HASHES), default="dhash")
+    p.add_argument("--max-dist", type=int, default=4,
+                   help="Max Hamming distance (of 64 bits) to count as near-duplicate")
+    p.add_argument("--search", choices=["auto", "mih", "brute"], default="auto")
+    add_pipeline_args(p)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    in_images = Path(args.images) if args.images else ROOT / "dataset/raw/images"
+    out_dir = Path(args.out_dir) if args.out_dir else ROOT / "dataset/raw/dedup"
+
+    if not in_images.exists():
+        print(f"ERROR: input images not found: {in_images}", file=sys.stderr)
+        sys.exit(1)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    cache_path = out_dir / "hashes.npz"
+    cache = load_cache(cache_path, args.hash)
+
+    names, sizes, mtimes, hashes = [], [], [], []
+    todo = {}
+
+    for path in scan_images(in_images):
+        size, mtime = file_key(path)
+        hit = cache.get(path.name)
+        if hit is not None and hit[:2] == (size, mtime):
+            names.append(path.name)
+            sizes.append(size)
+            mtimes.append(mtime)
+            hashes.append(hit[2])
+        else:
+            todo[path] = (size, mtime)
+
+    print(f"{len(names)} hashes reused from cache, {len(todo)} to compute")
+
+    def on_result(path, h):
+        if h is None:
+            return
+        names.append(path.name)
+        sizes.append(todo[path][0])
+        mtimes.append(todo[path][1])
+        hashes.append(np.uint64(h))
+
+    run_pipeline(todo, partial(hash_job, method=args.hash),
+                 read=read_gray_small, write=False, on_result=on_result,
+                 name="hash", **pipeline_kwargs(args))
+
+    if not names:
+        print("No images found.", file=sys.stderr)
+        sys.exit(1)
+
+    order = np.argsort(names)
+    names = np.array(names)[order]
+    hashes = np.array(hashes, dtype=np.uint64)[order]
+    np.savez_compressed(
+        cache_path,
+        method=args.hash,
+        names=names,
+        sizes=np.array(sizes, dtype=np.int64)[order],
+        mtimes=np.array(mtimes, dtype=np.int64)[order],
+        hashes=hashes,
+    )
+
+    pairs = find_pairs(hashes, args.max_dist, args.search)
+    labels = clusters_from_pairs(len(hashes), pairs)
+
+    stems = [Path(n).stem for n in names]
+    groups = {stem: int(g) for stem, g in zip(stems, labels)}
+    with open(out_dir / "groups.json", "w") as f:
+        json.dump(groups, f, indent=0)
+
+    # first image (sorted by name) of each cluster is the one we keep
+    _, first = np.unique(labels, return_index=True)
+    with open(out_dir / "keep.txt", "w") as f:
+        f.writelines(stems[i] + "\n" for i in sorted(first))
+
+    n_clusters = len(first)
+    print("\nDone")
+    print(f"Images: {len(names)}")
+    print(f"Near-duplicate pairs (<= {args.max_dist} bits): {len(pairs)}")
+    print(f"Clusters: {n_clusters} ({len(names) - n_clusters} images prunable)")
+    print(f"Output: {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-import cv2, os, shutil
+import argparse
+import sys
+import cv2
 import numpy as np
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from image_pipeline import add_pipeline_args, pipeline_kwargs, run_pipeline, scan_images
 
 # -------------------------------------------------
-# Fast image enhancement using multithreading
+# Fast image enhancement on the streaming pipeline
 # raw -> enhanced
 # -------------------------------------------------
 
@@ -15,9 +18,6 @@ IN_LBL = ROOT / "dataset/raw/labels"
 OUT_IMG = ROOT / "dataset/enhanced/images"
 OUT_LBL = ROOT / "dataset/enhanced/labels"
 
-OUT_IMG.mkdir(parents=True, exist_ok=True)
-OUT_LBL.mkdir(parents=True, exist_ok=True)
-
 # ---------- Pre-create reusable objects ----------
 clahe = cv2.createCLAHE(2.0, (8, 8))
 
@@ -37,14 +37,7 @@ def unsharp(img, amount=1.4, radius=1.0, threshold=10):
 
 
 # ---------- Worker function ----------
-def process_image(filename):
-
-    img_path = IN_IMG / filename
-    lbl_path = IN_LBL / (Path(filename).stem + ".txt")
-
-    img = cv2.imread(str(img_path))
-    if img is None:
-        return False
+def enhance(img):
 
     # Noise removal
     img = cv2.bilateralFilter(img, 9, 75, 75)
@@ -59,34 +52,47 @@ def process_image(filename):
     img = gamma_corr(img, 0.8)
 
     # Sharpen edges
-    img = unsharp(img)
+    return unsharp(img)
 
-    cv2.imwrite(str(OUT_IMG / filename), img)
+
+def process_image(img_path, img):
+
+    lbl_path = IN_LBL / (img_path.stem + ".txt")
+
+    outputs = [(OUT_IMG / img_path.name, enhance(img))]
 
     if lbl_path.exists():
-        shutil.copy(lbl_path, OUT_LBL / lbl_path.name)
+        outputs.append((OUT_LBL / lbl_path.name, lbl_path))
+
+    return outputs
 
-    return True
 
+# ---------- Streaming processing ----------
+def main():
+    p = argparse.ArgumentParser()
+    add_pipeline_args(p)
+    args = p.parse_args()
 
-# ---------- Parallel processing ----------
-files = [f for f in os.listdir(IN_IMG) if f.lower().endswith((".jpg", ".png", ".jpeg"))]
-total = len(files)
+    if not IN_IMG.is_dir():
+        print(f"ERROR: input images not found: {IN_IMG}", file=sys.stderr)
+        sys.exit(1)
 
-print(f"Enhancing {total} images using parallel workers...")
+    OUT_IMG.mkdir(parents=True, exist_ok=True)
+    OUT_LBL.mkdir(parents=True, exist_ok=True)
 
-done = 0
+    print("Enhancing images using streaming parallel workers...")
 
-# workers = number of CPU cores (auto)
-with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-    futures = [executor.submit(process_image, f) for f in files]
+    # workers = number of CPU cores (auto)
+    stats = run_pipeline(
+        scan_images(IN_IMG, [".jpg", ".png", ".jpeg"]),
+        process_image,
+        name="enhance",
+        **pipeline_kwargs(args),
+    )
 
-    for i, future in enumerate(as_completed(futures), start=1):
-        if future.result():
-            done += 1
+    print(f"\nEnhancement complete: {stats.done} images saved")
+    print(f"Output images: {OUT_IMG}")
 
-        if i % 100 == 0 or i == total:
-            print(f"Processed {i}/{total}")
 
-print(f"\nEnhancement complete: {done} images saved")
-print(f"Output images: {OUT_IMG}")
+if __name__ == "__main__":
+    main()
@@ -15,17 +15,22 @@ Run:
   python scripts/enhance.py
   python scripts/enhance.py --limit 0
   python scripts/enhance.py --save-compare
+  python scripts/enhance.py --pool process --workers 8 --jpg-quality 90
 """
 
 import argparse
+import heapq
 import sys
-import shutil
+from functools import partial
 from pathlib import Path
 
 import cv2
 import numpy as np
 
-IMAGE_EXT_DEFAULT = [".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"]
+from image_pipeline import (IMAGE_EXT_DEFAULT, add_pipeline_args, pipeline_kwargs,
+                            run_pipeline, scan_images)
+
+COMPARE_JPG_QUALITY = 92
 
 
 # -------------------------------------------------
@@ -51,7 +56,6 @@ def parse_args():
 
     p.add_argument("--output-ext", default=None,
                    help="Force output extension (e.g. .jpg or .png). Default keeps original ext.")
-    p.add_argument("--jpg-quality", type=int, default=95)
 
     p.add_argument("--clahe", action="store_true")
     p.add_argument("--clahe-clip", type=float, default=1.8)
@@ -71,6 +75,8 @@ def parse_args():
     p.add_argument("--save-compare", action="store_true")
     p.add_argument("--dry-run", action="store_true")
 
+    add_pipeline_args(p)
+
     return p.parse_args()
 
 
@@ -82,44 +88,6 @@ def ensure_dir(p: Path, dry_run: bool):
         p.mkdir(parents=True, exist_ok=True)
 
 
-def list_images(root: Path, exts, recursive: bool):
-    exts = set(e.lower() if e.startswith(".") else f".{e.lower()}" for e in exts)
-    if recursive:
-        for p in root.rglob("*"):
-            if p.is_file() and p.suffix.lower() in exts:
-                yield p
-    else:
-        for p in root.iterdir():
-            if p.is_file() and p.suffix.lower() in exts:
-                yield p
-
-
-def safe_imread(path: Path):
-    return cv2.imread(str(path), cv2.IMREAD_COLOR)
-
-
-def safe_imwrite(path: Path, img_bgr, jpg_quality=95, dry_run=False):
-    if dry_run:
-        return True
-    params = []
-    suf = path.suffix.lower()
-    if suf in [".jpg", ".jpeg"]:
-        params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpg_quality)]
-    elif suf == ".png":
-        params = [int(cv2.IMWRITE_PNG_COMPRESSION), 3]
-    return cv2.imwrite(str(path), img_bgr, params)
-
-
-def copy_label(in_labels: Path, out_labels: Path, stem: str, dry_run=False):
-    src = in_labels / f"{stem}.txt"
-    dst = out_labels / f"{stem}.txt"
-    if not src.exists():
-        return False
-    if not dry_run:
-        shutil.copy2(src, dst)
-    return True
-
-
 # -------------------------------------------------
 # Enhancement functions
 # -------------------------------------------------
@@ -187,6 +155,34 @@ def make_compare(original_bgr, enhanced_bgr, max_height=720):
     return np.hstack([o[:h], e[:h]])
 
 
+def enhance_job(img_path, img, args, in_labels, out_images, out_labels):
+    """Pipeline work stage: one raw image -> enhanced image (+ compare, label)."""
+    stem = img_path.stem
+
+    out_ext = args.output_ext if args.output_ext else img_path.suffix
+    if not out_ext.startswith("."):
+        out_ext = "." + out_ext
+
+    if args.resize:
+        w, h = args.resize
+        img = cv2.resize(img, (int(w), int(h)), interpolation=cv2.INTER_AREA)
+
+    enhanced = enhance_small_blurry_object(img, args)
+    outputs = [(out_images / f"{stem}{out_ext}", enhanced)]
+
+    if args.save_compare:
+        # compare images keep their fixed quality, independent of --jpg-quality
+        ok, data = cv2.imencode(".jpg", make_compare(img, enhanced), [int(cv2.IMWRITE_JPEG_QUALITY), COMPARE_JPG_QUALITY])
+        if ok:
+            outputs.append((out_images / f"{stem}_compare.jpg", data.tobytes()))
+
+    label = in_labels / f"{stem}.txt"
+    if label.exists():
+        outputs.append((out_labels / label.name, label))
+
+    return outputs
+
+
 # -------------------------------------------------
 # Main
 # -------------------------------------------------
@@ -214,55 +210,31 @@ def main():
         args.clahe = True
         args.sharpen = True
 
-    images = sorted(list(list_images(in_images, args.ext, args.recursive)))
-    if not images:
-        print("No images found.", file=sys.stderr)
-        sys.exit(1)
-
+    images = scan_images(in_images, args.ext, args.recursive)
     if args.limit and args.limit > 0:
-        images = images[: args.limit]
+        # the first N in name order, as before; only N paths are held
+        images = iter(heapq.nsmallest(args.limit, images))
 
-    processed = 0
     missing_labels = 0
-    failed = 0
-
-    for img_path in images:
-        stem = img_path.stem
-
-        out_ext = args.output_ext if args.output_ext else img_path.suffix
-        if not out_ext.startswith("."):
-            out_ext = "." + out_ext
 
-        out_img_path = out_images / f"{stem}{out_ext}"
-
-        img = safe_imread(img_path)
-        if img is None:
-            print(f"[FAIL] read {img_path}")
-            failed += 1
-            continue
-
-        if args.resize:
-            w, h = args.resize
-            img = cv2.resize(img, (int(w), int(h)), interpolation=cv2.INTER_AREA)
-
-        enhanced = enhance_small_blurry_object(img, args)
-
-        if not safe_imwrite(out_img_path, enhanced, jpg_quality=args.jpg_quality, dry_run=args.dry_run):
-            print(f"[FAIL] write {out_img_path}")
-            failed += 1
-            continue
+    def on_result(img_path, outputs):
+        nonlocal missing_labels
+        if outputs is not None and not (in_labels / f"{img_path.stem}.txt").exists():
+            missing_labels += 1
+            print(f"[WARN] missing label for {img_path.stem}.txt")
 
-        if args.save_compare:
-            compare = make_compare(img, enhanced)
-            compare_path = out_images / f"{stem}_compare.jpg"
-            safe_imwrite(compare_path, compare, jpg_quality=92, dry_run=args.dry_run)
+    work = partial(enhance_job, args=args, in_labels=in_labels,
+                   out_images=out_images, out_labels=out_labels)
+    stats = run_pipeline(images, work, on_result=on_result, dry_run=args.dry_run,
+                         name="enhance", **pipeline_kwargs(args))
 
-        if not copy_label(in_labels, out_labels, stem, dry_run=args.dry_run):
-            missing_labels += 1
-            print(f"[WARN] missing label for {stem}.txt")
+    if stats.done + stats.failed == 0:
+        print("No images found.", file=sys.stderr)
+        sys.exit(1)
 
-        processed += 1
-        print(f"[OK] {img_path.name}")
+    # an image only counts as processed once all its outputs are written
+    processed = stats.done - stats.write_failed
+    failed = stats.failed
 
     print("\nDone")
     print(f"Processed: {processed}")
@@ -0,0 +1,191 @@
+"""
+Vectorized detection metrics on cached predictions (numpy only).
+
+Inputs are flat arrays over the whole split, `img` giving the image index:
+
+  preds = {"img": (P,), "box": (P, 4) xyxy pixels, "conf": (P,), "cls": (P,)}
+  gts   = {"img": (G,), "box": (G, 4) xyxy pixels, "cls": (G,)}
+
+Matching follows Ultralytics val: per IoU threshold, same-class pairs are
+taken by descending IoU, each prediction and each ground truth used once.
+AP is the 101-point interpolated area under the PR envelope, P/R are read
+at the confidence that maximises mean F1.
+"""
+
+import numpy as np
+
+IOUV = np.linspace(0.5, 0.95, 10)
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+EPS = 1e-16
+
+# COCO object size buckets (box area in original pixels)
+SIZE_BUCKETS = {"small": (0, 32 ** 2), "medium": (32 ** 2, 96 ** 2), "large": (96 ** 2, np.inf)}
+
+
+def box_area(box):
+    return (box[:, 2] - box[:, 0]).clip(0) * (box[:, 3] - box[:, 1]).clip(0)
+
+
+def pair_iou(a, b):
+    """IoU of row-aligned box pairs a[k] <-> b[k]."""
+    lt = np.maximum(a[:, :2], b[:, :2])
+    rb = np.minimum(a[:, 2:], b[:, 2:])
+    inter = (rb - lt).clip(0).prod(1)
+    return inter / (box_area(a) + box_area(b) - inter + EPS)
+
+
+def candidate_pairs(preds, gts):
+    """
+    All (pred, gt) index pairs in the same image with the same class, built
+    without a Python loop over images: every prediction is repeated once per
+    ground truth of its image.
+    """
+    n_img = int(max(preds["img"].max(initial=-1), gts["img"].max(initial=-1))) + 1
+    g_order = np.argsort(gts["img"], kind="stable")
+    g_count = np.bincount(gts["img"], minlength=n_img)
+    g_start = np.concatenate([[0], np.cumsum(g_count)[:-1]])
+
+    reps = g_count[preds["img"]]
+    p_idx = np.repeat(np.arange(len(preds["img"])), reps)
+    offset = np.arange(reps.sum()) - np.repeat(np.cumsum(reps) - reps, reps)
+    g_idx = g_order[g_start[preds["img"]][p_idx] + offset]
+
+    same = preds["cls"][p_idx] == gts["cls"][g_idx]
+    return p_idx[same], g_idx[same]
+
+
+def match_predictions(preds, gts, iouv=IOUV):
+    """(P, T) bool: prediction is a true positive at IoU threshold t."""
+    tp = np.zeros((len(preds["img"]), len(iouv)), dtype=bool)
+    if len(preds["img"]) == 0 or len(gts["img"]) == 0:
+        return tp
+
+    p_idx, g_idx = candidate_pairs(preds, gts)
+    iou = pair_iou(preds["box"][p_idx], gts["box"][g_idx])
+
+    order = np.argsort(-iou, kind="stable")
+    p_idx, g_idx, iou = p_idx[order], g_idx[order], iou[order]
+
+    for t, thr in enumerate(iouv):
+        keep = iou >= thr
+        p, g = p_idx[keep], g_idx[keep]
+        # greedy by IoU: first occurrence of each pred, then of each gt
+        _, first = np.unique(p, return_index=True)
+        first.sort()
+        p, g = p[first], g[first]
+        _, first = np.unique(g, return_index=True)
+        tp[p[first], t] = True
+    return tp
+
+
+def compute_ap(recall, precision):
+    # precision drops to 0 right after the highest recall reached
+    mrec = np.concatenate(([0.0], recall, [recall[-1] if len(recall) else 1.0], [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0], [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return _trapezoid(np.interp(x, mrec, mpre), x)
+
+
+def ap_per_class(tp, conf, pred_cls, gt_cls, n_points=1000):
+    """AP (C, T), P/R at best-F1 confidence, and P/R/F1 curves vs confidence (IoU 0.5)."""
+    order = np.argsort(-conf, kind="stable")
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+
+    classes, n_gt = np.unique(gt_cls, return_counts=True)
+    n_t = tp.shape[1]
+    px = np.linspace(0, 1, n_points)
+    ap = np.zeros((len(classes), n_t))
+    p_curve = np.zeros((len(classes), n_points))
+    r_curve = np.zeros((len(classes), n_points))
+    pr_curves = {}
+
+    for ci, c in enumerate(classes):
+        m = pred_cls == c
+        if not m.any():
+            continue
+        tpc = tp[m].cumsum(0)
+        fpc = (~tp[m]).cumsum(0)
+        recall = tpc / (n_gt[ci] + EPS)
+        precision = tpc / (tpc + fpc)
+
+        r_curve[ci] = np.interp(-px, -conf[m], recall[:, 0], left=0)
+        p_curve[ci] = np.interp(-px, -conf[m], precision[:, 0], left=1)
+        for t in range(n_t):
+            ap[ci, t] = compute_ap(recall[:, t], precision[:, t])
+        pr_curves[int(c)] = (recall[:, 0], precision[:, 0])
+
+    f1_curve = 2 * p_curve * r_curve / (p_curve + r_curve + EPS)
+    best = int(f1_curve.mean(0).argmax()) if len(classes) else 0
+    return {
+        "classes": classes,
+        "n_gt": n_gt,
+        "ap": ap,
+        "p": p_curve[:, best],
+        "r": r_curve[:, best],
+        "best_conf": float(px[best]),
+        "px": px,
+        "p_curve": p_curve,
+        "r_curve": r_curve,
+        "f1_curve": f1_curve,
+        "pr_curves": pr_curves,
+    }
+
+
+def summarize(stats):
+    ap = stats["ap"]
+    return {
+        "precision": float(stats["p"].mean()) if len(ap) else 0.0,
+        "recall": float(stats["r"].mean()) if len(ap) else 0.0,
+        "mAP50": float(ap[:, 0].mean()) if len(ap) else 0.0,
+        "mAP50-95": float(ap.mean()) if len(ap) else 0.0,
+        "best_conf": stats["best_conf"],
+    }
+
+
+def filter_conf(preds, conf):
+    keep = preds["conf"] >= conf
+    return {k: v[keep] for k, v in preds.items()}
+
+
+def evaluate_arrays(preds, gts, conf=0.001, iouv=IOUV):
+    """Full metric set from cached arrays. Returns (summary dict, per-class stats)."""
+    preds = filter_conf(preds, conf)
+    tp = match_predictions(preds, gts, iouv)
+    stats = ap_per_class(tp, preds["conf"], preds["cls"], gts["cls"])
+    stats["tp"] = tp
+    stats["conf"] = preds["conf"]
+    return summarize(stats), stats
+
+
+def size_breakdown(preds, gts, conf=0.001, iouv=IOUV):
+    """
+    Metrics per COCO size bucket. Ground truths and predictions are both
+    filtered by their own box area (a simplification of COCO's ignore rules).
+    """
+    out = {}
+    g_area = box_area(gts["box"])
+    p_area = box_area(preds["box"])
+    for name, (lo, hi) in SIZE_BUCKETS.items():
+        gm = (g_area >= lo) & (g_area < hi)
+        pm = (p_area >= lo) & (p_area < hi)
+        sub_g = {k: v[gm] for k, v in gts.items()}
+        sub_p = {k: v[pm] for k, v in preds.items()}
+        summary, _ = evaluate_arrays(sub_p, sub_g, conf, iouv)
+        summary["instances"] = int(gm.sum())
+        out[name] = summary
+    return out
+
+
+def threshold_sweep(tp50, conf, n_gt, thresholds):
+    """Precision / recall / F1 at IoU 0.5 for each confidence threshold, in one pass."""
+    order = np.argsort(-conf, kind="stable")
+    conf_sorted = conf[order]
+    cum_tp = np.concatenate([[0], np.cumsum(tp50[order])])
+    # number of predictions with conf >= thr
+    k = np.searchsorted(-conf_sorted, -np.asarray(thresholds), side="right")
+    tp = cum_tp[k]
+    precision = np.where(k > 0, tp / np.maximum(k, 1), 1.0)
+    recall = tp / max(n_gt, EPS)
+    f1 = 2 * precision * recall / (precision + recall + EPS)
+    return precision, recall, f1
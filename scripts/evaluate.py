@@ -1,8 +1,39 @@
+"""
+Evaluate trained models in two phases.
+
+Phase 1  inference once per (model hash, split, imgsz), raw predictions at
+         conf 0.001 cached to runs/eval_cache/*.npz together with the labels
+Phase 2  eval_metrics.py computes P / R / mAP50 / mAP50-95, per object size,
+         a confidence sweep and PR curves from the cache in milliseconds
+
+Run:
+  python scripts/evaluate.py
+  python scripts/evaluate.py --dataset raw --model models/raw_2026_01_11_001_best.pt
+  python scripts/evaluate.py --dataset raw --conf 0.4 --sweep
+  python scripts/evaluate.py --dataset raw --imgsz 960 --device cpu
+"""
+
 from ultralytics import YOLO
 from pathlib import Path
+import argparse
+import csv
+import hashlib
+import json
+import time
+
+import numpy as np
+import yaml
+
+import eval_metrics as em
 
 ROOT = Path(__file__).resolve().parents[1]
 MODELS_DIR = ROOT / "models"
+CACHE_DIR = ROOT / "runs" / "eval_cache"
+REPORT_DIR = ROOT / "runs" / "eval"
+
+IMAGE_EXT = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+PREDICT_CONF = 0.001   # cache everything val would see, filter later
+PREDICT_IOU = 0.7
 
 
 def find_latest_model(tag: str):
@@ -17,8 +48,235 @@ def find_latest_model(tag: str):
     return latest
 
 
-def evaluate(tag: str):
-    model_path = find_latest_model(tag)
+def default_device():
+    import torch
+    return 0 if torch.cuda.is_available() else "cpu"
+
+
+# -------------------------------------------------
+# Phase 1: prediction cache
+# -------------------------------------------------
+def file_hash(path: Path):
+    """Content hash of a model file, or of every file in an exported model folder."""
+    h = hashlib.blake2b(digest_size=8)
+    files = sorted(f for f in path.rglob("*") if f.is_file()) if path.is_dir() else [path]
+    for file in files:
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def split_images(data_yaml: Path, split: str):
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+    base = Path(data.get("path", ""))
+    if not base.is_absolute():
+        base = ROOT / base
+    img_dir = base / data[split]
+    return sorted(p for p in img_dir.iterdir() if p.suffix.lower() in IMAGE_EXT)
+
+
+def split_fingerprint(images):
+    """Cheap fingerprint of the split contents (names, sizes, mtimes)."""
+    h = hashlib.blake2b(digest_size=8)
+    for p in images:
+        st = p.stat()
+        h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def label_path(img: Path):
+    return img.parent.parent / "labels" / (img.stem + ".txt")
+
+
+def read_labels(img: Path, shape):
+    """YOLO txt (cls cx cy w h, normalized) -> cls, xyxy pixels."""
+    p = label_path(img)
+    if not p.exists() or p.stat().st_size == 0:
+        return np.zeros(0, np.int64), np.zeros((0, 4), np.float32)
+    lab = np.loadtxt(p, ndmin=2, dtype=np.float32)[:, :5]
+    h, w = shape
+    cx, cy, bw, bh = lab[:, 1] * w, lab[:, 2] * h, lab[:, 3] * w, lab[:, 4] * h
+    box = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], 1)
+    return lab[:, 0].astype(np.int64), box
+
+
+def cache_path(model_hash, tag, split, imgsz):
+    return CACHE_DIR / f"{model_hash}_{tag}_{split}_{imgsz}.npz"
+
+
+def run_predictions(model_path: Path, images, imgsz, device, batch=16):
+    model = YOLO(str(model_path))
+
+    p_img, p_box, p_conf, p_cls = [], [], [], []
+    g_img, g_box, g_cls = [], [], []
+    shapes = np.zeros((len(images), 2), np.int64)
+
+    t0 = time.perf_counter()
+    for start in range(0, len(images), batch):
+        chunk = images[start:start + batch]
+        results = model.predict([str(p) for p in chunk], imgsz=imgsz, conf=PREDICT_CONF,
+                                iou=PREDICT_IOU, device=device, max_det=300, verbose=False)
+        for i, (img, r) in enumerate(zip(chunk, results), start=start):
+            boxes = r.boxes
+            n = len(boxes)
+            p_img.append(np.full(n, i, np.int64))
+            p_box.append(boxes.xyxy.cpu().numpy().astype(np.float32))
+            p_conf.append(boxes.conf.cpu().numpy().astype(np.float32))
+            p_cls.append(boxes.cls.cpu().numpy().astype(np.int64))
+
+            shapes[i] = r.orig_shape
+            cls, box = read_labels(img, r.orig_shape)
+            g_img.append(np.full(len(cls), i, np.int64))
+            g_box.append(box)
+            g_cls.append(cls)
+    elapsed = time.perf_counter() - t0
+
+    def cat(parts, shape, dtype):
+        return np.concatenate(parts) if parts else np.zeros(shape, dtype)
+
+    return {
+        "pred_img": cat(p_img, 0, np.int64),
+        "pred_box": cat(p_box, (0, 4), np.float32),
+        "pred_conf": cat(p_conf, 0, np.float32),
+        "pred_cls": cat(p_cls, 0, np.int64),
+        "gt_img": cat(g_img, 0, np.int64),
+        "gt_box": cat(g_box, (0, 4), np.float32),
+        "gt_cls": cat(g_cls, 0, np.int64),
+        "shapes": shapes,
+        "names": np.array([p.name for p in images]),
+        "ms_per_img": np.float64(1000 * elapsed / max(len(images), 1)),
+    }
+
+
+def load_predictions(model_path: Path, data_yaml: Path, tag: str, split="test",
+                     imgsz=640, device=None, refresh=False):
+    """Phase 1: cached raw predictions + labels for one (model, split, imgsz)."""
+    images = split_images(data_yaml, split)
+    fingerprint = split_fingerprint(images)
+    path = cache_path(file_hash(model_path), tag, split, imgsz)
+
+    if path.exists() and not refresh:
+        data = dict(np.load(path))
+        if str(data.get("fingerprint")) == fingerprint:
+            print(f"Using cached predictions: {path.name}")
+            return data
+        print("Split changed since cache was written, re-running inference")
+
+    print(f"Running inference on {len(images)} {split} images (imgsz={imgsz})...")
+    device = default_device() if device is None else device
+    data = run_predictions(model_path, images, imgsz, device)
+    data["fingerprint"] = np.array(fingerprint)
+    data["model"] = np.array(str(model_path))
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, **data)
+    print(f"Cached predictions: {path}")
+    return data
+
+
+def as_arrays(data):
+    preds = {"img": data["pred_img"], "box": data["pred_box"],
+             "conf": data["pred_conf"], "cls": data["pred_cls"]}
+    gts = {"img": data["gt_img"], "box": data["gt_box"], "cls": data["gt_cls"]}
+    return preds, gts
+
+
+# -------------------------------------------------
+# Phase 2: metrics from cache
+# -------------------------------------------------
+def write_curves(out_dir: Path, stats, sweep_rows):
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(out_dir / "pr_curve.csv", "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["class", "recall", "precision"])
+        for c, (rec, prec) in stats["pr_curves"].items():
+            # thin the curve: one point per 0.1% recall is plenty for plotting
+            keep = np.unique(np.round(rec, 3), return_index=True)[1]
+            w.writerows([c, f"{r:.4f}", f"{p:.4f}"] for r, p in zip(rec[keep], prec[keep]))
+
+    with open(out_dir / "conf_sweep.csv", "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["conf", "precision", "recall", "f1"])
+        w.writerows(sweep_rows)
+
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return
+
+    fig, ax = plt.subplots(figsize=(6, 5))
+    for c, (rec, prec) in stats["pr_curves"].items():
+        ax.plot(rec, np.maximum.accumulate(prec[::-1])[::-1], label=f"class {c}")
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    if stats["pr_curves"]:
+        ax.legend()
+    fig.savefig(out_dir / "pr_curve.png", dpi=120)
+    plt.close(fig)
+
+
+def report(data, tag, conf, sweep=False):
+    preds, gts = as_arrays(data)
+
+    t0 = time.perf_counter()
+    summary, stats = em.evaluate_arrays(preds, gts)
+    sizes = em.size_breakdown(preds, gts)
+
+    # P / R exactly at the deployment threshold, mAP of what survives it
+    tp50, n_gt = stats["tp"][:, 0], len(gts["cls"])
+    at_conf, _ = em.evaluate_arrays(preds, gts, conf=conf)
+    (p_c,), (r_c,), _ = em.threshold_sweep(tp50, stats["conf"], n_gt, [conf])
+    at_conf.update(precision=float(p_c), recall=float(r_c))
+
+    thresholds = np.round(np.arange(0.05, 0.96, 0.05), 2)
+    p, r, f1 = em.threshold_sweep(tp50, stats["conf"], n_gt, thresholds)
+    metrics_ms = 1000 * (time.perf_counter() - t0)
+
+    print(f"\nImages: {len(data['names'])}   Instances: {len(gts['cls'])}")
+    print(f"{'':12}{'P':>8}{'R':>8}{'mAP50':>8}{'mAP50-95':>10}")
+    print(f"{'all':12}{summary['precision']:8.3f}{summary['recall']:8.3f}"
+          f"{summary['mAP50']:8.3f}{summary['mAP50-95']:10.3f}   (P/R at best-F1 conf {summary['best_conf']:.2f})")
+    print(f"{f'conf>={conf:g}':12}{at_conf['precision']:8.3f}{at_conf['recall']:8.3f}"
+          f"{at_conf['mAP50']:8.3f}{at_conf['mAP50-95']:10.3f}")
+    for name, s in sizes.items():
+        print(f"{name:12}{s['precision']:8.3f}{s['recall']:8.3f}"
+              f"{s['mAP50']:8.3f}{s['mAP50-95']:10.3f}   ({s['instances']} instances)")
+    print(f"Speed: {float(data['ms_per_img']):.1f} ms inference/img, metrics {metrics_ms:.1f} ms")
+
+    best = int(np.argmax(f1))
+    if sweep:
+        print(f"\n{'conf':>6}{'P':>8}{'R':>8}{'F1':>8}")
+        for row in zip(thresholds, p, r, f1):
+            print(f"{row[0]:6.2f}{row[1]:8.3f}{row[2]:8.3f}{row[3]:8.3f}")
+    print(f"Suggested --thresh (max F1 @ IoU 0.5): {thresholds[best]:.2f}")
+
+    out_dir = REPORT_DIR / tag
+    write_curves(out_dir, stats, [[f"{t:.2f}", f"{a:.4f}", f"{b:.4f}", f"{c:.4f}"]
+                                  for t, a, b, c in zip(thresholds, p, r, f1)])
+    result = {
+        "model": str(data["model"]),
+        "all": summary,
+        f"conf>={conf:g}": at_conf,
+        "sizes": sizes,
+        "suggested_thresh": float(thresholds[best]),
+        "ms_per_img": float(data["ms_per_img"]),
+    }
+    with open(out_dir / "metrics.json", "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Curves and metrics: {out_dir}")
+    return result
+
+
+def evaluate(tag: str, model_path=None, imgsz=640, device=None, conf=0.5,
+             split="test", sweep=False, refresh=False):
+    model_path = Path(model_path) if model_path else find_latest_model(tag)
     if model_path is None:
         return
 
@@ -26,18 +284,31 @@ def evaluate(tag: str):
 
     print(f"\n===== EVALUATING {tag.upper()} DATASET =====\n")
 
-    model = YOLO(str(model_path))
-    model.val(
-        data=str(data_yaml),
-        split="test",
-        imgsz=640,
-        device=0
-    )
+    data = load_predictions(model_path, data_yaml, tag, split, imgsz, device, refresh)
+    return report(data, tag, conf, sweep)
 
 
 def main():
-    evaluate("raw")
-    evaluate("enhanced")
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset", choices=["raw", "enhanced", "tiled"], nargs="*",
+                   default=["raw", "enhanced"])
+    p.add_argument("--model", default=None,
+                   help="Model to evaluate (default: latest models/<dataset>_*_best.pt)")
+    p.add_argument("--split", default="test", choices=["train", "val", "test"])
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--device", default=None, help="Inference device (default: 0 if CUDA else cpu)")
+    p.add_argument("--conf", type=float, default=0.5,
+                   help="Confidence threshold to report P/R at (the inference --thresh)")
+    p.add_argument("--sweep", action="store_true", help="Print the full confidence sweep table")
+    p.add_argument("--refresh", action="store_true", help="Ignore cached predictions")
+    args = p.parse_args()
+
+    if args.model and len(args.dataset) != 1:
+        p.error("--model needs exactly one --dataset")
+
+    for tag in args.dataset:
+        evaluate(tag, args.model, args.imgsz, args.device, args.conf,
+                 args.split, args.sweep, args.refresh)
 
 
 if __name__ == "__main__":
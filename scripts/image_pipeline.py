@@ -0,0 +1,328 @@
+"""
+Streaming reader -> worker -> writer pipeline for dataset-wide image jobs.
+
+  scan_images()   lazily walks a folder with os.scandir (no full listing)
+  decode stage    a few threads running cv2.imread into a bounded queue
+  work stage      thread or process pool with a bounded number of jobs in flight
+  write stage     threads encoding / copying outputs (JPEG quality, PNG compression)
+
+Every hand-off is bounded, so the number of decoded images held in memory
+depends on the queue sizes only, never on the dataset size.
+
+A job's `work(path, data)` returns a list of (out_path, payload) pairs:
+  payload = numpy image  -> encoded and written to out_path
+  payload = Path         -> file copied to out_path (labels, split copies)
+  payload = bytes        -> written to out_path as is (generated label files)
+Return None to mark the job as failed. With write=False the return value is
+only handed to on_result (e.g. hashes collected by dedup_dataset.py).
+
+With --profile every decode, work and write call is recorded as a span on
+its thread (Chrome trace, see inference/profiler.py), plus the queue depths.
+
+Used by enhance_dataset.py, enhance_yolo_aerial.py,
+sharpen_all_images_unsharp.py, split_dataset.py, dedup_dataset.py and
+tile_dataset.py.
+"""
+
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import cv2
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from inference.profiler import PROFILE_DEFAULT, tracer
+
+IMAGE_EXT_DEFAULT = [".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"]
+
+_DONE = object()
+
+
+# -------------------------------------------------
+# Source
+# -------------------------------------------------
+def normalize_exts(exts):
+    return set(e.lower() if e.startswith(".") else f".{e.lower()}" for e in exts)
+
+
+def scan_images(root, exts=IMAGE_EXT_DEFAULT, recursive=False):
+    """Yield image paths under root one by one, without building a list."""
+    exts = normalize_exts(exts)
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in exts:
+                    yield Path(entry.path)
+
+
+# -------------------------------------------------
+# Stage helpers
+# -------------------------------------------------
+def read_image(path):
+    return cv2.imread(str(path), cv2.IMREAD_COLOR)
+
+
+def encode_params(path, jpg_quality=95, png_compression=3):
+    suf = Path(path).suffix.lower()
+    if suf in [".jpg", ".jpeg"]:
+        return [int(cv2.IMWRITE_JPEG_QUALITY), int(jpg_quality)]
+    if suf == ".png":
+        return [int(cv2.IMWRITE_PNG_COMPRESSION), int(png_compression)]
+    return []
+
+
+def write_output(out_path, payload, jpg_quality=95, png_compression=3):
+    if isinstance(payload, (str, Path)):
+        shutil.copy2(payload, out_path)
+        return True
+    if isinstance(payload, bytes):
+        with open(out_path, "wb") as f:
+            f.write(payload)
+        return True
+    params = encode_params(out_path, jpg_quality, png_compression)
+    return cv2.imwrite(str(out_path), payload, params)
+
+
+def traced_work(work, profile, path, data):
+    """Work call in a worker process: returns (outputs, trace events) for the parent."""
+    tracer.enable(profile)
+    with tracer.span("work", "pipeline"):
+        outputs = work(path, data)
+    return outputs, tracer.take()
+
+
+class PipelineStats:
+    """Counters + periodic throughput line."""
+
+    def __init__(self, name, report_every=2.0):
+        self.name = name
+        self.report_every = report_every
+        self.read = 0
+        self.done = 0
+        self.written = 0
+        self.failed = 0
+        # done jobs with at least one output that could not be written
+        self.write_failed = 0
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+        self._lock = threading.Lock()
+
+    def add(self, field, n=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def elapsed(self):
+        return time.perf_counter() - self.t0
+
+    def rate(self):
+        return self.done / max(self.elapsed(), 1e-9)
+
+    def maybe_report(self, decode_q, write_q, force=False):
+        now = time.perf_counter()
+        if not force and (self.report_every <= 0 or now - self._last < self.report_every):
+            return
+        self._last = now
+        print(f"[{self.name}] {self.done} done, {self.failed} failed | "
+              f"{self.rate():.1f} img/s | "
+              f"decode q {decode_q.qsize()}/{decode_q.maxsize} | "
+              f"write q {write_q.qsize()}/{write_q.maxsize}", flush=True)
+
+
+# -------------------------------------------------
+# Pipeline
+# -------------------------------------------------
+def run_pipeline(paths, work, *, read=read_image, mode="thread", workers=None,
+                 decode_workers=2, write_workers=2, queue_size=32,
+                 jpg_quality=95, png_compression=3, on_result=None,
+                 write=True, dry_run=False, report_every=2.0, name="pipeline", profile=None):
+    """
+    Stream `paths` through read -> work -> write and return PipelineStats.
+
+    read       fn(path) -> data, runs in decode threads (None = don't decode,
+               work receives data=None)
+    work       fn(path, data) -> [(out_path, payload), ...] | None. Must be a
+               module-level function (or functools.partial) in process mode.
+    mode       "thread" or "process" pool for the work stage
+    on_result  fn(path, outputs) called in the main thread after each job
+    write      False = map mode: work's return value only goes to on_result
+    profile    write a Chrome trace of all stages to this file
+    """
+    if mode not in ("thread", "process"):
+        raise ValueError(f"mode must be 'thread' or 'process', got {mode!r}")
+
+    workers = workers or os.cpu_count() or 1
+    decode_workers = max(1, decode_workers)
+    write_workers = max(1, write_workers)
+
+    if profile:
+        tracer.enable(profile)
+    stats = PipelineStats(name, report_every)
+    decode_q = queue.Queue(maxsize=queue_size)
+    write_q = queue.Queue(maxsize=queue_size)
+
+    source = iter(paths)
+    source_lock = threading.Lock()
+    source_errors = []
+
+    def reader():
+        try:
+            while True:
+                with source_lock:
+                    path = next(source, _DONE)
+                if path is _DONE:
+                    break
+                try:
+                    with tracer.span("decode", "pipeline"):
+                        data = read(path) if read else None
+                    error = ""
+                except Exception as e:
+                    data, error = None, f": {e}"
+                if read and data is None:
+                    print(f"[FAIL] read {path}{error}")
+                    stats.add("failed")
+                    continue
+                stats.add("read")
+                decode_q.put((path, data))
+        except BaseException as e:
+            # the path iterator failed (e.g. scandir on a missing folder): re-raised by run_pipeline
+            source_errors.append(e)
+        finally:
+            # always, or the main loop waits for this reader forever
+            decode_q.put(_DONE)
+
+    def writer():
+        while True:
+            item = write_q.get()
+            if item is _DONE:
+                break
+            item_failed = False
+            for out_path, payload in item:
+                if dry_run:
+                    continue
+                try:
+                    with tracer.span("write", "pipeline"):
+                        ok = write_output(out_path, payload, jpg_quality, png_compression)
+                    error = ""
+                except Exception as e:
+                    ok, error = False, f": {e}"
+                if not ok:
+                    print(f"[FAIL] write {out_path}{error}")
+                    stats.add("failed")
+                    item_failed = True
+                else:
+                    stats.add("written")
+            if item_failed:
+                stats.add("write_failed")
+
+    readers = [threading.Thread(target=reader, name=f"decode-{i}", daemon=True) for i in range(decode_workers)]
+    writers = [threading.Thread(target=writer, name=f"write-{i}", daemon=True) for i in range(write_workers)]
+    for t in readers + writers:
+        t.start()
+
+    in_flight = deque()
+    max_in_flight = workers * 2
+
+    if not tracer.enabled:
+        submit_work = work
+    elif mode == "process":
+        submit_work = partial(traced_work, work, tracer.path)
+    else:
+        def submit_work(path, data):
+            with tracer.span("work", "pipeline"):
+                return work(path, data)
+
+    def finish_oldest():
+        path, fut = in_flight.popleft()
+        try:
+            with tracer.span("wait result", "pipeline"):
+                outputs = fut.result()
+            if tracer.enabled and mode == "process":
+                outputs, events = outputs
+                tracer.extend(events)
+        except Exception as e:
+            print(f"[FAIL] work {path}: {e}")
+            outputs = None
+        if outputs is None:
+            stats.add("failed")
+        else:
+            stats.add("done")
+            if write and outputs:
+                write_q.put(outputs)
+        if on_result:
+            on_result(path, outputs)
+        tracer.counter("queues", decode=decode_q.qsize(), write=write_q.qsize(), in_flight=len(in_flight))
+        stats.maybe_report(decode_q, write_q)
+
+    if mode == "process":
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="work")
+    with pool:
+        finished_readers = 0
+        while finished_readers < len(readers):
+            with tracer.span("wait decode", "pipeline"):
+                item = decode_q.get()
+            if item is _DONE:
+                finished_readers += 1
+                continue
+            path, data = item
+            in_flight.append((path, pool.submit(submit_work, path, data)))
+            if len(in_flight) >= max_in_flight:
+                finish_oldest()
+        while in_flight:
+            finish_oldest()
+
+    for _ in writers:
+        write_q.put(_DONE)
+    for t in readers + writers:
+        t.join()
+    if source_errors:
+        raise source_errors[0]
+
+    stats.maybe_report(decode_q, write_q, force=True)
+    print(f"[{stats.name}] finished in {stats.elapsed():.1f}s")
+    tracer.save()
+    return stats
+
+
+def add_pipeline_args(p, workers_default=None):
+    """Shared CLI flags for scripts running on run_pipeline()."""
+    g = p.add_argument_group("pipeline")
+    g.add_argument("--workers", type=int, default=workers_default,
+                   help="Work-stage pool size (default: CPU count)")
+    g.add_argument("--pool", choices=["thread", "process"], default="thread",
+                   help="Work-stage pool type")
+    g.add_argument("--decode-workers", type=int, default=2)
+    g.add_argument("--write-workers", type=int, default=2)
+    g.add_argument("--queue-size", type=int, default=32,
+                   help="Max items waiting between stages (bounds memory)")
+    g.add_argument("--jpg-quality", type=int, default=95)
+    g.add_argument("--png-compression", type=int, default=3, choices=range(10),
+                   metavar="0-9")
+    g.add_argument("--profile", nargs="?", const=PROFILE_DEFAULT, default=None,
+                   help=f"Write a Chrome trace of the pipeline stages (default file: {PROFILE_DEFAULT})")
+    return g
+
+
+def pipeline_kwargs(args):
+    return dict(
+        mode=args.pool,
+        workers=args.workers,
+        decode_workers=args.decode_workers,
+        write_workers=args.write_workers,
+        queue_size=args.queue_size,
+        jpg_quality=args.jpg_quality,
+        png_compression=args.png_compression,
+        profile=args.profile,
+    )
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Speed / accuracy matrix: models x imgsz x CPU backends.
+
+For every combination, in a fresh process:
+  - export the model for the backend (cached in runs/matrix/exports/)
+  - mAP50 / mAP50-95 on the test split, same cache + metrics as evaluate.py
+then, in another fresh process that only loads the exported model (so the
+peak RSS is what a deployment uses, without the export or the evaluation):
+  - CPU latency at batch 1 (p50 / p90, after warm-up) and peak RSS
+
+Output: a table sorted by latency with the Pareto frontier (no other
+combination is both faster and more accurate) marked, plus
+runs/matrix/matrix.json and matrix.csv.
+
+Backends: pytorch always; onnx if onnxruntime is installed; openvino if
+openvino is installed.
+
+Run:
+  python scripts/model_matrix.py
+  python scripts/model_matrix.py --models yolo11n.pt models/raw_2026_01_11_001_best.pt --imgsz 320 480 640
+  python scripts/model_matrix.py --backends pytorch onnx --budget-ms 50
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "runs" / "matrix"
+EXPORT_DIR = OUT_DIR / "exports"
+
+BACKENDS = {
+    # name: (ultralytics export format, python module needed)
+    "pytorch": (None, "torch"),
+    "onnx": ("onnx", "onnxruntime"),
+    "openvino": ("openvino", "openvino"),
+}
+
+
+def available_backends():
+    return [b for b, (_, mod) in BACKENDS.items() if importlib.util.find_spec(mod) is not None]
+
+
+def default_models():
+    models = []
+    for tag in ["raw", "enhanced"]:
+        found = sorted((ROOT / "models").glob(f"{tag}_*_best.pt"), key=lambda p: p.stat().st_mtime)
+        if found:
+            models.append(found[-1])
+    return models
+
+
+# -------------------------------------------------
+# One combination (each step in a child process)
+# -------------------------------------------------
+def export_model(model_path: Path, backend, imgsz):
+    fmt = BACKENDS[backend][0]
+    if fmt is None:
+        return model_path
+
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    # exports land next to the source file, so give every imgsz its own copy
+    src = EXPORT_DIR / f"{model_path.stem}_{imgsz}.pt"
+    target = EXPORT_DIR / (f"{src.stem}.onnx" if fmt == "onnx" else f"{src.stem}_openvino_model")
+    if target.exists():
+        return target
+
+    from ultralytics import YOLO
+    shutil.copy(model_path, src)
+    exported = Path(YOLO(str(src)).export(format=fmt, imgsz=imgsz, verbose=False))
+    src.unlink()
+    return exported
+
+
+def measure_latency(model, images, imgsz, warmup=3):
+    import cv2
+    import numpy as np
+
+    # one decoded frame at a time, outside the timed call: the test images are not part of the peak RSS
+    for p in images[:warmup]:
+        model(cv2.imread(str(p)), imgsz=imgsz, device="cpu", verbose=False)
+
+    times = []
+    for p in images:
+        f = cv2.imread(str(p))
+        t0 = time.perf_counter()
+        model(f, imgsz=imgsz, device="cpu", verbose=False)
+        times.append(time.perf_counter() - t0)
+        del f
+    ms = np.array(times) * 1000
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 90))
+
+
+def _child_setup(threads):
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def accuracy_combo(model_path, backend, imgsz, dataset, latency_images, threads):
+    """Export + test-split mAP (child process); also picks the images timed by latency_combo."""
+    _child_setup(threads)
+    import evaluate
+    import eval_metrics as em
+
+    t0 = time.perf_counter()
+    exported = export_model(Path(model_path), backend, imgsz)
+    export_s = time.perf_counter() - t0
+
+    data_yaml = ROOT / "dataset" / f"data_{dataset}.yaml"
+    data = evaluate.load_predictions(exported, data_yaml, dataset, "test", imgsz, device="cpu")
+    summary, _ = em.evaluate_arrays(*evaluate.as_arrays(data))
+    images = [str(p) for p in evaluate.split_images(data_yaml, "test")[:latency_images]]
+    return str(exported), summary, images, export_s
+
+
+def latency_combo(exported, imgsz, images, threads):
+    """Load the exported model and time it (child process): peak RSS is what a deployment uses."""
+    _child_setup(threads)
+    from train_autotune import peak_rss
+    from ultralytics import YOLO
+
+    model = YOLO(exported, task="detect")
+    p50, p90 = measure_latency(model, images, imgsz)
+    return p50, p90, (peak_rss() or 0) / 2**20
+
+
+def in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run_combo(model_path, backend, imgsz, dataset, latency_images, threads):
+    """One matrix row: export + mAP in one fresh process, latency + RSS in another."""
+    exported, summary, images, export_s = in_fresh_process(
+        accuracy_combo, str(model_path), backend, imgsz, dataset, latency_images, threads)
+    p50, p90, rss_mb = in_fresh_process(latency_combo, exported, imgsz, images, threads)
+
+    return {
+        "model": Path(model_path).name,
+        "backend": backend,
+        "imgsz": imgsz,
+        "mAP50": summary["mAP50"],
+        "mAP50-95": summary["mAP50-95"],
+        "latency_p50_ms": p50,
+        "latency_p90_ms": p90,
+        "peak_rss_mb": rss_mb,
+        "export_s": export_s,
+    }
+
+
+# -------------------------------------------------
+# Ranking
+# -------------------------------------------------
+def pareto_front(rows):
+    """Rows not dominated by one that is at least as fast and as accurate (and better in one)."""
+    front = []
+    for r in rows:
+        dominated = any(
+            o is not r
+            and o["latency_p50_ms"] <= r["latency_p50_ms"]
+            and o["mAP50-95"] >= r["mAP50-95"]
+            and (o["latency_p50_ms"] < r["latency_p50_ms"] or o["mAP50-95"] > r["mAP50-95"])
+            for o in rows
+        )
+        r["pareto"] = not dominated
+        if not dominated:
+            front.append(r)
+    return front
+
+
+def print_table(rows, budget_ms=None):
+    rows = sorted(rows, key=lambda r: r["latency_p50_ms"])
+    print(f"\n{'':2}{'model':<34}{'backend':<10}{'imgsz':>6}{'mAP50':>8}{'mAP50-95':>10}"
+          f"{'p50 ms':>9}{'p90 ms':>9}{'RSS MB':>9}")
+    for r in rows:
+        mark = "*" if r["pareto"] else " "
+        print(f"{mark:2}{r['model'][:33]:<34}{r['backend']:<10}{r['imgsz']:>6}{r['mAP50']:8.3f}"
+              f"{r['mAP50-95']:10.3f}{r['latency_p50_ms']:9.1f}{r['latency_p90_ms']:9.1f}{r['peak_rss_mb']:9.0f}")
+    print("* = Pareto frontier (nothing else is both faster and more accurate)")
+
+    if budget_ms:
+        fits = [r for r in rows if r["latency_p50_ms"] <= budget_ms]
+        if fits:
+            best = max(fits, key=lambda r: r["mAP50-95"])
+            print(f"\nBest under {budget_ms:g} ms: {best['model']} / {best['backend']} / imgsz {best['imgsz']} "
+                  f"(mAP50-95 {best['mAP50-95']:.3f}, p50 {best['latency_p50_ms']:.1f} ms)")
+        else:
+            print(f"\nNothing fits under {budget_ms:g} ms")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--models", nargs="*", default=None,
+                   help="Model files (default: latest raw / enhanced model in models/)")
+    p.add_argument("--imgsz", nargs="*", type=int, default=[320, 480, 640])
+    p.add_argument("--backends", nargs="*", default=None,
+                   help=f"Subset of {list(BACKENDS)} (default: all installed)")
+    p.add_argument("--dataset", choices=["raw", "enhanced", "tiled"], default="raw")
+    p.add_argument("--latency-images", type=int, default=50, help="Test images timed at batch 1")
+    p.add_argument("--threads", type=int, default=0, help="torch CPU threads (0 = default)")
+    p.add_argument("--budget-ms", type=float, default=None, help="Pick the best combination under this p50 latency")
+    args = p.parse_args()
+
+    models = [Path(m) for m in args.models] if args.models else default_models()
+    if not models:
+        print("No models given and none found in models/", file=sys.stderr)
+        sys.exit(1)
+
+    installed = available_backends()
+    backends = args.backends or installed
+    missing = [b for b in backends if b not in installed]
+    if missing:
+        print(f"Backends not installed, skipped: {', '.join(missing)}")
+        backends = [b for b in backends if b in installed]
+
+    rows = []
+    for m in models:
+        for backend in backends:
+            for imgsz in args.imgsz:
+                print(f"\n=== {m.name} | {backend} | imgsz {imgsz} ===")
+                try:
+                    rows.append(run_combo(m, backend, imgsz, args.dataset, args.latency_images, args.threads))
+                except Exception as e:
+                    print(f"FAILED: {e}")
+
+    if not rows:
+        sys.exit(1)
+
+    pareto_front(rows)
+    print_table(rows, args.budget_ms)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(OUT_DIR / "matrix.json", "w") as f:
+        json.dump(rows, f, indent=2)
+    with open(OUT_DIR / "matrix.csv", "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+    print(f"\nResults: {OUT_DIR / 'matrix.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Structured channel pruning + short fine-tune of a trained model.
+
+  1. remove whole channels from every layer group that can shrink on its
+     own (the pruned conv feeds exactly one other layer, no residual add,
+     split or concat on the way):
+       - hidden channels of every Bottleneck (C3k2 / C3k)
+       - hidden channels of the C2PSA feed-forward
+       - the inner convs of the Detect head's box / class branches
+     Channels with the smallest |BN scale| go first (network slimming);
+     kept counts are rounded up to a multiple of 8 for the CPU kernels.
+  2. fine-tune the pruned network on the same data_<tag>.yaml (the normal
+     trainer would rebuild it from the yaml and drop the pruned weights)
+  3. measure it against the parent like scripts/model_matrix.py does
+     (mAP on the test split, CPU latency at batch 1, fresh process each)
+
+--sparsity is the fraction of channels removed in each group; --flops
+searches the sparsity for a GFLOPs budget relative to the parent instead.
+Residual / concat channels are never pruned, so very small budgets are not
+reachable; the reached GFLOPs are printed.
+
+Output: models/<family>-pruned<NN>_<date>_<idx>_best.pt, e.g.
+raw-pruned50_2026_02_02_001_best.pt for a raw_..._best.pt parent (loaded by
+the inference scripts like any other model; not matched by raw_*_best.pt, so
+evaluate.py, model_matrix.py and this script keep defaulting to the newest
+trained model), and the same name with _prune.json.
+
+Run:
+  python scripts/prune.py --dataset raw
+  python scripts/prune.py --model models/raw_2026_01_11_001_best.pt --sparsity 0.5 --epochs 10
+  python scripts/prune.py --dataset raw --flops 0.7 --device cpu
+"""
+
+from ultralytics import YOLO
+from ultralytics.models.yolo.detect import DetectionTrainer
+from pathlib import Path
+import argparse
+import copy
+import json
+import math
+import re
+import sys
+from datetime import datetime
+
+import torch
+from torch import nn
+
+from evaluate import find_latest_model
+from train import get_next_index
+from train_autotune import default_settings
+
+ROOT = Path(__file__).resolve().parents[1]
+MODELS_DIR = ROOT / "models"
+RUNS_DIR = ROOT / "runs" / "prune"
+
+CHANNEL_ROUND = 8
+
+
+# -------------------------------------------------
+# Prunable groups
+# -------------------------------------------------
+def _layers(seq):
+    """Conv / Conv2d leaves of a (nested) Sequential, in forward order."""
+    from ultralytics.nn.modules import Conv
+
+    out = []
+    for m in seq.children():
+        if isinstance(m, (Conv, nn.Conv2d)):
+            out.append(m)
+        elif isinstance(m, nn.Sequential):
+            out += _layers(m)
+        else:
+            return None
+    return out
+
+
+def _is_depthwise(m):
+    c = getattr(m, "conv", m)
+    return c.groups > 1 and c.groups == c.in_channels == c.out_channels
+
+
+def prunable_groups(model):
+    """(name, producer Conv, depthwise convs in between, consumer) whose shared channels can be removed."""
+    from ultralytics.nn.modules import Bottleneck, Conv, Detect
+    from ultralytics.nn.modules.block import PSABlock
+
+    groups = []
+    for name, m in model.named_modules():
+        if isinstance(m, Bottleneck) and m.cv2.conv.groups == 1:
+            groups.append((f"{name}.cv1", m.cv1, [], m.cv2))
+        elif isinstance(m, PSABlock) and len(m.ffn) == 2:
+            groups.append((f"{name}.ffn.0", m.ffn[0], [], m.ffn[1]))
+        elif isinstance(m, Detect):
+            for branch in ("cv2", "cv3"):
+                for i, seq in enumerate(getattr(m, branch)):
+                    layers = _layers(seq)
+                    if not layers:
+                        continue
+                    for j, producer in enumerate(layers[:-1]):
+                        if not isinstance(producer, Conv) or _is_depthwise(producer):
+                            continue
+                        through = []
+                        k = j + 1
+                        while k < len(layers) - 1 and _is_depthwise(layers[k]):
+                            through.append(layers[k])
+                            k += 1
+                        consumer = layers[k]
+                        if getattr(consumer, "conv", consumer).groups == 1:
+                            groups.append((f"{name}.{branch}.{i}.{j}", producer, through, consumer))
+    return groups
+
+
+# -------------------------------------------------
+# Pruning
+# -------------------------------------------------
+def keep_count(n, sparsity):
+    keep = math.ceil(n * (1 - sparsity) / CHANNEL_ROUND) * CHANNEL_ROUND
+    return min(n, max(CHANNEL_ROUND, keep))
+
+
+def _select_out(conv_module, keep):
+    """Keep output channels `keep` of a Conv (conv + BN) in place."""
+    conv, bn = conv_module.conv, conv_module.bn
+    conv.weight = nn.Parameter(conv.weight[keep].clone())
+    if conv.bias is not None:
+        conv.bias = nn.Parameter(conv.bias[keep].clone())
+    conv.out_channels = len(keep)
+    if conv.groups > 1:
+        # depthwise: one input channel per output channel
+        conv.in_channels = conv.groups = len(keep)
+    bn.weight = nn.Parameter(bn.weight[keep].clone())
+    bn.bias = nn.Parameter(bn.bias[keep].clone())
+    bn.running_mean = bn.running_mean[keep].clone()
+    bn.running_var = bn.running_var[keep].clone()
+    bn.num_features = len(keep)
+
+
+def _select_in(consumer, keep):
+    conv = getattr(consumer, "conv", consumer)
+    conv.weight = nn.Parameter(conv.weight[:, keep].clone())
+    conv.in_channels = len(keep)
+
+
+@torch.no_grad()
+def prune_model(model, sparsity):
+    """Remove the least important channels of every group in place; returns (name, before, after) per group."""
+    report = []
+    for name, producer, through, consumer in prunable_groups(model):
+        n = producer.conv.out_channels
+        k = keep_count(n, sparsity)
+        if k < n:
+            # largest |BN scale| kept, original order preserved
+            keep = producer.bn.weight.abs().argsort(descending=True)[:k].sort().values
+            _select_out(producer, keep)
+            for dw in through:
+                _select_out(dw, keep)
+            _select_in(consumer, keep)
+        report.append((name, n, k))
+    return report
+
+
+def gflops(model, imgsz):
+    from ultralytics.utils.torch_utils import get_flops
+    return get_flops(model, imgsz)
+
+
+def sparsity_for_flops(model, budget, imgsz, steps=12):
+    """Smallest sparsity whose GFLOPs are at most budget x the parent's (or the most that can be removed)."""
+    target = gflops(model, imgsz) * budget
+    lo, hi = 0.0, 0.95
+    for _ in range(steps):
+        mid = (lo + hi) / 2
+        trial = copy.deepcopy(model)
+        prune_model(trial, mid)
+        if gflops(trial, imgsz) <= target:
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+# -------------------------------------------------
+# Fine-tuning
+# -------------------------------------------------
+class PrunedTrainer(DetectionTrainer):
+    """
+    DetectionTrainer that trains the given (pruned) model instead of rebuilding it from its yaml.
+    Single device only: DDP would rebuild the trainer in a subprocess, without the in-memory pruned model.
+    """
+
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        # the yaml describes the parent's channel counts; loading into it would drop every pruned layer
+        if weights.model[-1].nc != self.data["nc"]:
+            raise ValueError(f"parent model has {weights.model[-1].nc} classes, the dataset {self.data['nc']}: "
+                             "prune a model trained on this dataset")
+        return weights
+
+
+def variant_name(parent: Path, sparsity):
+    """<family>-pruned<NN>_<date>_<idx>: its own family, so <tag>_*_best.pt globs never pick it as the parent."""
+    m = re.match(r"(.+?)_\d{4}_\d{2}_\d{2}_\d+_best$", parent.stem)
+    family = f"{m.group(1) if m else parent.stem}-pruned{round(sparsity * 100):02d}"
+    date_str = datetime.now().strftime("%Y_%m_%d")
+    return f"{family}_{date_str}_{get_next_index(MODELS_DIR, family, date_str)}"
+
+
+# -------------------------------------------------
+# Parent vs pruned
+# -------------------------------------------------
+def measure(models, dataset, imgsz, latency_images, threads):
+    """model_matrix.py's PyTorch combination for each model (fresh processes)."""
+    import model_matrix
+
+    return [model_matrix.run_combo(m, "pytorch", imgsz, dataset, latency_images, threads) for m in models]
+
+
+def print_comparison(parent, child):
+    print(f"\n{'model':<44}{'GFLOPs':>8}{'params M':>10}{'mAP50':>8}{'mAP50-95':>10}{'p50 ms':>9}{'p90 ms':>9}")
+    for r in (parent, child):
+        print(f"{r['model'][:43]:<44}{r['gflops']:8.1f}{r['params'] / 1e6:10.2f}{r['mAP50']:8.3f}"
+              f"{r['mAP50-95']:10.3f}{r['latency_p50_ms']:9.1f}{r['latency_p90_ms']:9.1f}")
+    speedup = parent["latency_p50_ms"] / child["latency_p50_ms"] if child["latency_p50_ms"] else 0.0
+    print(f"Speed-up x{speedup:.2f}, mAP50-95 {child['mAP50-95'] - parent['mAP50-95']:+.3f}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", default=None, help="Parent weights (default: latest models/<dataset>_*_best.pt)")
+    p.add_argument("--dataset", choices=["raw", "enhanced", "tiled"], default="raw",
+                   help="data_<dataset>.yaml for fine-tuning and the comparison")
+    amount = p.add_mutually_exclusive_group()
+    amount.add_argument("--sparsity", type=float, default=None,
+                        help="Fraction of channels removed from each prunable group (default 0.3)")
+    amount.add_argument("--flops", type=float, default=None,
+                        help="GFLOPs budget as a fraction of the parent's (searches the sparsity)")
+    p.add_argument("--epochs", type=int, default=5, help="Fine-tuning epochs")
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--device", default=None,
+                   help="Fine-tuning device, one only (default: the first GPU if present, else cpu)")
+    p.add_argument("--batch", type=int, default=None)
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--latency-images", type=int, default=50, help="Test images timed at batch 1")
+    p.add_argument("--threads", type=int, default=0, help="torch CPU threads for the comparison (0 = default)")
+    p.add_argument("--no-compare", action="store_true", help="Skip the parent / pruned measurement")
+    args = p.parse_args()
+    if args.device and "," in args.device:
+        p.error("--device: the pruned model is fine-tuned on one device (multi-GPU DDP would rebuild it unpruned)")
+
+    parent = Path(args.model) if args.model else find_latest_model(args.dataset)
+    if parent is None or not parent.exists():
+        print("No parent model found", file=sys.stderr)
+        sys.exit(1)
+    data_yaml = ROOT / "dataset" / f"data_{args.dataset}.yaml"
+
+    yolo = YOLO(str(parent))
+    before = gflops(yolo.model, args.imgsz)
+    params_before = sum(x.numel() for x in yolo.model.parameters())
+
+    sparsity = args.sparsity if args.sparsity is not None else 0.3
+    if args.flops is not None:
+        sparsity = sparsity_for_flops(yolo.model, args.flops, args.imgsz)
+        print(f"Sparsity {sparsity:.2f} for {args.flops:g} x {before:.1f} GFLOPs")
+    report = prune_model(yolo.model, sparsity)
+    after = gflops(yolo.model, args.imgsz)
+    params_after = sum(x.numel() for x in yolo.model.parameters())
+
+    channels = sum(n for _, n, _ in report), sum(k for _, _, k in report)
+    print(f"\nPruned {len(report)} groups of {parent.name}: channels {channels[0]} -> {channels[1]}, "
+          f"GFLOPs {before:.1f} -> {after:.1f}, params {params_before / 1e6:.2f}M -> {params_after / 1e6:.2f}M")
+    if args.flops is not None and after > before * args.flops * 1.01:
+        print("Budget not reached: only channels inside prunable groups are removed")
+
+    # Fine-tune
+    name = variant_name(parent, sparsity)
+    # one device (the first GPU by default), never DDP
+    settings = default_settings()
+    for key in ("device", "batch", "workers"):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    print(f"\n===== FINE-TUNING {name} ({args.epochs} epochs) =====\n")
+    yolo.train(
+        trainer=PrunedTrainer,
+        data=str(data_yaml),
+        epochs=args.epochs,
+        imgsz=args.imgsz,
+        batch=settings["batch"],
+        device=settings["device"],
+        workers=settings["workers"],
+        project=str(RUNS_DIR),
+        name=name,
+        exist_ok=True,
+        val=True
+    )
+
+    best = RUNS_DIR / name / "weights" / "best.pt"
+    if not best.exists():
+        print("best.pt not found. Check training logs.")
+        sys.exit(1)
+    MODELS_DIR.mkdir(exist_ok=True)
+    target = MODELS_DIR / f"{name}_best.pt"
+    target.write_bytes(best.read_bytes())
+    print(f"Saved pruned model to: {target}")
+
+    result = {
+        "parent": str(parent),
+        "data": str(data_yaml),
+        "sparsity": sparsity,
+        "flops_budget": args.flops,
+        "epochs": args.epochs,
+        "imgsz": args.imgsz,
+        "groups": [{"layer": n, "channels": c, "kept": k} for n, c, k in report],
+    }
+    if not args.no_compare:
+        print("\nMeasuring parent and pruned model on the test split...")
+        parent_row, child_row = measure([parent, target], args.dataset, args.imgsz,
+                                        args.latency_images, args.threads)
+        parent_row.update(gflops=before, params=params_before)
+        child_row.update(gflops=after, params=params_after)
+        print_comparison(parent_row, child_row)
+        result.update(parent_metrics=parent_row, metrics=child_row)
+
+    config = MODELS_DIR / f"{name}_prune.json"
+    with open(config, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved pruning report to: {config}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 # sharpen_all_images_unsharp.py
+import argparse
+import sys
 import cv2
-import os
 import numpy as np
 from pathlib import Path
-import shutil
+
+from image_pipeline import add_pipeline_args, pipeline_kwargs, run_pipeline, scan_images
 
 # ===================== CONFIGURATION =====================
 INPUT_IMAGES_DIR  = r"./dataset/raw/images"           # ← CHANGE THIS to your images folder
@@ -16,10 +18,6 @@ amount      = 1.5      # strength of sharpening (1.0–2.5)
 radius      = 1.0      # blur radius (0.5–2.0)
 threshold   = 0        # only sharpen high-contrast edges (0 = sharpen everything)
 
-# Create output folders
-Path(OUTPUT_IMAGES_DIR).mkdir(parents=True, exist_ok=True)
-Path(OUTPUT_LABELS_DIR).mkdir(parents=True, exist_ok=True)
-
 # ===================== SHARPEN FUNCTION =====================
 def unsharp_mask(image, amount=1.5, radius=1.0, threshold=0):
     blurred = cv2.GaussianBlur(image, (0, 0), radius)
@@ -35,35 +33,44 @@ def unsharp_mask(image, amount=1.5, radius=1.0, threshold=0):
 # ===================== PROCESS ALL IMAGES =====================
 image_extensions = ('.jpg', '.jpeg', '.png')
 
-count = 0
-for filename in os.listdir(INPUT_IMAGES_DIR):
-    if filename.lower().endswith(image_extensions):
-        input_path = os.path.join(INPUT_IMAGES_DIR, filename)
-        img = cv2.imread(input_path)
-        
-        if img is None:
-            print(f"Failed to read: {filename}")
-            continue
-        
-        # Apply sharpening
-        sharpened_img = unsharp_mask(img, amount=amount, radius=radius, threshold=threshold)
-        
-        # Save sharpened image
-        output_path = os.path.join(OUTPUT_IMAGES_DIR, filename)
-        cv2.imwrite(output_path, sharpened_img)
-        
-        count += 1
-        if count % 100 == 0:
-            print(f"Processed {count} images...")
-        
-        # Copy corresponding label (if exists)
-        label_name = os.path.splitext(filename)[0] + ".txt"
-        src_label = os.path.join(INPUT_LABELS_DIR, label_name)
-        dst_label = os.path.join(OUTPUT_LABELS_DIR, label_name)
-        
-        if os.path.exists(src_label):
-            shutil.copy(src_label, dst_label)
-
-print(f"\nDone! Sharpened {count} images.")
-print(f"Saved to: {OUTPUT_IMAGES_DIR}")
-print(f"Labels copied to: {OUTPUT_LABELS_DIR}")
\ No newline at end of file
+
+def sharpen_job(img_path, img):
+    # Apply sharpening
+    sharpened_img = unsharp_mask(img, amount=amount, radius=radius, threshold=threshold)
+    outputs = [(Path(OUTPUT_IMAGES_DIR) / img_path.name, sharpened_img)]
+
+    # Copy corresponding label (if exists)
+    src_label = Path(INPUT_LABELS_DIR) / (img_path.stem + ".txt")
+    if src_label.exists():
+        outputs.append((Path(OUTPUT_LABELS_DIR) / src_label.name, src_label))
+
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_pipeline_args(parser)
+    args = parser.parse_args()
+
+    if not Path(INPUT_IMAGES_DIR).is_dir():
+        print(f"ERROR: input images not found: {INPUT_IMAGES_DIR}", file=sys.stderr)
+        sys.exit(1)
+
+    # Create output folders
+    Path(OUTPUT_IMAGES_DIR).mkdir(parents=True, exist_ok=True)
+    Path(OUTPUT_LABELS_DIR).mkdir(parents=True, exist_ok=True)
+
+    stats = run_pipeline(
+        scan_images(INPUT_IMAGES_DIR, image_extensions),
+        sharpen_job,
+        name="sharpen",
+        **pipeline_kwargs(args),
+    )
+
+    print(f"\nDone! Sharpened {stats.done} images.")
+    print(f"Saved to: {OUTPUT_IMAGES_DIR}")
+    print(f"Labels copied to: {OUTPUT_LABELS_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,107 @@
 from pathlib import Path
-import random, shutil
+import argparse, json, random, shutil
+from functools import partial
 
-def split(source, target, train=0.8, val=0.1):
-    imgs = list((source/"images").glob("*"))
-    random.shuffle(imgs)
+from image_pipeline import add_pipeline_args, pipeline_kwargs, run_pipeline, scan_images
+
+
+def copy_job(img, data, source, target):
+    outputs = [(target/"images"/img.name, img)]
+    lbl = source/"labels"/(img.stem+".txt")
+    if lbl.exists():
+        outputs.append((target/"labels"/lbl.name, lbl))
+    return outputs
+
+
+def load_groups(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_keep(path):
+    with open(path) as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+def split(source, target, train=0.8, val=0.1, groups=None, keep=None, **pipeline):
+    imgs = list(scan_images(source/"images"))
+    if keep is not None:
+        imgs = [p for p in imgs if p.stem in keep]
+
+    # Shuffle whole near-duplicate clusters (see dedup_dataset.py) so that
+    # duplicates never straddle train and test. Ungrouped images are singletons.
+    clusters = {}
+    for p in imgs:
+        key = groups.get(p.stem, p.stem) if groups else p.stem
+        clusters.setdefault(key, []).append(p)
+    clusters = list(clusters.values())
+    random.shuffle(clusters)
 
     n = len(imgs)
     t = int(n*train)
     v = int(n*val)
 
-    parts = {
-        "train": imgs[:t],
-        "val": imgs[t:t+v],
-        "test": imgs[t+v:]
-    }
+    parts = {"train": [], "val": [], "test": []}
+    for c in clusters:
+        filled = len(parts["train"])
+        if filled < t:
+            parts["train"] += c
+        elif filled + len(parts["val"]) < t+v:
+            parts["val"] += c
+        else:
+            parts["test"] += c
 
     for k, files in parts.items():
-        (target/k/"images").mkdir(parents=True, exist_ok=True)
-        (target/k/"labels").mkdir(parents=True, exist_ok=True)
+        # emptied first: files left from an earlier split could land in two splits
+        for folder in (target/k/"images", target/k/"labels"):
+            if folder.exists():
+                shutil.rmtree(folder)
+            folder.mkdir(parents=True)
+
+        # plain file copies: no decode, the write stage does the I/O
+        run_pipeline(
+            files,
+            partial(copy_job, source=source, target=target/k),
+            read=None,
+            name=f"split {source.name}/{k}",
+            **pipeline
+        )
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset", choices=["raw", "enhanced", "tiled"], nargs="*",
+                   default=["raw", "enhanced"])
+    p.add_argument("--groups", default=None,
+                   help="groups.json from dedup_dataset.py: keep clusters in one split "
+                        "(datasets with their own groups.json, e.g. tiled, use that one)")
+    p.add_argument("--keep", default=None,
+                   help="keep.txt from dedup_dataset.py: only split these stems")
+    add_pipeline_args(p)
+    args = p.parse_args()
+
+    # copying is pure I/O, a thread pool is always the right choice
+    pipeline = pipeline_kwargs(args)
+    pipeline["mode"] = "thread"
+
+    groups = load_groups(args.groups) if args.groups else None
+    keep = load_keep(args.keep) if args.keep else None
+
+    ROOT = Path(__file__).resolve().parents[1]
 
-        for p in files:
-            shutil.copy(p, target/k/"images"/p.name)
-            lbl = source/"labels"/(p.stem+".txt")
-            if lbl.exists():
-                shutil.copy(lbl, target/k/"labels"/lbl.name)
+    for name in args.dataset:
+        source = ROOT/"dataset"/name
+        if (source/"groups.json").exists():
+            # written by tile_dataset.py: overlapping tiles of an image stay in one split
+            # (--groups / --keep name source images, they were applied when tiling)
+            split(source, ROOT/"dataset/splits"/name,
+                  groups=load_groups(source/"groups.json"), **pipeline)
+        else:
+            split(source, ROOT/"dataset/splits"/name,
+                  groups=groups, keep=keep, **pipeline)
 
-ROOT = Path(__file__).resolve().parents[1]
+    print("Splitting done")
 
-split(ROOT/"dataset/raw", ROOT/"dataset/splits/raw")
-split(ROOT/"dataset/enhanced", ROOT/"dataset/splits/enhanced")
 
-print("Splitting done")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Cut large aerial images into overlapping training tiles with remapped labels.
+
+Input:
+  dataset/<source>/images, dataset/<source>/labels     (default source: raw)
+
+Output (a dataset variant like raw / enhanced):
+  dataset/tiled/images    <stem>_<x>_<y>.<ext>, --tile x --tile pixels
+  dataset/tiled/labels    YOLO labels relative to the tile
+  dataset/tiled/groups.json   {tile stem: source image}: split_dataset.py keeps
+                              the overlapping tiles of one image in one split
+  dataset/tiled/tiles.json    settings and counts
+
+The output images / labels folders are rebuilt on every run.
+
+Tiles step by --tile * (1 - --overlap); the last row / column is aligned to
+the image edge, and images no larger than a tile are written whole. A box
+cut by a tile edge is clipped to the tile and kept when at least
+--min-visibility of its area is inside. Tiles without boxes are kept at
+--empty-ratio (0 drops them all), chosen per image with a fixed seed so
+reruns give the same dataset.
+
+Decoding, tiling and encoding run on the image_pipeline.py stages; the tiles
+are encoded by the write stage (--write-workers, default: one per core).
+
+Run:
+  python scripts/tile_dataset.py
+  python scripts/tile_dataset.py --tile 640 --overlap 0.25 --empty-ratio 0.05
+  python scripts/tile_dataset.py --groups dataset/raw/dedup/groups.json --keep dataset/raw/dedup/keep.txt
+  python scripts/split_dataset.py --dataset tiled
+  python scripts/create_data_yaml.py --dataset tiled
+  python scripts/train.py --dataset tiled
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from image_pipeline import IMAGE_EXT_DEFAULT, add_pipeline_args, pipeline_kwargs, run_pipeline, scan_images
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+# -------------------------------------------------
+# Geometry
+# -------------------------------------------------
+def tile_starts(size, tile, step):
+    """Start offsets covering 0..size; the last tile ends at the edge."""
+    if size <= tile:
+        return [0]
+    starts = list(range(0, size - tile, step))
+    return starts + [size - tile]
+
+
+def read_boxes(label_path, w, h):
+    """(N, 5) array of class, x1, y1, x2, y2 in pixels from a YOLO label file."""
+    rows = []
+    if label_path.exists():
+        for line in label_path.read_text().splitlines():
+            vals = line.split()
+            if len(vals) < 5:
+                continue
+            c, cx, cy, bw, bh = (float(v) for v in vals[:5])
+            rows.append((c, (cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h))
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def tile_labels(boxes, x0, y0, tw, th, min_visibility):
+    """YOLO label text for the tile at (x0, y0), or '' when no box is visible enough."""
+    if len(boxes) == 0:
+        return ""
+    x1 = np.clip(boxes[:, 1], x0, x0 + tw)
+    y1 = np.clip(boxes[:, 2], y0, y0 + th)
+    x2 = np.clip(boxes[:, 3], x0, x0 + tw)
+    y2 = np.clip(boxes[:, 4], y0, y0 + th)
+    area = (boxes[:, 3] - boxes[:, 1]) * (boxes[:, 4] - boxes[:, 2])
+    inside = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    keep = (inside > 0) & (inside >= min_visibility * np.maximum(area, 1e-9)) & (x2 - x1 >= 1) & (y2 - y1 >= 1)
+
+    lines = []
+    for c, a, b, d, e in zip(boxes[keep, 0], x1[keep], y1[keep], x2[keep], y2[keep]):
+        lines.append(f"{int(c)} {((a + d) / 2 - x0) / tw:.6f} {((b + e) / 2 - y0) / th:.6f} "
+                     f"{(d - a) / tw:.6f} {(e - b) / th:.6f}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+# -------------------------------------------------
+# Pipeline job
+# -------------------------------------------------
+def tile_job(img_path, img, in_labels, out_images, out_labels, tile, step, min_visibility, empty_ratio, seed):
+    """Pipeline work stage: one image -> its tiles (views, encoded by the write stage) + label texts."""
+    h, w = img.shape[:2]
+    boxes = read_boxes(in_labels / f"{img_path.stem}.txt", w, h)
+    # same choice of empty tiles on every run and in every worker
+    rng = random.Random(f"{seed}:{img_path.stem}")
+
+    outputs = []
+    for y0 in tile_starts(h, tile, step):
+        for x0 in tile_starts(w, tile, step):
+            tw, th = min(tile, w), min(tile, h)
+            text = tile_labels(boxes, x0, y0, tw, th, min_visibility)
+            if not text and rng.random() >= empty_ratio:
+                continue
+            stem = f"{img_path.stem}_{x0}_{y0}"
+            outputs.append((out_images / f"{stem}{img_path.suffix}", img[y0:y0 + th, x0:x0 + tw]))
+            outputs.append((out_labels / f"{stem}.txt", text.encode()))
+    return outputs
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--source", default="raw", help="Dataset to tile: dataset/<source>/images + labels")
+    p.add_argument("--name", default="tiled", help="Output dataset: dataset/<name>")
+    p.add_argument("--tile", type=int, default=640, help="Tile side in pixels (match the training --imgsz)")
+    p.add_argument("--overlap", type=float, default=0.2, help="Fraction of a tile shared with its neighbour")
+    p.add_argument("--min-visibility", type=float, default=0.3,
+                   help="Keep a box cut by a tile edge if this fraction of it is inside the tile")
+    p.add_argument("--empty-ratio", type=float, default=0.1,
+                   help="Fraction of tiles without boxes to keep (0 = none, 1 = all)")
+    p.add_argument("--seed", type=int, default=0, help="Seed for the empty-tile subsample")
+    p.add_argument("--groups", default=None,
+                   help="groups.json from dedup_dataset.py: tiles inherit the cluster of their image")
+    p.add_argument("--keep", default=None,
+                   help="keep.txt from dedup_dataset.py: only tile these images")
+    p.add_argument("--ext", nargs="*", default=IMAGE_EXT_DEFAULT, help="Image extensions to include")
+    add_pipeline_args(p)
+    # tiles are encoded by the write stage, which does most of the work
+    p.set_defaults(write_workers=os.cpu_count() or 2)
+    args = p.parse_args()
+
+    if not 0 <= args.overlap < 1:
+        p.error("--overlap must be in [0, 1)")
+
+    source = ROOT / "dataset" / args.source
+    target = ROOT / "dataset" / args.name
+    in_images, in_labels = source / "images", source / "labels"
+    out_images, out_labels = target / "images", target / "labels"
+    if not in_images.exists():
+        print(f"ERROR: input images not found: {in_images}", file=sys.stderr)
+        sys.exit(1)
+    # rebuilt every run: tiles from other settings would end up in the split without a group
+    for folder in (out_images, out_labels):
+        if folder.exists():
+            shutil.rmtree(folder)
+        folder.mkdir(parents=True)
+
+    step = max(1, round(args.tile * (1 - args.overlap)))
+    clusters = json.loads(Path(args.groups).read_text()) if args.groups else {}
+    keep = set(Path(args.keep).read_text().split()) if args.keep else None
+    images = scan_images(in_images, args.ext)
+    if keep is not None:
+        images = (path for path in images if path.stem in keep)
+
+    groups = {}
+    counts = {"images": 0, "tiles": 0, "empty_tiles": 0, "boxes": 0}
+
+    def on_result(img_path, outputs):
+        if outputs is None:
+            return
+        counts["images"] += 1
+        # one cluster per source image (or per dedup cluster of it)
+        cluster = f"dedup_{clusters[img_path.stem]}" if img_path.stem in clusters else img_path.stem
+        for out_path, payload in outputs:
+            if isinstance(payload, bytes):
+                groups[out_path.stem] = cluster
+                counts["tiles"] += 1
+                n = payload.count(b"\n")
+                counts["boxes"] += n
+                counts["empty_tiles"] += n == 0
+
+    work = partial(tile_job, in_labels=in_labels, out_images=out_images, out_labels=out_labels,
+                   tile=args.tile, step=step, min_visibility=args.min_visibility,
+                   empty_ratio=args.empty_ratio, seed=args.seed)
+    stats = run_pipeline(images, work, on_result=on_result,
+                         name=f"tile {args.source}", **pipeline_kwargs(args))
+
+    with open(target / "groups.json", "w") as f:
+        json.dump(groups, f, indent=0)
+    with open(target / "tiles.json", "w") as f:
+        json.dump({"source": str(source), "tile": args.tile, "overlap": args.overlap, "step": step,
+                   "min_visibility": args.min_visibility, "empty_ratio": args.empty_ratio, "seed": args.seed,
+                   **counts, "failed": stats.failed}, f, indent=2)
+
+    print("\nDone")
+    print(f"Images: {counts['images']} -> tiles: {counts['tiles']} "
+          f"({counts['empty_tiles']} without boxes), boxes: {counts['boxes']}")
+    print(f"Failed: {stats.failed}")
+    print(f"Output: {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
 from ultralytics import YOLO
 from pathlib import Path
 from datetime import datetime
+import argparse
+import json
 import shutil
+import subprocess
 import re
+import sys
+
+from train_autotune import MEM_BUDGET_DEFAULT, autotune, default_settings
+from train_ddp import cpu_ddp_trainer, is_rank, launch_command, launch_env
+
+# pretrained weights -> model name suffix (nano models feed the inference cascade)
+BASES = {"yolo11s": "", "yolo11n": "-nano"}
 
 
 def get_next_index(model_dir: Path, tag: str, date_str: str):
@@ -20,7 +30,48 @@ def get_next_index(model_dir: Path, tag: str, date_str: str):
         return "001"
 
 
-def train_one(tag: str, data_yaml: Path):
+def resolve_settings(args, data_yaml: Path, weights: Path):
+    """device / batch / workers for one run: autotuned, defaults, or CLI overrides."""
+    if args.autotune:
+        settings = autotune(weights, data_yaml, imgsz=args.imgsz, mem_budget=args.mem_budget)
+    else:
+        settings = default_settings()
+
+    for key in ("device", "batch", "workers"):
+        value = getattr(args, key)
+        if value is not None:
+            settings[key] = value
+    return settings
+
+
+def next_run_name(model_dir: Path, tag: str, args):
+    """<tag>[-nano]_<date>_<idx>: the run folder and the models/ file name."""
+    date_str = datetime.now().strftime("%Y_%m_%d")
+    name = tag + BASES[args.base]
+    run_idx = get_next_index(model_dir, name, date_str)
+    return f"{name}_{date_str}_{run_idx}"
+
+
+def save_best(runs_dir: Path, model_dir: Path, run_name: str, tag: str, data_yaml: Path, settings, args):
+    # Copy best model to models folder
+    best_model = runs_dir / run_name / "weights" / "best.pt"
+
+    if best_model.exists():
+        target = model_dir / f"{run_name}_best.pt"
+        shutil.copy(best_model, target)
+        print(f"Saved final model to: {target}")
+
+        # Record the hardware settings next to the model
+        config = model_dir / f"{run_name}_train.json"
+        settings.update(tag=tag, base=args.base, data=str(data_yaml), epochs=args.epochs, imgsz=args.imgsz)
+        with open(config, "w") as f:
+            json.dump(settings, f, indent=2)
+        print(f"Saved training config to: {config}")
+    else:
+        print("best.pt not found. Check training logs.")
+
+
+def train_one(tag: str, data_yaml: Path, args):
     # Resolve project root
     root = Path(__file__).resolve().parents[1]
 
@@ -29,54 +80,137 @@ def train_one(tag: str, data_yaml: Path):
     model_dir.mkdir(exist_ok=True)
 
     # Date-based run name + auto number
-    date_str = datetime.now().strftime("%Y_%m_%d")
-    run_idx = get_next_index(model_dir, tag, date_str)
-    run_name = f"{tag}_{date_str}_{run_idx}"
+    run_name = next_run_name(model_dir, tag, args)
 
-    print(f"\n===== TRAINING {tag.upper()} DATASET =====\n")
+    print(f"\n===== TRAINING {tag.upper()} DATASET ({args.base}) =====\n")
+
+    weights = root / f"{args.base}.pt"
+    settings = resolve_settings(args, data_yaml, weights)
+    print(f"Settings: device={settings['device']} batch={settings['batch']} workers={settings['workers']}")
 
     # Load pretrained YOLOv11 model
-    model = YOLO(str(root / "yolo11s.pt"))
+    model = YOLO(str(weights))
 
     # Start training
     model.train(
         data=str(data_yaml),
-        epochs=10,
-        imgsz=640,
-        batch=16,
-        device=0,
-        workers=12,
+        epochs=args.epochs,
+        imgsz=args.imgsz,
+        batch=settings["batch"],
+        device=settings["device"],
+        workers=settings["workers"],
         project=str(runs_dir),
         name=run_name,
         pretrained=True,
         val=True
     )
 
-    # Copy best model to models folder
-    best_model = runs_dir / run_name / "weights" / "best.pt"
-
-    if best_model.exists():
-        target = model_dir / f"{tag}_{date_str}_{run_idx}_best.pt"
-        shutil.copy(best_model, target)
-        print(f"Saved final model to: {target}")
-    else:
-        print("best.pt not found. Check training logs.")
+    save_best(runs_dir, model_dir, run_name, tag, data_yaml, settings, args)
 
 
-def main():
+def train_ddp(tag: str, data_yaml: Path, args):
+    """Launch --ddp ranks on this host for one dataset; node 0 copies the best weights afterwards."""
     root = Path(__file__).resolve().parents[1]
 
-    # Train on RAW dataset
-    train_one(
-        tag="raw",
-        data_yaml=root / "dataset" / "data_raw.yaml"
-    )
+    runs_dir = root / "runs" / "detect"
+    model_dir = root / "models"
+    model_dir.mkdir(exist_ok=True)
 
-    # Train on ENHANCED dataset
-    train_one(
-        tag="enhanced",
-        data_yaml=root / "dataset" / "data_enhanced.yaml"
+    # decided once here, so every rank writes to the same run folder
+    run_name = args.run_name or next_run_name(model_dir, tag, args)
+    world = args.ddp * args.nnodes
+    settings = {"device": "cpu", "batch": args.batch or 8 * world, "workers": 0, "autotuned": False,
+                "ddp": {"backend": "gloo", "world_size": world, "nproc_per_node": args.ddp, "nnodes": args.nnodes}}
+
+    print(f"\n===== TRAINING {tag.upper()} DATASET ({args.base}, CPU DDP x{world}) =====\n")
+    print(f"Settings: device=cpu batch={settings['batch']} ({settings['batch'] // world} per rank) "
+          f"ranks={args.ddp} on node {args.node_rank} of {args.nnodes}")
+
+    argv = ["--dataset", tag, "--base", args.base, "--epochs", str(args.epochs), "--imgsz", str(args.imgsz),
+            "--batch", str(settings["batch"]), "--run-name", run_name]
+    cmd = launch_command(Path(__file__).resolve(), argv, args.ddp, args.nnodes, args.node_rank,
+                         args.master_addr, args.master_port)
+    print(" ".join(cmd))
+    if subprocess.run(cmd, env=launch_env(args.ddp)).returncode != 0:
+        print("DDP training failed. Check the rank logs above.")
+        sys.exit(1)
+
+    # rank 0 (on node 0) wrote the checkpoints
+    if args.node_rank == 0:
+        best_model = runs_dir / run_name / "weights" / "best.pt"
+        if best_model.exists():
+            print(f"\nValidating {best_model}...")
+            YOLO(str(best_model)).val(data=str(data_yaml), imgsz=args.imgsz, device="cpu",
+                                      project=str(runs_dir), name=run_name, exist_ok=True)
+        save_best(runs_dir, model_dir, run_name, tag, data_yaml, settings, args)
+
+
+def train_rank(tag: str, data_yaml: Path, args):
+    """One rank of a CPU DDP run (started by train_ddp through torch.distributed.run)."""
+    import torch.distributed as dist
+
+    root = Path(__file__).resolve().parents[1]
+    model = YOLO(str(root / f"{args.base}.pt"))
+    model.train(
+        trainer=cpu_ddp_trainer(),
+        data=str(data_yaml),
+        epochs=args.epochs,
+        imgsz=args.imgsz,
+        batch=args.batch,
+        device="cpu",
+        workers=0,
+        project=str(root / "runs" / "detect"),
+        name=args.run_name,
+        exist_ok=True,
+        pretrained=True,
+        val=True
     )
+    if dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset", choices=["raw", "enhanced", "tiled"], nargs="*",
+                   default=["raw", "enhanced"])
+    p.add_argument("--base", choices=list(BASES), default="yolo11s",
+                   help="Pretrained weights; yolo11n models are saved as <dataset>-nano_... for the cascade")
+    p.add_argument("--autotune", action="store_true",
+                   help="Probe devices, batch sizes and dataloader workers before each run")
+    p.add_argument("--mem-budget", type=float, default=MEM_BUDGET_DEFAULT,
+                   help="Max fraction of device memory autotune may plan for")
+    p.add_argument("--device", default=None, help="Override device (e.g. cpu, 0, 0,1)")
+    p.add_argument("--batch", type=int, default=None, help="Override batch size")
+    p.add_argument("--workers", type=int, default=None, help="Override dataloader workers")
+    p.add_argument("--epochs", type=int, default=10)
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--ddp", type=int, default=0,
+                   help="CPU distributed training: processes on this host (gloo, see train_ddp.py)")
+    p.add_argument("--nnodes", type=int, default=1, help="DDP: number of hosts")
+    p.add_argument("--node-rank", type=int, default=0, help="DDP: index of this host (0 keeps the weights)")
+    p.add_argument("--master-addr", default="127.0.0.1", help="DDP: address of the node-rank 0 host")
+    p.add_argument("--master-port", type=int, default=0,
+                   help="DDP: rendezvous port (default: a free port on one host, 29500 across hosts)")
+    # set by the DDP launcher for its ranks
+    p.add_argument("--run-name", default=None, help=argparse.SUPPRESS)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    root = Path(__file__).resolve().parents[1]
+
+    if args.ddp and args.autotune:
+        print("--autotune is ignored with --ddp (CPU ranks, --batch is the total over all ranks)")
+    train = train_rank if is_rank() else train_ddp if args.ddp else train_one
+
+    # Train on RAW and / or ENHANCED dataset
+    for tag in args.dataset:
+        train(
+            tag=tag,
+            data_yaml=root / "dataset" / f"data_{tag}.yaml",
+            args=args
+        )
 
 
 if __name__ == "__main__":
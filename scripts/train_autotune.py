@@ -0,0 +1,285 @@
+"""
+Hardware-aware settings for scripts/train.py.
+
+detect_devices()   what we can train on (CUDA GPUs, Apple MPS, or CPU)
+autotune()         short timed probes, then the device / batch / workers with
+                   the best images/s whose peak memory fits the budget:
+
+  step probe    forward + backward on random batches of each candidate size
+                (no optimizer step, weights untouched)
+  loader probe  real YOLO dataloader over the train split for each worker
+                count, at every batch size that fits
+
+Effective throughput of a (batch, workers) pair is min(step, loader) and the
+pair with the most wins: the loader only needs to keep up with the model, so
+per batch the smallest worker count that does is picked.
+"""
+
+import os
+import platform
+import time
+
+MEM_BUDGET_DEFAULT = 0.85
+
+
+# -------------------------------------------------
+# Devices
+# -------------------------------------------------
+def system_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes (None if unknown)."""
+    try:
+        # Linux: ru_maxrss survives exec, so a spawned child would report its parent's peak
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def detect_devices():
+    import torch
+
+    if torch.cuda.is_available():
+        return [
+            {
+                "type": "cuda",
+                "index": i,
+                "name": torch.cuda.get_device_name(i),
+                "memory": torch.cuda.get_device_properties(i).total_memory,
+            }
+            for i in range(torch.cuda.device_count())
+        ]
+
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return [{"type": "mps", "name": "Apple MPS", "memory": system_memory()}]
+
+    return [{
+        "type": "cpu",
+        "name": platform.processor() or platform.machine(),
+        "cores": os.cpu_count(),
+        "memory": system_memory(),
+    }]
+
+
+def device_arg(devices):
+    """Value for YOLO train(device=...)."""
+    kind = devices[0]["type"]
+    if kind == "cuda":
+        return ",".join(str(d["index"]) for d in devices)
+    return kind
+
+
+def default_settings():
+    """Untuned fallback: the old device 0 / batch 16 / workers 12, but never device=0 without a GPU.
+
+    Only the first GPU: several GPUs (DDP) have to be asked for with --device or picked by autotune().
+    """
+    devices = detect_devices()
+    return {
+        "device": device_arg(devices[:1]),
+        "batch": 16 if devices[0]["type"] == "cuda" else 8,
+        "workers": min(12, os.cpu_count() or 1),
+        "autotuned": False,
+        "devices": devices,
+    }
+
+
+# -------------------------------------------------
+# Probes
+# -------------------------------------------------
+def _flatten(out):
+    if isinstance(out, dict):
+        out = list(out.values())
+    if isinstance(out, (list, tuple)):
+        return [t for o in out for t in _flatten(o)]
+    return [out]
+
+
+def probe_step(net, device, imgsz, batch, steps=5, warmup=2):
+    """images/s and peak memory of forward+backward at this batch size."""
+    import torch
+
+    x = torch.rand(batch, 3, imgsz, imgsz, device=device)
+    cuda = device.type == "cuda"
+    if cuda:
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats(device)
+
+    def sync():
+        if cuda:
+            torch.cuda.synchronize(device)
+
+    t0 = None
+    for i in range(warmup + steps):
+        if i == warmup:
+            sync()
+            t0 = time.perf_counter()
+        net.zero_grad(set_to_none=True)
+        loss = sum(t.float().mean() for t in _flatten(net(x)) if torch.is_tensor(t))
+        loss.backward()
+    sync()
+    elapsed = time.perf_counter() - t0
+
+    peak = torch.cuda.max_memory_allocated(device) if cuda else peak_rss()
+    net.zero_grad(set_to_none=True)
+    return batch * steps / elapsed, peak
+
+
+def build_train_dataset(data_yaml, imgsz, batch):
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import build_yolo_dataset
+    from ultralytics.data.utils import check_det_dataset
+
+    data = check_det_dataset(str(data_yaml))
+    cfg = get_cfg(overrides={"imgsz": imgsz, "batch": batch})
+    return build_yolo_dataset(cfg, data["train"], batch, data, mode="train", stride=32)
+
+
+def probe_loader(dataset, batch, workers, batches=10):
+    """images/s the YOLO dataloader delivers (augmentation included)."""
+    from ultralytics.data import build_dataloader
+
+    loader = build_dataloader(dataset, batch, workers, shuffle=True)
+    it = iter(loader)
+    next(it)  # spin up worker processes outside the timed window
+
+    n = 0
+    t0 = time.perf_counter()
+    for _ in range(batches):
+        try:
+            b = next(it)
+        except StopIteration:
+            it = iter(loader)
+            b = next(it)
+        n += len(b["im_file"])
+    elapsed = time.perf_counter() - t0
+    del it, loader
+    return n / elapsed
+
+
+def _is_oom(e):
+    return "out of memory" in str(e).lower() or type(e).__name__ == "OutOfMemoryError"
+
+
+# -------------------------------------------------
+# Autotune
+# -------------------------------------------------
+def candidate_batches(kind):
+    return [4, 8, 16, 32, 64] if kind == "cuda" else [2, 4, 8, 16, 32]
+
+
+def candidate_workers():
+    cores = os.cpu_count() or 1
+    return sorted(set([0, 2, 4, 8, 12, 16, cores]) & set(range(cores + 1)))
+
+
+def autotune(weights, data_yaml, imgsz=640, mem_budget=MEM_BUDGET_DEFAULT,
+             batches=None, workers=None, steps=5):
+    import torch
+    from ultralytics import YOLO
+
+    devices = detect_devices()
+    kind = devices[0]["type"]
+    device = torch.device("cuda:0" if kind == "cuda" else kind)
+
+    mem_total = devices[0].get("memory")
+    mem_limit = mem_total * mem_budget if mem_total else None
+
+    print("\n===== AUTOTUNE =====")
+    for d in devices:
+        mem = f"{d['memory'] / 2**30:.1f} GiB" if d.get("memory") else "? GiB"
+        print(f"Device: {d['type']} {d.get('name', '')} ({mem})")
+
+    if kind == "cpu":
+        torch.set_num_threads(os.cpu_count() or 1)
+
+    net = YOLO(str(weights)).model.to(device).train()
+    for p in net.parameters():
+        p.requires_grad_(True)
+
+    probes = []
+
+    # ---- train step vs batch size ----
+    step_ips = {}
+    for b in batches or candidate_batches(kind):
+        try:
+            ips, peak = probe_step(net, device, imgsz, b, steps=steps)
+        except RuntimeError as e:
+            if not _is_oom(e):
+                raise
+            print(f"  batch {b:>3}: out of memory")
+            break
+        fits = mem_limit is None or peak is None or peak <= mem_limit
+        probes.append({"stage": "step", "batch": b, "images_per_s": ips,
+                       "peak_memory": peak, "fits": fits})
+        peak_txt = f"{peak / 2**30:.2f} GiB" if peak else "?"
+        print(f"  batch {b:>3}: {ips:7.1f} img/s step, peak {peak_txt}{'' if fits else ' (over budget)'}")
+        if not fits:
+            break
+        step_ips[b] = ips
+
+    del net
+    if kind == "cuda":
+        torch.cuda.empty_cache()
+
+    if not step_ips:
+        raise RuntimeError("autotune: not even the smallest batch fits the memory budget")
+
+    # ---- dataloader vs workers, for every batch that fits ----
+    # a pair delivers min(step, loader) images/s; the best pair wins, not the best step alone
+    best = None  # (images/s, batch, workers)
+    try:
+        dataset = build_train_dataset(data_yaml, imgsz, max(step_ips))
+        for b, step in step_ips.items():
+            best_w, best_loader = 0, 0.0
+            for w in workers or candidate_workers():
+                ips = probe_loader(dataset, b, w)
+                probes.append({"stage": "loader", "batch": b, "workers": w, "images_per_s": ips})
+                print(f"  batch {b:>3} workers {w:>2}: {ips:7.1f} img/s loader")
+                if ips > best_loader * 1.05:
+                    best_w, best_loader = w, ips
+                if ips >= step:
+                    break
+            effective = min(step, best_loader)
+            if best is None or effective > best[0] * 1.05:
+                best = (effective, b, best_w)
+        target, best_batch, best_workers = best
+        best_loader = target
+    except Exception as e:
+        # loader probe is advisory; fall back to the best step and a sane default
+        best_batch = max(step_ips, key=step_ips.get)
+        target = step_ips[best_batch]
+        best_workers = min(8, os.cpu_count() or 1)
+        print(f"  loader probe skipped ({e}); workers={best_workers}")
+        best_loader = None
+
+    n_dev = len(devices) if kind == "cuda" else 1
+    settings = {
+        "device": device_arg(devices),
+        "batch": best_batch * n_dev,
+        "workers": best_workers,
+        "imgsz": imgsz,
+        "images_per_s": min(target, best_loader) if best_loader else target,
+        "mem_budget": mem_budget,
+        "autotuned": True,
+        "devices": devices,
+        "probes": probes,
+    }
+    print(f"Chosen: device={settings['device']} batch={settings['batch']} "
+          f"workers={settings['workers']} (~{settings['images_per_s']:.1f} img/s)\n")
+    return settings
@@ -0,0 +1,96 @@
+"""
+Multi-process CPU training (torch.distributed, gloo) for scripts/train.py.
+
+Ultralytics only runs DDP on GPUs, so train.py --ddp N re-launches itself
+through torch.distributed.run with N ranks per host. Every rank trains on
+the CPU with CpuDDPTrainer:
+
+  - gloo process group instead of NCCL, no CUDA device selection
+  - the model wrapped in DistributedDataParallel without device_ids
+  - batch split across all ranks, DistributedSampler shards the train set
+    (Ultralytics' rank-aware dataloader)
+  - validation, checkpoints (last.pt / best.pt) and plots on rank 0 only;
+    the final validation of best.pt runs in train.py after the ranks exit
+
+One host, 4 ranks:
+  python scripts/train.py --dataset raw --ddp 4
+Two hosts, 8 ranks each (same command on both, node rank 0 keeps the weights):
+  python scripts/train.py --dataset raw --ddp 8 --nnodes 2 --node-rank 0 --master-addr 10.0.0.5
+  python scripts/train.py --dataset raw --ddp 8 --nnodes 2 --node-rank 1 --master-addr 10.0.0.5
+"""
+
+import os
+import socket
+import sys
+
+MASTER_PORT_DEFAULT = 29500
+
+
+def is_rank():
+    """True inside a process started by torch.distributed.run."""
+    return "LOCAL_RANK" in os.environ and int(os.environ.get("WORLD_SIZE", "1")) > 1
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch_command(script, argv, nproc, nnodes=1, node_rank=0, master_addr="127.0.0.1", master_port=0):
+    """torch.distributed.run command starting `script argv` on nproc ranks of this host."""
+    if not master_port:
+        # single host: any free port; several hosts must agree on one
+        master_port = free_port() if nnodes == 1 else MASTER_PORT_DEFAULT
+    return [sys.executable, "-m", "torch.distributed.run",
+            f"--nproc_per_node={nproc}", f"--nnodes={nnodes}", f"--node_rank={node_rank}",
+            f"--master_addr={master_addr}", f"--master_port={master_port}",
+            str(script), *argv]
+
+
+def launch_env(nproc):
+    """Split this host's cores between its ranks (torch.distributed.run would give each one thread)."""
+    env = os.environ.copy()
+    env.setdefault("OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // nproc)))
+    return env
+
+
+def cpu_ddp_trainer():
+    """DetectionTrainer subclass for CPU ranks (imported lazily: only ranks need Ultralytics' trainer)."""
+    from datetime import timedelta
+
+    import torch
+    import torch.distributed as dist
+    from torch import nn
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils import RANK
+    from ultralytics.utils.torch_utils import strip_optimizer
+
+    class _CpuDDP(nn.parallel.DistributedDataParallel):
+        # Ultralytics passes device_ids=[device.index]; CPU modules must get None
+        def __init__(self, module, device_ids=None, **kwargs):
+            super().__init__(module, device_ids=None, **kwargs)
+
+    class CpuDDPTrainer(DetectionTrainer):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # Ultralytics counts CPU as world size 0 (no DDP); the launcher decides here
+            self.world_size = int(os.environ["WORLD_SIZE"])
+            torch.set_num_threads(int(os.environ.get("OMP_NUM_THREADS", torch.get_num_threads())))
+
+        def _setup_ddp(self):
+            dist.init_process_group(backend="gloo", timeout=timedelta(hours=3),
+                                    rank=RANK, world_size=self.world_size)
+            # the trainer builds DDP through nn.parallel; only this rank process uses it
+            nn.parallel.DistributedDataParallel = _CpuDDP
+
+        def final_eval(self):
+            # Ultralytics' final validation moves DDP ranks to CUDA: only strip the checkpoints here
+            if RANK == 0:
+                ckpt = strip_optimizer(self.last) if self.last.exists() else {}
+                if self.best.exists():
+                    strip_optimizer(self.best, updates={"train_results": ckpt.get("train_results")})
+            dist.barrier()
+
+    return CpuDDPTrainer